@@ -0,0 +1,106 @@
+# cache.py - 列表接口的条件请求（ETag / 304）和序列化结果缓存
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Sequence
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from .config import settings
+from .crud.versions import get_table_versions
+from .database import run_db
+from .serialization import json_dumps
+
+
+class ResponseCache:
+    """按 ETag 保存序列化后的响应体，超过容量时淘汰最久未使用的条目"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        body = self._items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: str, body: bytes):
+        self._items[key] = body
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+response_cache = ResponseCache(settings.cache.max_entries)
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def _serialize(data, response_type) -> bytes:
+    # crud 构造的字典是可信输出，快速模式下不再按响应模型逐条校验
+    if settings.response.fast_json:
+        return json_dumps(data)
+    adapter = _adapter(response_type)
+    return adapter.dump_json(adapter.validate_python(data))
+
+
+def _make_etag(request: Request, versions: Sequence[int], vary: Sequence = ()) -> str:
+    # 查询参数排序后参与计算，参数顺序不同的同一请求共享缓存
+    params = sorted(request.query_params.multi_items())
+    raw = f"{request.url.path}?{params}#{versions}#{list(vary)}".encode("utf-8")
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    # 兼容弱校验格式 W/"..."
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+async def cached_json_response(
+    request: Request,
+    db,
+    tables: Sequence[str],
+    build: Callable[..., Any],
+    response_type,
+    *args,
+    vary: Sequence = (),
+    **kwargs
+) -> Response:
+    """
+    tables 为响应依赖的表：先读版本号生成 ETag，客户端缓存仍有效时直接返回 304；
+    否则优先用缓存的响应体，都没有时才调用 crud 函数并按 response_type 校验、序列化。
+    vary 为表版本之外结果还依赖的值（如按当天日期计算的筛选条件），一并计入 ETag
+    """
+    if not settings.cache.enabled:
+        data = await run_db(db, build, *args, **kwargs)
+        return Response(content=_serialize(data, response_type), media_type="application/json")
+
+    versions = await run_db(db, get_table_versions, tuple(tables))
+    etag = _make_etag(request, versions, vary)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(etag)
+    if body is None:
+        data = await run_db(db, build, *args, **kwargs)
+        body = _serialize(data, response_type)
+        response_cache.put(etag, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,158 @@
+# config.py - 运行配置：默认值 < 配置文件（APP_CONFIG 指向的 JSON） < 环境变量
+import json
+import os
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class DatabaseSettings(BaseModel):
+    url: str = "sqlite:///./todo_notes.db"
+    # 未设置时由 url 推导（sqlite:// -> sqlite+aiosqlite://）
+    async_url: Optional[str] = None
+    async_mode: bool = False
+
+    # 连接池（文件型 SQLite 使用 QueuePool）
+    pool_size: int = Field(default=5, ge=1)
+    max_overflow: int = Field(default=10, ge=0)
+    pool_timeout: float = Field(default=30, gt=0)
+
+    # 每个连接建立时执行的 PRAGMA
+    journal_mode: str = Field(default="WAL", pattern="^(?i:DELETE|TRUNCATE|PERSIST|MEMORY|WAL|OFF)$")
+    synchronous: str = Field(default="NORMAL", pattern="^(?i:OFF|NORMAL|FULL|EXTRA)$")
+    cache_size: int = -64000  # 负数表示 KiB，约 64MB
+    mmap_size: int = Field(default=268435456, ge=0)  # 256MB
+    temp_store: str = Field(default="MEMORY", pattern="^(?i:DEFAULT|FILE|MEMORY)$")
+    busy_timeout: int = Field(default=5000, ge=0)  # 毫秒
+
+    def resolved_async_url(self) -> str:
+        if self.async_url:
+            return self.async_url
+        if self.url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + self.url[len("sqlite://"):]
+        return self.url
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+
+class CacheSettings(BaseModel):
+    enabled: bool = True
+    # 响应体 LRU 的最大条目数
+    max_entries: int = Field(default=512, ge=1)
+
+
+class ResponseSettings(BaseModel):
+    # 列表接口跳过 pydantic 二次校验，直接把 crud 结果编码成 JSON
+    fast_json: bool = True
+
+
+class MetricsSettings(BaseModel):
+    # 请求延迟、SQL 计数等指标（/metrics），关闭后不挂中间件和 engine 事件
+    enabled: bool = True
+
+
+class QueryBudgetSettings(BaseModel):
+    # 开发 / 测试用：off 不统计，warn 超出预算或疑似 N+1 时写日志，raise 直接让请求失败
+    mode: str = Field(default="off", pattern="^(off|warn|raise)$")
+    # 没有用 @query_budget 声明的路由使用的预算，None 表示只做 N+1 检测
+    default_budget: Optional[int] = Field(default=None, ge=0)
+    # 同一条 SQL 以多少组不同参数执行时视为 N+1
+    n_plus_one_threshold: int = Field(default=5, ge=2)
+
+
+class Settings(BaseModel):
+    database: DatabaseSettings = DatabaseSettings()
+    cache: CacheSettings = CacheSettings()
+    response: ResponseSettings = ResponseSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    query_budget: QueryBudgetSettings = QueryBudgetSettings()
+
+
+# 环境变量 -> database 配置项
+_DATABASE_ENV = {
+    "DATABASE_URL": "url",
+    "ASYNC_DATABASE_URL": "async_url",
+    "DB_ASYNC": "async_mode",
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "SQLITE_JOURNAL_MODE": "journal_mode",
+    "SQLITE_SYNCHRONOUS": "synchronous",
+    "SQLITE_CACHE_SIZE": "cache_size",
+    "SQLITE_MMAP_SIZE": "mmap_size",
+    "SQLITE_TEMP_STORE": "temp_store",
+    "SQLITE_BUSY_TIMEOUT": "busy_timeout",
+}
+
+
+_CACHE_ENV = {
+    "RESPONSE_CACHE": "enabled",
+    "RESPONSE_CACHE_SIZE": "max_entries",
+}
+
+
+_RESPONSE_ENV = {
+    "FAST_JSON": "fast_json",
+}
+
+
+_METRICS_ENV = {
+    "METRICS": "enabled",
+}
+
+
+_QUERY_BUDGET_ENV = {
+    "QUERY_BUDGET": "mode",
+    "QUERY_BUDGET_DEFAULT": "default_budget",
+    "QUERY_N_PLUS_ONE": "n_plus_one_threshold",
+}
+
+
+def load_settings() -> Settings:
+    data = {}
+    config_path = os.getenv("APP_CONFIG")
+    if config_path:
+        with open(config_path, encoding="utf-8") as f:
+            data = json.load(f)
+
+    database = dict(data.get("database", {}))
+    for env_name, field in _DATABASE_ENV.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            database[field] = value
+    data["database"] = database
+
+    cache = dict(data.get("cache", {}))
+    for env_name, field in _CACHE_ENV.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            cache[field] = value
+    data["cache"] = cache
+
+    response = dict(data.get("response", {}))
+    for env_name, field in _RESPONSE_ENV.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            response[field] = value
+    data["response"] = response
+
+    metrics = dict(data.get("metrics", {}))
+    for env_name, field in _METRICS_ENV.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            metrics[field] = value
+    data["metrics"] = metrics
+
+    query_budget = dict(data.get("query_budget", {}))
+    for env_name, field in _QUERY_BUDGET_ENV.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            query_budget[field] = value
+    data["query_budget"] = query_budget
+
+    # pydantic 负责把环境变量字符串转换成 int / bool 并校验
+    return Settings.model_validate(data)
+
+
+settings = load_settings()
@@ -1,4 +1,11 @@
 from .task_crud import *
 from .note_crud import *
 from .tags_crud import *
-from .status_crud import *
\ No newline at end of file
+from .status_crud import *
+from .search_index import *
+from .stats_engine import *
+from .import_crud import *
+from .changes import *
+from .sync_crud import *
+from .note_store import *
+from .revision_crud import *
@@ -0,0 +1,29 @@
+# 批量操作的公共结构：每个请求项都返回一条结果，失败项不影响其它项
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+
+def batch_item(index: int, id=None, error=None):
+    return {"index": index, "id": id, "success": error is None, "error": error}
+
+
+def build_batch_result(results: list):
+    succeeded = sum(1 for item in results if item["success"])
+    return {
+        "success": succeeded == len(results),
+        "total_requested": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+
+def insert_rows_returning_ids(db: Session, model, rows: list) -> list:
+    """
+    用多行 INSERT ... RETURNING 写入 rows，返回与 rows 顺序一致的主键。
+    RETURNING 本身不保证行序，而 sort_by_parameter_order=True 会让 SQLite 退化为逐行 INSERT；
+    SQLite 在一条语句里按 VALUES 的顺序分配递增的 rowid，所以按 id 排序即得到输入顺序
+    """
+    if not rows:
+        return []
+    return sorted(db.execute(insert(model).returning(model.id), rows).scalars().all())
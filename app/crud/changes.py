@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import func, insert, select, delete
+from sqlalchemy.orm import Session, aliased
+from .. import models
+from ..events import stage_changes
+
+# 变更日志：crud 写操作在同一事务里追加 (kind, entity_id, deleted)；
+# SQLite 写事务串行执行，seq 的分配顺序与提交顺序一致，客户端按 seq 游标增量同步
+CHANGE_KINDS = ("task", "note", "tag")
+
+
+def record_changes(db: Session, kind: str, ids, deleted: bool = False):
+    """记录一批实体的新增 / 修改（deleted=False）或删除，同时登记提交后推送的变更事件；调用方负责 commit"""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return
+    stage_changes(db, kind, ids, deleted)
+    now = datetime.utcnow()
+    db.execute(insert(models.Change), [
+        {"kind": kind, "entity_id": entity_id, "deleted": deleted, "changed_at": now}
+        for entity_id in ids
+    ])
+
+
+def latest_change_seq(db: Session) -> int:
+    return db.query(func.max(models.Change.seq)).scalar() or 0
+
+
+def changes_since(db: Session, since: int = 0, limit: int = 1000):
+    """
+    seq > since 的变更，按实体合并为最后一次（只关心最终状态），按 seq 升序取 limit 条；
+    返回 [(kind, entity_id, deleted, seq), ...]
+    """
+    latest = (
+        select(models.Change.kind, models.Change.entity_id, func.max(models.Change.seq).label("seq"))
+        .where(models.Change.seq > since)
+        .group_by(models.Change.kind, models.Change.entity_id)
+        .subquery()
+    )
+    change = aliased(models.Change)
+    rows = db.execute(
+        select(latest.c.kind, latest.c.entity_id, change.deleted, latest.c.seq)
+        .join(change, change.seq == latest.c.seq)
+        .order_by(latest.c.seq)
+        .limit(limit)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def compact_changes(db: Session):
+    """删除已被同一实体的后续变更覆盖的行；只保留每个实体最后一次变更，不影响任何游标的同步结果"""
+    latest = select(func.max(models.Change.seq)).group_by(models.Change.kind, models.Change.entity_id)
+    result = db.execute(delete(models.Change).where(models.Change.seq.not_in(latest)))
+    db.commit()
+    return {"removed": result.rowcount, "latest_seq": latest_change_seq(db)}
@@ -0,0 +1,268 @@
+import csv
+import io
+import json
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from .. import models, schemas
+from .batch import insert_rows_returning_ids
+from .versions import bump_table_versions
+from .changes import record_changes
+from .status_crud import utc_to_local
+from .task_crud import insert_task_rows
+from .note_crud import insert_note_rows
+
+# 批量导入：逐行解析上传文件，每 IMPORT_CHUNK_SIZE 行一个事务，每张表一条多行 INSERT 写入；
+# 标签按名称解析，名称 -> id 的映射在导入开始时一次加载，缺失的标签随所在批次一起创建
+IMPORT_CHUNK_SIZE = 1000
+DEFAULT_TAG_COLOR = "#909399"
+
+_KINDS = {"task": "task", "tasks": "task", "note": "note", "notes": "note", "tag": "tag", "tags": "tag"}
+_ROW_SCHEMAS = {"task": schemas.TaskImportRow, "note": schemas.NoteImportRow}
+# 导出文件里的这些字段由数据库重新生成
+_IGNORED_FIELDS = ("id", "type", "count", "task_count", "note_count")
+
+
+class ImportProgress:
+    def __init__(self, import_id: str):
+        self.import_id = import_id
+        self.status = "running"
+        self.processed = 0
+        self.imported = {"tasks": 0, "notes": 0}
+        self.failed = 0
+        self.created_tags = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def add_error(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < schemas.IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self):
+        return {
+            "import_id": self.import_id,
+            "status": self.status,
+            "processed": self.processed,
+            "imported": dict(self.imported),
+            "failed": self.failed,
+            "created_tags": self.created_tags,
+            "errors": list(self.errors),
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+# 最近的导入进度（进程内），供导入过程中轮询
+_PROGRESS_LIMIT = 100
+_import_progress = OrderedDict()
+
+
+def start_import(import_id: Optional[str] = None) -> ImportProgress:
+    progress = ImportProgress(import_id or uuid.uuid4().hex)
+    _import_progress[progress.import_id] = progress
+    while len(_import_progress) > _PROGRESS_LIMIT:
+        _import_progress.popitem(last=False)
+    return progress
+
+
+def get_import_progress(import_id: str):
+    progress = _import_progress.get(import_id)
+    return progress.to_dict() if progress else None
+
+
+class TagNameMap:
+    """导入期间的标签名 -> id 映射"""
+
+    def __init__(self, db: Session):
+        self.reload(db)
+
+    def reload(self, db: Session):
+        self.ids = {name: tag_id for tag_id, name in db.query(models.Tag.id, models.Tag.name).order_by(models.Tag.id)}
+
+    def resolve(self, db: Session, colors: dict):
+        """确保 colors（{name: color}）里的标签都存在，返回本次新建的数量；调用方负责 commit"""
+        missing = [name for name in colors if name not in self.ids]
+        if not missing:
+            return 0
+        tag_ids = insert_rows_returning_ids(db, models.Tag, [
+            {"name": name, "color": colors[name] or DEFAULT_TAG_COLOR, "task_count": 0, "note_count": 0}
+            for name in missing
+        ])
+        self.ids.update(zip(missing, tag_ids))
+        record_changes(db, "tag", tag_ids)
+        return len(missing)
+
+
+def _tag_names(value):
+    """兼容 ["a", "b"]、导出格式 [{"name": "a", ...}] 以及 CSV 里的 JSON 字符串 / 逗号分隔"""
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            value = json.loads(value)
+        else:
+            return [name.strip() for name in value.split(",") if name.strip()]
+    names = []
+    for item in value:
+        name = item.get("name") if isinstance(item, dict) else item
+        if name:
+            names.append(str(name))
+    return names
+
+
+def _normalize_row(raw: dict) -> dict:
+    # CSV 的空单元格按未提供处理，使用默认值
+    row = {
+        key: value for key, value in raw.items()
+        if key and key not in _IGNORED_FIELDS and value not in (None, "")
+    }
+    if "tags" in row:
+        row["tags"] = _tag_names(row["tags"])
+    return row
+
+
+def _is_valid_text(raw: dict) -> bool:
+    """CSV 行里没有 surrogateescape 留下的非法字节（DictReader 多出的列以列表形式放在 None 键下）"""
+    for key, value in raw.items():
+        for text in (key, *(value if isinstance(value, list) else [value])):
+            if isinstance(text, str):
+                try:
+                    text.encode("utf-8")
+                except UnicodeEncodeError:
+                    return False
+    return True
+
+
+def iter_import_rows(fileobj, fmt: str, kind: Optional[str] = None):
+    """
+    逐行解析上传文件，产出 (行号, 类型, 原始字典)；无法解析的行产出 (行号, None, 错误信息)。
+    kind 为空时按每行的 type 字段区分（只支持 NDJSON，对应 /api/export/ 的合并导出）
+    """
+    if fmt == "csv":
+        # surrogateescape 让无法解码的字节留在所在行里，按行报错而不是中断整个导入
+        reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="surrogateescape", newline=""))
+        while True:
+            try:
+                raw = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # DictReader 只在成功读出一行后更新 line_num，出错时取底层 reader 的行号
+                yield reader.reader.line_num, None, f"Invalid CSV: {e}"
+                continue
+            if not _is_valid_text(raw):
+                yield reader.line_num, None, "Invalid UTF-8"
+                continue
+            yield reader.line_num, kind, raw
+
+    for line_no, line in enumerate(fileobj, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(raw, dict):
+            yield line_no, None, "Each line must be a JSON object"
+            continue
+        row_kind = kind or _KINDS.get(str(raw.get("type", "")).lower())
+        if row_kind is None:
+            yield line_no, None, "Missing or unknown type"
+            continue
+        yield line_no, row_kind, raw
+
+
+def import_next_chunk(db: Session, rows, tag_map: TagNameMap, progress: ImportProgress, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """
+    从 rows 迭代器取下一批并在一个事务里写入，返回本批处理的行数（0 表示已读完）
+    """
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+        return 0
+    progress.processed += len(chunk)
+
+    tag_colors = {}
+    tasks, notes = [], []
+    for line, kind, raw in chunk:
+        if kind is None:
+            progress.add_error(line, raw)
+            continue
+        try:
+            row = _normalize_row(raw)
+            if kind == "tag":
+                name = row.get("name")
+                if not name:
+                    raise ValueError("Tag name is required")
+                tag_colors[str(name)] = row.get("color")
+                continue
+            item = _ROW_SCHEMAS[kind].model_validate(row)
+        except ValidationError as e:
+            progress.add_error(line, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+        except ValueError as e:
+            progress.add_error(line, str(e))
+            continue
+        for name in item.tags:
+            tag_colors.setdefault(name, None)
+        (tasks if kind == "task" else notes).append((line, item))
+
+    now = datetime.utcnow()
+    try:
+        created_tags = tag_map.resolve(db, tag_colors)
+        if tasks:
+            insert_task_rows(db, [
+                {
+                    "title": item.title,
+                    "content": item.content,
+                    "status": item.status,
+                    "priority": item.priority,
+                    "deadline": item.deadline,
+                    "isPinned": item.isPinned,
+                    "createdAt": item.createdAt or now,
+                    "updatedAt": item.updatedAt or item.createdAt or now,
+                }
+                for _, item in tasks
+            ], [[tag_map.ids[name] for name in item.tags] for _, item in tasks],
+               event_times=[item.createdAt and utc_to_local(item.createdAt) for _, item in tasks])
+        if notes:
+            insert_note_rows(db, [
+                {
+                    "title": item.title,
+                    "content": item.content,
+                    "priority": models.PriorityEnum(item.priority.value),
+                    "status": models.StatusEnum(item.status.value),
+                    "isPinned": item.isPinned,
+                    "created_at": item.created_at or now,
+                    "updated_at": item.updated_at or item.created_at or now,
+                }
+                for _, item in notes
+            ], [[tag_map.ids[name] for name in item.tags] for _, item in notes])
+
+        touched = [table for table, rows_ in (("tasks", tasks), ("notes", notes)) if rows_]
+        if created_tags:
+            touched.append("tags")
+        if touched:
+            bump_table_versions(db, *touched)
+        db.commit()
+    except Exception as e:
+        # 整批回滚；本批新建的标签也一并撤销，重新加载名称映射
+        db.rollback()
+        tag_map.reload(db)
+        for line, _ in tasks + notes:
+            progress.add_error(line, f"Database error: {e}")
+        return len(chunk)
+
+    progress.created_tags += created_tags
+    progress.imported["tasks"] += len(tasks)
+    progress.imported["notes"] += len(notes)
+    return len(chunk)
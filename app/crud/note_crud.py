@@ -4,8 +4,88 @@ from datetime import datetime
 from fastapi import HTTPException
 from typing import Optional, List
 from sqlalchemy import func,or_, desc, asc
+from .search_index import fts_ranked_subquery, unindex_note, index_notes, unindex_notes
+from .batch import batch_item, build_batch_result, insert_rows_returning_ids
+from .versions import bump_table_versions
+from .changes import record_changes
+from .tags_crud import link_tags, unlink_tags, tags_by_owner, tag_filter_subquery
+from .revision_crud import record_note_revision, delete_note_revisions
+from .note_store import (
+    NOTE_SNIPPET_LENGTH, pack_note_content, save_note_blobs, delete_note_blobs, load_note_bodies, note_body,
+)
 
 
+def _apply_note_search(query, keyword: str):
+    """
+    优先使用 FTS5 索引过滤，返回 (query, bm25 排序列)；不可用时退回 LIKE，排序列为 None。
+    LIKE 只匹配行内正文，外部存储的长正文只匹配开头一段
+    """
+    hits = fts_ranked_subquery("notes", keyword)
+    if hits is not None:
+        return query.join(hits, models.Note.id == hits.c.id), hits.c.rank
+    return query.filter(
+        or_(
+            models.Note.title.ilike(f"%{keyword}%"),
+            models.Note.content.ilike(f"%{keyword}%")
+        )
+    ), None
+
+# 列表接口直接读取这些列（不构造 ORM 对象），标签另用一条查询批量取回；外部存储的正文按本页 id 一次读取
+_NOTE_COLUMNS = (
+    models.Note.id, models.Note.type, models.Note.title, models.Note.content, models.Note.priority,
+    models.Note.status, models.Note.isPinned, models.Note.created_at, models.Note.updated_at,
+    models.Note.content_external,
+)
+
+# 摘要视图：正文只在 SQL 里截取开头一段（外部存储的正文行内正好保留这一段），长度和哈希读存储列
+_NOTE_SUMMARY_COLUMNS = (
+    models.Note.id, models.Note.type, models.Note.title,
+    func.substr(models.Note.content, 1, NOTE_SNIPPET_LENGTH), models.Note.content_length, models.Note.content_hash,
+    models.Note.priority, models.Note.status, models.Note.isPinned, models.Note.created_at, models.Note.updated_at,
+)
+
+def _note_rows_to_dicts(db: Session, rows):
+    """把列查询结果转换成 NoteResponse 结构（字段顺序与响应模型一致）"""
+    tags = tags_by_owner(db, "note", [row[0] for row in rows])
+    bodies = load_note_bodies(db, [row[0] for row in rows if row[-1]])
+    return [
+        {
+            "id": note_id,
+            "type": note_type,
+            "title": title,
+            "content": bodies.get(note_id, content) if external else content,
+            "priority": priority.value if priority else "none",
+            "status": status.value if status else "done",
+            "isPinned": is_pinned,
+            "tags": tags.get(note_id, []),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+        for note_id, note_type, title, content, priority, status, is_pinned, created_at, updated_at, external in rows
+    ]
+
+def _note_summary_rows_to_dicts(db: Session, rows):
+    """摘要视图的列查询结果转换成 NoteSummaryResponse 结构"""
+    tags = tags_by_owner(db, "note", [row[0] for row in rows])
+    return [
+        {
+            "id": note_id,
+            "type": note_type,
+            "title": title,
+            "snippet": snippet or "",
+            "content_length": content_length,
+            "content_hash": content_hash,
+            "priority": priority.value if priority else "none",
+            "status": status.value if status else "done",
+            "isPinned": is_pinned,
+            "tags": tags.get(note_id, []),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+        for (note_id, note_type, title, snippet, content_length, content_hash,
+             priority, status, is_pinned, created_at, updated_at) in rows
+    ]
+
 def get_notes(
     db: Session,
     skip: int = 0,
@@ -14,27 +94,20 @@ def get_notes(
     tag_ids: Optional[List[int]] = None,
     pinned: Optional[bool] = None,
     sort_by: str = "updated_at",
-    order: str = "desc"
+    order: str = "desc",
+    tag_mode: str = "all",
+    view: str = "full"
 ):
+    """view=summary 时不返回正文，只给出开头片段、长度和哈希；完整正文通过 get_note 获取"""
     query = db.query(models.Note)
     
     # 搜索条件
     if search:
-        query = query.filter(
-            or_(
-                models.Note.title.ilike(f"%{search}%"),
-                models.Note.content.ilike(f"%{search}%")
-            )
-        )
+        query, _ = _apply_note_search(query, search)
     
-    # 标签筛选
+    # 标签筛选：一次分组半连接，all 要求包含全部标签，any 包含任意一个
     if tag_ids:
-        # 使用子查询找到包含指定标签的笔记
-        for tag_id in tag_ids:
-            subquery = db.query(models.NoteTag.note_id).filter(
-                models.NoteTag.tag_id == tag_id
-            ).subquery()
-            query = query.filter(models.Note.id.in_(subquery))
+        query = query.filter(models.Note.id.in_(tag_filter_subquery("note", tag_ids, tag_mode)))
     
     # 置顶筛选
     if pinned is not None:
@@ -54,28 +127,12 @@ def get_notes(
         # 默认：置顶优先，按更新时间倒序
         query = query.order_by(desc(models.Note.isPinned), desc(models.Note.updated_at))
     
-    # 预加载标签关联
-    query = query.options(joinedload(models.Note.tags).joinedload(models.NoteTag.tag))
-    notes = query.offset(skip).limit(limit).all()
-    
-    # 格式化返回数据
-    note_list = []
-    for note in notes:
-        note_dict = {
-            "id": note.id,
-            "type": note.type,
-            "title": note.title,
-            "content": note.content,
-            "priority": note.priority.value if note.priority else "none",
-            "status": note.status.value if note.status else "done",
-            "isPinned": note.isPinned,
-            "created_at": note.created_at,
-            "updated_at": note.updated_at,
-            "tags": [{"id": nt.tag.id, "name": nt.tag.name, "color": nt.tag.color} for nt in note.tags]
-        }
-        note_list.append(note_dict)
-    
-    return note_list
+    # 只读列，标签按本页 id 一次取回
+    if view == "summary":
+        rows = query.with_entities(*_NOTE_SUMMARY_COLUMNS).offset(skip).limit(limit).all()
+        return _note_summary_rows_to_dicts(db, rows)
+    rows = query.with_entities(*_NOTE_COLUMNS).offset(skip).limit(limit).all()
+    return _note_rows_to_dicts(db, rows)
 
 def get_note(db: Session, note_id: int):
     note = db.query(models.Note).options(
@@ -88,7 +145,7 @@ def get_note(db: Session, note_id: int):
         "id": note.id,
         "type": note.type,
         "title": note.title,
-        "content": note.content,
+        "content": note_body(db, note),
         "priority": note.priority.value if note.priority else "medium",
         "status": note.status.value if note.status else "done",
         "isPinned": note.isPinned,
@@ -100,8 +157,14 @@ def get_note(db: Session, note_id: int):
 
 # 笔记
 def create_note(db: Session, note: schemas.NoteCreate):
-    db_note = models.Note(title=note.title, content=note.content)
+    columns, blob = pack_note_content(note.content)
+    db_note = models.Note(title=note.title, **columns)
     db.add(db_note)
+    db.flush()
+    save_note_blobs(db, {db_note.id: blob})
+    index_notes(db, [(db_note.id, db_note.title, note.content)])
+    record_changes(db, "note", [db_note.id])
+    bump_table_versions(db, "notes")
     db.commit()
     db.refresh(db_note)
 
@@ -110,9 +173,10 @@ def create_note(db: Session, note: schemas.NoteCreate):
         tags = db.query(models.Tag).filter(models.Tag.id.in_(note.tags)).all()
         if len(tags) != len(note.tags):
             raise HTTPException(status_code=400, detail="Invalid tag ID(s)")
-        for tag in tags:
-            note_tag = models.NoteTag(note_id=db_note.id, tag_id=tag.id)
-            db.add(note_tag)
+        # 关联写入与标签计数在同一事务
+        link_tags(db, "note", [(db_note.id, tag.id) for tag in tags])
+        record_changes(db, "note", [db_note.id])
+        bump_table_versions(db, "notes")
         db.commit()
 
     return get_note(db, db_note.id)
@@ -125,23 +189,40 @@ def update_note(db: Session, note_id: int, note_update: schemas.NoteUpdate):
     # 更新标签关联
     update_data = note_update.model_dump(exclude_unset=True)  
     if "tags" in update_data:
-        # 删除现有标签关联
-        db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete()
+        # 删除现有标签关联（同时扣减标签计数）
+        unlink_tags(db, "note", [note_id])
         # 添加新的标签关联
         if note_update.tags:
             tags = db.query(models.Tag).filter(models.Tag.id.in_(note_update.tags)).all()
             if len(tags) != len(note_update.tags):
+                db.rollback()
                 raise HTTPException(status_code=400, detail="Invalid tag ID(s)")
-            for tag in tags:
-                note_tag = models.NoteTag(note_id=note_id, tag_id=tag.id)
-                db.add(note_tag)
+            link_tags(db, "note", [(note_id, tag.id) for tag in tags])
     
-    # 更新其他字段
+    # 修改标题或正文时记录修订，需要修改前的状态
+    track_revision = "title" in update_data or "content" in update_data
+    if track_revision:
+        old_title, old_content, old_time = db_note.title, note_body(db, db_note), db_note.updated_at
+
+    # 更新其他字段（正文经 pack_note_content 拆分，长正文写入外部存储）
     for key, value in update_data.items():
-        if key != "tags":  # 标签已单独处理
+        if key not in ("tags", "content"):  # 标签已单独处理
             setattr(db_note, key, value)
+    if "content" in update_data:
+        content = update_data["content"]
+        columns, blob = pack_note_content(content)
+        for key, value in columns.items():
+            setattr(db_note, key, value)
+        save_note_blobs(db, {note_id: blob})
+    elif track_revision:
+        content = old_content
     
     db_note.updated_at = datetime.now()
+    if track_revision:
+        index_notes(db, [(note_id, db_note.title, content)])
+        record_note_revision(db, note_id, old_title, old_content, db_note.title, content, old_time)
+    record_changes(db, "note", [note_id])
+    bump_table_versions(db, "notes")
     db.commit()
     db.refresh(db_note)
     
@@ -154,10 +235,15 @@ def delete_note(db: Session, note_id: int):
         return False
     
     # 先删除所有相关的中间表记录
-    db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete()
+    unlink_tags(db, "note", [note_id])
     
     # 然后删除笔记本身
+    delete_note_blobs(db, [note_id])
+    delete_note_revisions(db, [note_id])
     db.delete(db_note)
+    unindex_note(db, note_id)
+    record_changes(db, "note", [note_id], deleted=True)
+    bump_table_versions(db, "notes")
     db.commit()
     return True
 
@@ -168,6 +254,8 @@ def toggle_pin_note(db: Session, note_id: int):
     
     db_note.isPinned = not db_note.isPinned
     db_note.updated_at = datetime.now()
+    record_changes(db, "note", [note_id])
+    bump_table_versions(db, "notes")
     db.commit()
     db.refresh(db_note)
     
@@ -175,14 +263,10 @@ def toggle_pin_note(db: Session, note_id: int):
 
 def search_notes(db: Session, keyword: Optional[str] = None, tag: Optional[int] = None):
     query = db.query(models.Note)
+    rank = None
     
     if keyword:
-        query = query.filter(
-            or_(
-                models.Note.title.ilike(f"%{keyword}%"),
-                models.Note.content.ilike(f"%{keyword}%")
-            )
-        )
+        query, rank = _apply_note_search(query, keyword)
     
     if tag:
         # 通过中间表找到包含指定标签的笔记
@@ -193,8 +277,13 @@ def search_notes(db: Session, keyword: Optional[str] = None, tag: Optional[int]
     
     # 预加载标签关联
     query = query.options(joinedload(models.Note.tags).joinedload(models.NoteTag.tag))
-    # 置顶优先，按更新时间倒序
-    notes = query.order_by(desc(models.Note.isPinned), desc(models.Note.updated_at)).all()
+    # 置顶优先；有全文索引时按 bm25 相关度，否则按更新时间倒序
+    if rank is not None:
+        query = query.order_by(desc(models.Note.isPinned), rank)
+    else:
+        query = query.order_by(desc(models.Note.isPinned), desc(models.Note.updated_at))
+    notes = query.all()
+    bodies = load_note_bodies(db, [note.id for note in notes if note.content_external])
     
     note_list = []
     for note in notes:
@@ -202,7 +291,7 @@ def search_notes(db: Session, keyword: Optional[str] = None, tag: Optional[int]
             "id": note.id,
             "type": note.type,
             "title": note.title,
-            "content": note.content,
+            "content": bodies.get(note.id, note.content),
             "priority": note.priority.value if note.priority else "none", 
             "status": note.status.value if note.status else "done",
             "isPinned": note.isPinned,
@@ -212,4 +301,123 @@ def search_notes(db: Session, keyword: Optional[str] = None, tag: Optional[int]
         }
         note_list.append(note_dict)
     
-    return note_list
\ No newline at end of file
+    return note_list
+
+# ========== 批量操作：每张表一条集合语句，整批一个事务 ==========
+def insert_note_rows(db: Session, rows: List[dict], row_tag_ids: List[List[int]]):
+    """
+    一条多行 INSERT 写入已校验的笔记列字典，并维护标签关联和全文索引；
+    row_tag_ids 与 rows 一一对应。返回新笔记 id，调用方负责 bump 版本号和 commit
+    """
+    packed = [pack_note_content(row["content"]) for row in rows]
+    note_ids = insert_rows_returning_ids(db, models.Note, [{**row, **columns} for row, (columns, _) in zip(rows, packed)])
+    save_note_blobs(db, {note_id: blob for note_id, (_, blob) in zip(note_ids, packed) if blob is not None})
+
+    link_tags(db, "note", [
+        (note_id, tag_id)
+        for note_id, tag_ids in zip(note_ids, row_tag_ids)
+        for tag_id in dict.fromkeys(tag_ids)
+    ])
+
+    index_notes(db, [(note_id, row["title"], row["content"]) for note_id, row in zip(note_ids, rows)])
+    record_changes(db, "note", note_ids)
+    return note_ids
+
+def batch_create_notes(db: Session, items: List[schemas.NoteCreate]):
+    results = [None] * len(items)
+
+    # 一次查询校验整批引用到的标签
+    tag_ids = {tag_id for item in items for tag_id in (item.tags or [])}
+    valid_tag_ids = set()
+    if tag_ids:
+        valid_tag_ids = {tag_id for (tag_id,) in db.query(models.Tag.id).filter(models.Tag.id.in_(tag_ids))}
+
+    now = datetime.utcnow()
+    rows = []
+    row_indexes = []
+    for index, item in enumerate(items):
+        invalid_ids = set(item.tags or []) - valid_tag_ids
+        if invalid_ids:
+            results[index] = batch_item(index, error=f"Invalid tag ID(s): {sorted(invalid_ids)}")
+            continue
+        rows.append({
+            "title": item.title,
+            "content": item.content,
+            "priority": models.PriorityEnum((item.priority or schemas.PriorityEnum.NONE).value),
+            "status": models.StatusEnum((item.status or schemas.StatusEnum.DONE).value),
+            "isPinned": bool(item.isPinned),
+            "created_at": now,
+            "updated_at": now
+        })
+        row_indexes.append(index)
+
+    if rows:
+        note_ids = insert_note_rows(db, rows, [items[index].tags or [] for index in row_indexes])
+        for note_id, index in zip(note_ids, row_indexes):
+            results[index] = batch_item(index, id=note_id)
+        bump_table_versions(db, "notes")
+
+    db.commit()
+    return build_batch_result(results)
+
+def batch_update_notes(db: Session, update: schemas.NoteBatchUpdate):
+    values = update.model_dump(exclude_unset=True)
+    ids = values.pop("ids")
+    values = {key: value for key, value in values.items() if value is not None}
+    if "priority" in values:
+        values["priority"] = models.PriorityEnum(values["priority"].value)
+    if "status" in values:
+        values["status"] = models.StatusEnum(values["status"].value)
+
+    existing = {
+        note_id for (note_id,) in db.query(models.Note.id).filter(models.Note.id.in_(ids))
+    }
+    if values and existing:
+        values["updated_at"] = datetime.now()
+        db.query(models.Note).filter(models.Note.id.in_(list(existing))).update(
+            values, synchronize_session=False
+        )
+        record_changes(db, "note", existing)
+        bump_table_versions(db, "notes")
+        db.commit()
+
+    return build_batch_result([
+        batch_item(index, id=note_id, error=None if note_id in existing else "Note not found")
+        for index, note_id in enumerate(ids)
+    ])
+
+def batch_delete_notes(db: Session, ids: List[int]):
+    existing = {
+        note_id for (note_id,) in db.query(models.Note.id).filter(models.Note.id.in_(ids))
+    }
+    if existing:
+        found_ids = list(existing)
+        unlink_tags(db, "note", found_ids)
+        delete_note_blobs(db, found_ids)
+        delete_note_revisions(db, found_ids)
+        db.query(models.Note).filter(models.Note.id.in_(found_ids)).delete(synchronize_session=False)
+        unindex_notes(db, found_ids)
+        record_changes(db, "note", found_ids, deleted=True)
+        bump_table_versions(db, "notes")
+        db.commit()
+
+    return build_batch_result([
+        batch_item(index, id=note_id, error=None if note_id in existing else "Note not found")
+        for index, note_id in enumerate(ids)
+    ])
+
+def get_notes_by_ids(db: Session, note_ids: List[int]):
+    """按 id 批量取笔记（列查询 + 批量标签），不存在的 id 忽略"""
+    rows = []
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        rows.extend(db.query(models.Note).filter(models.Note.id.in_(chunk)).with_entities(*_NOTE_COLUMNS).all())
+    return _note_rows_to_dicts(db, rows)
+
+# ========== 导出：按主键分批读取，每批连同标签一起返回 ==========
+def export_notes_batch(db: Session, after_id: int = 0, limit: int = 1000, updated_since: Optional[datetime] = None):
+    query = db.query(models.Note).filter(models.Note.id > after_id)
+    if updated_since is not None:
+        query = query.filter(models.Note.updated_at >= updated_since)
+    rows = query.order_by(models.Note.id).limit(limit).with_entities(*_NOTE_COLUMNS).all()
+    return _note_rows_to_dicts(db, rows)
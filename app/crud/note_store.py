@@ -0,0 +1,129 @@
+import hashlib
+import zlib
+from typing import Optional
+from sqlalchemy import insert, delete, select, text
+from sqlalchemy.orm import Session
+from .. import models
+
+# 笔记正文存储：短正文留在 notes.content；超过 NOTE_INLINE_LIMIT 字节的正文压缩后放到 note_contents 表，
+# notes.content 只保留开头 NOTE_SNIPPET_LENGTH 个字符并标记 content_external。
+# 列表扫描、摘要视图和 LIKE 回退只读这段开头，完整正文只在返回 content 时按 id 批量读取解压
+NOTE_INLINE_LIMIT = 1024
+NOTE_SNIPPET_LENGTH = 200
+_ZLIB_LEVEL = 6
+
+
+def note_content_digest(content: Optional[str]):
+    """正文的 content_length / content_hash 列值，写正文时一并更新"""
+    content = content or ""
+    return {
+        "content_length": len(content),
+        "content_hash": hashlib.sha1(content.encode("utf-8")).hexdigest(),
+    }
+
+
+def _compress(raw: bytes):
+    data = zlib.compress(raw, _ZLIB_LEVEL)
+    # 压缩不划算的正文（已压缩过的内容、很短的随机文本）原样存放，仍然移出 notes 表
+    if len(data) >= len(raw):
+        return "raw", raw
+    return "zlib", data
+
+
+def _decompress(codec: str, data: bytes) -> str:
+    raw = zlib.decompress(data) if codec == "zlib" else data
+    return raw.decode("utf-8")
+
+
+def pack_note_content(content: Optional[str]):
+    """
+    把正文拆成 notes 表的列值和外部存储的压缩数据，返回 (columns, blob)；
+    blob 为 None 表示正文留在行内
+    """
+    content = content or ""
+    columns = note_content_digest(content)
+    raw = content.encode("utf-8")
+    if len(raw) <= NOTE_INLINE_LIMIT:
+        return {**columns, "content": content, "content_external": False}, None
+    return {**columns, "content": content[:NOTE_SNIPPET_LENGTH], "content_external": True}, _compress(raw)
+
+
+def save_note_blobs(db: Session, blobs: dict):
+    """按 {note_id: blob 或 None} 覆盖外部存储，None 表示删除（正文改短后回到行内）；调用方负责 commit"""
+    if not blobs:
+        return
+    delete_note_blobs(db, list(blobs))
+    rows = [
+        {"note_id": note_id, "codec": blob[0], "data": blob[1]}
+        for note_id, blob in blobs.items() if blob is not None
+    ]
+    if rows:
+        db.execute(insert(models.NoteContent), rows)
+
+
+def delete_note_blobs(db: Session, note_ids: list):
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        db.execute(delete(models.NoteContent).where(models.NoteContent.note_id.in_(chunk)))
+
+
+def load_note_bodies(db: Session, note_ids: list):
+    """按 id 批量读取并解压外部存储的正文，返回 {note_id: content}；不在外部存储的 id 不出现在结果里"""
+    bodies = {}
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        rows = db.execute(
+            select(models.NoteContent.note_id, models.NoteContent.codec, models.NoteContent.data)
+            .where(models.NoteContent.note_id.in_(chunk))
+        )
+        for note_id, codec, data in rows:
+            bodies[note_id] = _decompress(codec, data)
+    return bodies
+
+
+def note_body(db: Session, note: models.Note) -> str:
+    """ORM 对象的完整正文"""
+    if note.content_external:
+        return load_note_bodies(db, [note.id]).get(note.id, note.content)
+    return note.content
+
+
+def compact_note_contents(conn, batch_size: int = 500):
+    """
+    把超过 NOTE_INLINE_LIMIT 的行内正文移到外部存储（迁移和维护接口共用，conn 可以是 Connection 或 Session）；
+    返回移动的笔记数和正文字节数的变化，调用方负责提交
+    """
+    report = {"moved": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, content FROM notes WHERE id > :last_id AND NOT content_external "
+                "AND length(CAST(content AS BLOB)) > :limit ORDER BY id LIMIT :batch"
+            ),
+            {"last_id": last_id, "limit": NOTE_INLINE_LIMIT, "batch": batch_size}
+        ).all()
+        if not rows:
+            break
+        updates, blobs = [], []
+        for note_id, content in rows:
+            columns, (codec, data) = pack_note_content(content)
+            updates.append({"id": note_id, "content": columns["content"]})
+            blobs.append({"note_id": note_id, "codec": codec, "data": data})
+            report["bytes_before"] += len(content.encode("utf-8"))
+            report["bytes_after"] += len(columns["content"].encode("utf-8")) + len(data)
+        conn.execute(delete(models.NoteContent).where(models.NoteContent.note_id.in_([row[0] for row in rows])))
+        conn.execute(insert(models.NoteContent), blobs)
+        conn.execute(text("UPDATE notes SET content = :content, content_external = 1 WHERE id = :id"), updates)
+        report["moved"] += len(rows)
+        last_id = rows[-1][0]
+    report["saved"] = report["bytes_before"] - report["bytes_after"]
+    return report
+
+
+def compact_note_storage(db: Session):
+    """维护接口：压缩仍在行内的长正文（如调小 NOTE_INLINE_LIMIT 之后）"""
+    report = compact_note_contents(db)
+    db.commit()
+    return report
+
@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime, date
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+# 游标（keyset）分页：游标 = 排序键的值 + id，对客户端不透明
+def encode_cursor(values: list) -> str:
+    payload = []
+    for value in values:
+        if isinstance(value, datetime):
+            payload.append({"dt": value.isoformat()})
+        elif isinstance(value, date):
+            payload.append({"d": value.isoformat()})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("cursor size mismatch")
+        values = []
+        for value in payload:
+            if isinstance(value, dict) and "dt" in value:
+                values.append(datetime.fromisoformat(value["dt"]))
+            elif isinstance(value, dict) and "d" in value:
+                values.append(date.fromisoformat(value["d"]))
+            else:
+                values.append(value)
+        return values
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(columns: list, values: list, descending: bool):
+    """
+    生成 (col1, col2, ...) < / > (v1, v2, ...) 的行值比较，
+    SQLite 可以直接用复合索引做范围扫描，翻页成本与深度无关
+    """
+    row = tuple_(*columns)
+    bound = tuple_(*values)
+    return row < bound if descending else row > bound
@@ -0,0 +1,185 @@
+import json
+import zlib
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Optional
+from sqlalchemy import func, insert, delete
+from sqlalchemy.orm import Session
+from .. import models
+from .note_store import note_content_digest
+
+# 笔记修订历史：每次修改标题或正文追加一个修订，大多数修订只存与上一修订的行级差异（delta），
+# 每 REVISION_SNAPSHOT_INTERVAL 个修订存一次完整快照，重建任意修订最多应用 INTERVAL - 1 个 delta。
+# 历史从第一次修改开始记录：第一次修改前先把修改前的状态存为快照，从未修改过的笔记不占空间
+REVISION_SNAPSHOT_INTERVAL = 16
+_ZLIB_LEVEL = 6
+
+
+def _make_delta(old: str, new: str):
+    """
+    按行比较，返回把 old 变成 new 的操作列表：
+    [n] 复制 old 接下来的 n 行，[-n] 跳过 old 的 n 行，"文本" 插入新内容
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(-(i2 - i1))
+        if j2 > j1:
+            ops.append("".join(new_lines[j1:j2]))
+    return ops
+
+
+def _apply_delta(old: str, ops) -> str:
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    position = 0
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op >= 0:
+            parts.extend(old_lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(parts)
+
+
+def _encode(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), _ZLIB_LEVEL)
+
+
+def _decode(data: bytes):
+    return json.loads(zlib.decompress(data))
+
+
+def _latest_revision(db: Session, note_id: int):
+    return db.query(func.max(models.NoteRevision.revision)).filter(
+        models.NoteRevision.note_id == note_id
+    ).scalar()
+
+
+def _last_snapshot(db: Session, note_id: int, revision: int) -> int:
+    return db.query(func.max(models.NoteRevision.revision)).filter(
+        models.NoteRevision.note_id == note_id,
+        models.NoteRevision.revision <= revision,
+        models.NoteRevision.kind == "snapshot",
+    ).scalar()
+
+
+def _revision_row(note_id: int, revision: int, kind: str, data: bytes, title: str, content: str, created_at):
+    return {
+        "note_id": note_id,
+        "revision": revision,
+        "kind": kind,
+        "data": data,
+        "title": title,
+        **note_content_digest(content),
+        "created_at": created_at,
+    }
+
+
+def record_note_revision(db: Session, note_id: int, old_title: str, old_content: str,
+                         new_title: str, new_content: str, old_time: Optional[datetime] = None):
+    """
+    在 update_note 的事务里调用：old_* 为修改前的状态，new_* 为修改后的状态；调用方负责 commit
+    """
+    old_content = old_content or ""
+    new_content = new_content or ""
+    if old_title == new_title and old_content == new_content:
+        return
+
+    rows = []
+    latest = _latest_revision(db, note_id)
+    if latest is None:
+        # 第一次修改：先把修改前的状态存为快照
+        rows.append(_revision_row(
+            note_id, 1, "snapshot", _encode(old_content), old_title, old_content, old_time or datetime.now()
+        ))
+        revision, snapshot_revision = 2, 1
+    else:
+        revision = latest + 1
+        snapshot_revision = _last_snapshot(db, note_id, latest)
+
+    snapshot = _encode(new_content)
+    kind, data = "snapshot", snapshot
+    if revision - snapshot_revision < REVISION_SNAPSHOT_INTERVAL:
+        delta = _encode(_make_delta(old_content, new_content))
+        # 改动比整篇还大时（如整篇替换）直接存快照
+        if len(delta) < len(snapshot):
+            kind, data = "delta", delta
+    rows.append(_revision_row(note_id, revision, kind, data, new_title, new_content, datetime.now()))
+    db.execute(insert(models.NoteRevision), rows)
+
+
+def delete_note_revisions(db: Session, note_ids: list):
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        db.execute(delete(models.NoteRevision).where(models.NoteRevision.note_id.in_(chunk)))
+
+
+def get_note_revisions(db: Session, note_id: int):
+    """笔记的修订列表（不含正文），按修订号倒序；笔记不存在时返回 None"""
+    if db.query(models.Note.id).filter(models.Note.id == note_id).first() is None:
+        return None
+    rows = (
+        db.query(
+            models.NoteRevision.revision, models.NoteRevision.kind, models.NoteRevision.title,
+            models.NoteRevision.content_length, models.NoteRevision.content_hash,
+            func.length(models.NoteRevision.data), models.NoteRevision.created_at,
+        )
+        .filter(models.NoteRevision.note_id == note_id)
+        .order_by(models.NoteRevision.revision.desc())
+        .all()
+    )
+    return [
+        {
+            "revision": revision,
+            "kind": kind,
+            "title": title,
+            "content_length": content_length,
+            "content_hash": content_hash,
+            "stored_bytes": stored_bytes,
+            "created_at": created_at,
+        }
+        for revision, kind, title, content_length, content_hash, stored_bytes, created_at in rows
+    ]
+
+
+def get_note_revision(db: Session, note_id: int, revision: int):
+    """从不晚于 revision 的最近快照开始依次应用 delta，重建指定修订；不存在时返回 None"""
+    snapshot_revision = _last_snapshot(db, note_id, revision)
+    if snapshot_revision is None:
+        return None
+    rows = (
+        db.query(models.NoteRevision)
+        .filter(
+            models.NoteRevision.note_id == note_id,
+            models.NoteRevision.revision >= snapshot_revision,
+            models.NoteRevision.revision <= revision,
+        )
+        .order_by(models.NoteRevision.revision)
+        .all()
+    )
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    content = _decode(rows[0].data)
+    for row in rows[1:]:
+        content = _apply_delta(content, _decode(row.data))
+    target = rows[-1]
+    return {
+        "note_id": note_id,
+        "revision": revision,
+        "title": target.title,
+        "content": content,
+        "content_length": target.content_length,
+        "content_hash": target.content_hash,
+        "created_at": target.created_at,
+        "deltas_applied": len(rows) - 1,
+    }
@@ -0,0 +1,199 @@
+import re
+from typing import Optional
+from sqlalchemy import text, bindparam, Integer, Float
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from .. import models
+from .note_store import load_note_bodies
+
+# FTS5 全文索引：notes_fts / tasks_fts 的 rowid 与业务表 id 一致
+# 由 crud 写函数在同一事务里同步维护；SQLite 没有编译 FTS5 时自动退回 LIKE 搜索
+FTS_TABLES = {
+    "notes": "notes_fts",
+    "tasks": "tasks_fts",
+}
+
+_fts_enabled = False
+
+# 中日韩字符之间没有空格，unicode61 分词器会把整段当成一个词；
+# 写入和查询前在每个字之间补空格，使单字成为词元，短语查询即可匹配任意位置
+_CJK_RE = re.compile("([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff])")
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_enabled() -> bool:
+    return _fts_enabled
+
+
+def init_search_index(engine):
+    """启动时创建 FTS5 虚拟表；新建的索引会从现有数据回填"""
+    global _fts_enabled
+    if engine.dialect.name != "sqlite":
+        _fts_enabled = False
+        return False
+
+    created = []
+    try:
+        with engine.begin() as conn:
+            for table in FTS_TABLES.values():
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": table}
+                ).first()
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {table} USING fts5("
+                        "title, content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                    ))
+                    created.append(table)
+    except OperationalError:
+        # 未编译 FTS5 模块
+        _fts_enabled = False
+        return False
+
+    _fts_enabled = True
+    if created:
+        with Session(bind=engine) as db:
+            rebuild_search_index(db)
+    return True
+
+
+def _fts_text(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return _CJK_RE.sub(r" \1 ", value)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """把用户输入转成 FTS5 MATCH 表达式：每个词前缀匹配，多个词之间为 AND"""
+    parts = []
+    for term in _TERM_RE.findall(query or ""):
+        tokens = _fts_text(term).split()
+        # 双引号包成短语，避免用户输入被解析成 FTS5 语法
+        parts.append('"' + " ".join(tokens) + '"*')
+    if not parts:
+        return None
+    return " ".join(parts)
+
+
+def _index_row(db: Session, table: str, row_id: int, title: Optional[str], content: Optional[str]):
+    db.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), {"id": row_id})
+    db.execute(
+        text(f"INSERT INTO {table} (rowid, title, content) VALUES (:id, :title, :content)"),
+        {"id": row_id, "title": _fts_text(title), "content": _fts_text(content)}
+    )
+
+
+def _index_rows(db: Session, table: str, rows: list):
+    """批量写入索引，rows 为 [(id, title, content), ...]"""
+    if not rows:
+        return
+    _unindex_rows(db, table, [row[0] for row in rows])
+    db.execute(
+        text(f"INSERT INTO {table} (rowid, title, content) VALUES (:id, :title, :content)"),
+        [{"id": row_id, "title": _fts_text(title), "content": _fts_text(content)} for row_id, title, content in rows]
+    )
+
+
+def _unindex_rows(db: Session, table: str, ids: list):
+    if ids:
+        db.execute(
+            text(f"DELETE FROM {table} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": list(ids)}
+        )
+
+
+def index_task(db: Session, task: models.Task):
+    if _fts_enabled:
+        _index_row(db, FTS_TABLES["tasks"], task.id, task.title, task.content)
+
+
+def unindex_task(db: Session, task_id: int):
+    if _fts_enabled:
+        db.execute(text(f"DELETE FROM {FTS_TABLES['tasks']} WHERE rowid = :id"), {"id": task_id})
+
+
+def index_note(db: Session, note: models.Note):
+    if _fts_enabled:
+        _index_row(db, FTS_TABLES["notes"], note.id, note.title, note.content)
+
+
+def unindex_note(db: Session, note_id: int):
+    if _fts_enabled:
+        db.execute(text(f"DELETE FROM {FTS_TABLES['notes']} WHERE rowid = :id"), {"id": note_id})
+
+
+def index_tasks(db: Session, rows: list):
+    if _fts_enabled:
+        _index_rows(db, FTS_TABLES["tasks"], rows)
+
+
+def unindex_tasks(db: Session, task_ids: list):
+    if _fts_enabled:
+        _unindex_rows(db, FTS_TABLES["tasks"], task_ids)
+
+
+def index_notes(db: Session, rows: list):
+    if _fts_enabled:
+        _index_rows(db, FTS_TABLES["notes"], rows)
+
+
+def unindex_notes(db: Session, note_ids: list):
+    if _fts_enabled:
+        _unindex_rows(db, FTS_TABLES["notes"], note_ids)
+
+
+def fts_ranked_subquery(kind: str, query: str):
+    """
+    返回 (id, rank) 子查询，rank 为 bm25 得分（越小越相关，标题权重更高）
+    FTS5 不可用或查询里没有可检索的词时返回 None，调用方退回 LIKE
+    """
+    if not _fts_enabled:
+        return None
+    match = build_match_query(query)
+    if match is None:
+        return None
+    table = FTS_TABLES[kind]
+    return text(
+        f"SELECT rowid AS id, bm25({table}, 10.0, 1.0) AS rank FROM {table} WHERE {table} MATCH :match"
+    ).bindparams(match=match).columns(id=Integer, rank=Float).subquery(f"{table}_hits")
+
+
+def rebuild_search_index(db: Session, batch_size: int = 1000):
+    """清空并从 tasks / notes 表重建全文索引，返回各自写入的行数"""
+    if not _fts_enabled:
+        return {"fts": False, "tasks": 0, "notes": 0}
+
+    counts = {"fts": True}
+    sources = (
+        ("tasks", models.Task),
+        ("notes", models.Note),
+    )
+    for kind, model in sources:
+        table = FTS_TABLES[kind]
+        db.execute(text(f"DELETE FROM {table}"))
+        insert = text(f"INSERT INTO {table} (rowid, title, content) VALUES (:id, :title, :content)")
+        total = 0
+        last_id = 0
+        # 按主键分批读取，内存占用与表大小无关
+        while True:
+            rows = (
+                db.query(model.id, model.title, model.content)
+                .filter(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            # 外部存储的长正文行内只有开头一段，从 note_contents 取完整正文
+            bodies = load_note_bodies(db, [row[0] for row in rows]) if kind == "notes" else {}
+            db.execute(insert, [
+                {"id": row_id, "title": _fts_text(title), "content": _fts_text(bodies.get(row_id, content))}
+                for row_id, title, content in rows
+            ])
+            total += len(rows)
+            last_id = rows[-1][0]
+        counts[kind] = total
+    db.commit()
+    return counts
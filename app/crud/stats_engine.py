@@ -0,0 +1,96 @@
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from .. import models, schemas
+
+# 统计引擎：一条 GROUP BY status, priority 聚合同时得到今日和优先级两块数据，
+# 只取聚合结果，不加载任务行
+STATUS_FIELDS = {"done": "completed", "doing": "in_progress", "todo": "remaining"}
+PRIORITY_LEVELS = ("high", "medium", "low")
+
+
+def empty_priority_stats():
+    return {
+        level: {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0}
+        for level in PRIORITY_LEVELS
+    }
+
+
+def has_stats_filters(filters: Optional[schemas.StatsFilter]) -> bool:
+    if filters is None:
+        return False
+    return any(value is not None for value in filters.model_dump().values())
+
+
+def _apply_stats_filters(stmt, filters: schemas.StatsFilter):
+    task = models.Task
+    if filters.tag is not None:
+        stmt = stmt.where(task.id.in_(
+            select(models.TaskTag.task_id).where(models.TaskTag.tag_id == filters.tag)
+        ))
+    if filters.deadline_from is not None:
+        stmt = stmt.where(task.deadline >= filters.deadline_from)
+    if filters.deadline_to is not None:
+        stmt = stmt.where(task.deadline <= filters.deadline_to)
+    # 日期区间按天包含两端
+    if filters.created_from is not None:
+        stmt = stmt.where(task.createdAt >= filters.created_from)
+    if filters.created_to is not None:
+        stmt = stmt.where(task.createdAt < filters.created_to + timedelta(days=1))
+    if filters.updated_from is not None:
+        stmt = stmt.where(task.updatedAt >= filters.updated_from)
+    if filters.updated_to is not None:
+        stmt = stmt.where(task.updatedAt < filters.updated_to + timedelta(days=1))
+    return stmt
+
+
+def aggregate_task_stats(db: Session, filters: Optional[schemas.StatsFilter] = None):
+    """
+    在数据库里按 (status, priority) 分组计数，返回与 DailyStat 相同结构的计数器：
+    completed / in_progress / remaining / total / priority_stats
+    """
+    stmt = select(
+        models.Task.status,
+        models.Task.priority,
+        func.count(models.Task.id)
+    ).group_by(models.Task.status, models.Task.priority)
+    if has_stats_filters(filters):
+        stmt = _apply_stats_filters(stmt, filters)
+
+    counters = {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0}
+    priority_stats = empty_priority_stats()
+    for status, priority, count in db.execute(stmt):
+        field = STATUS_FIELDS.get(status)
+        if field:
+            counters[field] += count
+        counters["total"] += count
+        if priority in PRIORITY_LEVELS:
+            if field:
+                priority_stats[priority][field] += count
+            priority_stats[priority]["total"] += count
+
+    counters["priority_stats"] = priority_stats
+    return counters
+
+
+def format_stat_blocks(counters: dict):
+    """把计数器转换成 StatsResponse 里的 today 和 priority 两块"""
+    priority = []
+    for level, stats in (counters.get("priority_stats") or {}).items():
+        priority.append({
+            "level": level,
+            "completed": stats.get("completed", 0),
+            "inProgress": stats.get("in_progress", 0),
+            "remaining": stats.get("remaining", 0),
+            "total": stats.get("total", 0)
+        })
+    return {
+        "today": {
+            "completed": counters.get("completed", 0),
+            "inProgress": counters.get("in_progress", 0),
+            "remaining": counters.get("remaining", 0),
+            "total": counters.get("total", 0)
+        },
+        "priority": priority
+    }
@@ -1,16 +1,36 @@
+import calendar
+import copy
 from sqlalchemy.orm import Session, aliased, joinedload 
 from .. import models, schemas
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, date as date_type
 from fastapi import HTTPException
 from typing import Optional, List
-from sqlalchemy import func,or_, desc, asc
+from sqlalchemy import func,or_, desc, asc, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..events import stage_tables
+from .stats_engine import (
+    STATUS_FIELDS, PRIORITY_LEVELS, empty_priority_stats,
+    aggregate_task_stats, format_stat_blocks, has_stats_filters
+)
 
+# DailyStat 上的标量计数器，priority_stats 的每个优先级桶也是这四项
+STAT_COUNTERS = ("completed", "in_progress", "remaining", "total")
 
-def get_all_stats(db: Session):
+
+def get_stat_blocks(db: Session, filters: Optional[schemas.StatsFilter] = None):
+    """
+    今日和优先级统计：无筛选时直接读增量维护的计数器，
+    有筛选时交给统计引擎做一次聚合查询
+    """
+    if has_stats_filters(filters):
+        counters = aggregate_task_stats(db, filters)
+    else:
+        counters = _stat_snapshot(get_current_daily_stat(db))
+    return format_stat_blocks(counters)
+
+def get_all_stats(db: Session, filters: Optional[schemas.StatsFilter] = None):
     """获取完整的统计数据"""
-    # 获取今日统计
-    today = datetime.now().strftime("%Y-%m-%d")
-    today_stat = update_daily_stat(db, today)
+    blocks = get_stat_blocks(db, filters)
     
     # 获取周统计
     week_stat = get_week_stats(db)
@@ -21,58 +41,123 @@ def get_all_stats(db: Session):
     # 获取年统计
     year_stat = get_year_stats(db)
     
-    # 获取优先级统计
-    priority_stats = []
-    if today_stat and today_stat.priority_stats:
-        for level, stats in today_stat.priority_stats.items():
-            priority_stats.append({
-                "level": level,
-                "completed": stats.get("completed", 0),
-                "inProgress": stats.get("in_progress", 0),
-                "remaining": stats.get("remaining", 0),
-                "total": stats.get("total", 0)
-            })
-    
     return {
-        "today": {
-            "completed": today_stat.completed if today_stat else 0,
-            "inProgress": today_stat.in_progress if today_stat else 0,
-            "remaining": today_stat.remaining if today_stat else 0,
-            "total": today_stat.total if today_stat else 0
-        },
+        "today": blocks["today"],
         "week": week_stat.get("week_data", []) if isinstance(week_stat, dict) else [],
         "month": month_stat.get("month_data", []) if isinstance(month_stat, dict) else [],
         "year": year_stat.get("year_data", []) if isinstance(year_stat, dict) else [],
-        "priority": priority_stats
+        "priority": blocks["priority"]
     }
 
 def update_stat_data(db: Session):
-    """更新统计数据的辅助函数"""
-    today = datetime.now().strftime("%Y-%m-%d")
-    return update_daily_stat(db, today)
+    """更新统计数据的辅助函数：从头重算计数器并校正增量结果"""
+    return reconcile_daily_stat(db)
 
-def get_or_create_daily_stat(db: Session, date: str):
-    """获取或创建每日统计"""
+def _get_or_seed_daily_stat(db: Session, date: str):
+    """
+    获取某天的统计行；不存在时沿用最近一天的计数器（计数器是全量快照，跨天不清零），
+    库里还没有任何统计行时才从任务表重算一次。只写不 commit，便于和任务写入同一事务。
+    建行用 INSERT ... ON CONFLICT DO NOTHING：这条语句先拿到写锁，之后读到的上一天计数器
+    和任务表都是最新的，并发的第一次写入也不会重复建行
+    """
     stat = db.query(models.DailyStat).filter(models.DailyStat.date == date).first()
-    if not stat:
-        # 创建新的统计记录
-        stat = models.DailyStat(
-            date=date,
-            completed=0,
-            in_progress=0,
-            remaining=0,
-            total=0,
-            priority_stats={
-                "high": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0},
-                "medium": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0},
-                "low": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0}
-            }
+    if stat:
+        return stat
+
+    inserted = db.execute(
+        sqlite_insert(models.DailyStat).values(date=date).on_conflict_do_nothing(index_elements=["date"])
+    ).rowcount
+    if inserted:
+        previous = db.query(models.DailyStat).filter(
+            models.DailyStat.date < date
+        ).order_by(desc(models.DailyStat.date)).first()
+        if previous:
+            counters = _stat_snapshot(previous)
+        else:
+            counters = aggregate_task_stats(db)
+        db.query(models.DailyStat).filter(models.DailyStat.date == date).update(
+            counters, synchronize_session=False
         )
-        db.add(stat)
-        db.commit()
-        db.refresh(stat)
+    return db.query(models.DailyStat).filter(models.DailyStat.date == date).one()
+
+def get_or_create_daily_stat(db: Session, date: str):
+    """获取或创建每日统计"""
+    stat = _get_or_seed_daily_stat(db, date)
+    db.commit()
+    db.refresh(stat)
     return stat
 
+def get_current_daily_stat(db: Session):
+    """读取当前计数器：今天的行，今天还没有任务变动时取最近一天的行"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    stat = db.query(models.DailyStat).filter(
+        models.DailyStat.date <= today
+    ).order_by(desc(models.DailyStat.date)).first()
+    if stat is None:
+        # 空库第一次访问，建一次基线
+        stat = get_or_create_daily_stat(db, today)
+    return stat
+
+def apply_task_stat_delta(db: Session, old: Optional[tuple] = None, new: Optional[tuple] = None):
+    """
+    按任务变化增量更新今日计数器，old/new 为 (status, priority)：
+    创建时 old 为 None，删除时 new 为 None。调用方负责 commit
+    """
+    return apply_task_stat_deltas(db, [(old, new)])
+
+def apply_task_stat_deltas(db: Session, changes: List[tuple]):
+    """
+    批量版本：changes 为 [(old, new), ...]，所有变化合并后只写一次统计行。
+    计数器在 SQL 里自增（total = total + :d），这条 UPDATE 同时拿到写锁；
+    priority_stats 是 JSON 列，在锁内重新读取后再写回，并发写入不会互相覆盖
+    """
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return None
+
+    deltas = dict.fromkeys(STAT_COUNTERS, 0)
+    priority_deltas = {}
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            status, priority = state
+            field = STATUS_FIELDS.get(status)
+            if field:
+                deltas[field] += sign
+            deltas["total"] += sign
+
+            if priority in PRIORITY_LEVELS:
+                bucket = priority_deltas.setdefault(priority, dict.fromkeys(STAT_COUNTERS, 0))
+                if field:
+                    bucket[field] += sign
+                bucket["total"] += sign
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    today_stat = db.query(models.DailyStat).filter(models.DailyStat.date == today)
+    values = {
+        getattr(models.DailyStat, field): func.coalesce(getattr(models.DailyStat, field), 0) + delta
+        for field, delta in deltas.items() if delta
+    }
+    values[models.DailyStat.updated_at] = datetime.now()
+    if not today_stat.update(values, synchronize_session=False):
+        # 今天的第一次写入：先建行（沿用上一天的计数器）再自增
+        _get_or_seed_daily_stat(db, today)
+        today_stat.update(values, synchronize_session=False)
+
+    if priority_deltas:
+        # 列查询不经过 identity map，读到的是锁内的最新值
+        priority_stats = copy.deepcopy(
+            today_stat.with_entities(models.DailyStat.priority_stats).scalar() or empty_priority_stats()
+        )
+        for priority, bucket_deltas in priority_deltas.items():
+            bucket = priority_stats.setdefault(priority, dict.fromkeys(STAT_COUNTERS, 0))
+            for field, delta in bucket_deltas.items():
+                bucket[field] = bucket.get(field, 0) + delta
+        today_stat.update({models.DailyStat.priority_stats: priority_stats}, synchronize_session=False)
+
+    stage_tables(db, "stats")
+
 def get_daily_stats(db: Session, skip: int = 0, limit: int = 100):
     """获取每日统计列表"""
     return db.query(models.DailyStat).order_by(desc(models.DailyStat.date)).offset(skip).limit(limit).all()
@@ -101,114 +186,254 @@ def create_daily_stat(db: Session, stat: schemas.DailyStatCreate):
     return db_stat
 
 def update_daily_stat(db: Session, date: str):
-    """更新每日统计"""
-    stat = get_or_create_daily_stat(db, date)
-    
-    # 计算任务统计
-    tasks = db.query(models.Task).all()
-    
-    completed = 0
-    in_progress = 0
-    remaining = 0
-    total = len(tasks)
-    
-    for task in tasks:
-        if task.status == "done":
-            completed += 1
-        elif task.status == "doing":
-            in_progress += 1
-        elif task.status == "todo":
-            remaining += 1
-    
-    # 更新统计
-    stat.completed = completed
-    stat.in_progress = in_progress
-    stat.remaining = remaining
-    stat.total = total
-    
-    # 更新优先级统计
-    priority_stats = {
-        "high": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0},
-        "medium": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0},
-        "low": {"completed": 0, "in_progress": 0, "remaining": 0, "total": 0}
-    }
-    
-    for task in tasks:
-        priority = task.priority
-        if priority in ["high", "medium", "low"]:
-            if task.status == "done":
-                priority_stats[priority]["completed"] += 1
-            elif task.status == "doing":
-                priority_stats[priority]["in_progress"] += 1
-            elif task.status == "todo":
-                priority_stats[priority]["remaining"] += 1
-            priority_stats[priority]["total"] += 1
-    
-    stat.priority_stats = priority_stats
+    """从头重算某天的每日统计"""
+    stat = _get_or_seed_daily_stat(db, date)
+    # 先写一次拿到写锁再重算，重算期间的任务写入会等这次校正提交后再自增，不会被覆盖
+    db.query(models.DailyStat).filter(models.DailyStat.date == date).update(
+        {models.DailyStat.updated_at: datetime.now()}, synchronize_session=False
+    )
+    counters = aggregate_task_stats(db)
+
+    stat.completed = counters["completed"]
+    stat.in_progress = counters["in_progress"]
+    stat.remaining = counters["remaining"]
+    stat.total = counters["total"]
+    stat.priority_stats = counters["priority_stats"]
     stat.updated_at = datetime.now()
+    stage_tables(db, "stats")
     
     db.commit()
     db.refresh(stat)
     return stat
 
-def get_week_stats(db: Session):
-    """获取本周数据"""
-    # 模拟数据
-    week_days = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-    week_data = []
-    import random
-    
-    for day in week_days:
-        week_data.append({
-            "day": day,
-            "completed": random.randint(5, 15),
-            "inProgress": random.randint(3, 8),
-            "remaining": random.randint(1, 5)
+def _stat_snapshot(stat: models.DailyStat):
+    snapshot = {field: getattr(stat, field) or 0 for field in STAT_COUNTERS}
+    snapshot["priority_stats"] = copy.deepcopy(stat.priority_stats or empty_priority_stats())
+    return snapshot
+
+def reconcile_daily_stat(db: Session):
+    """
+    校正今日计数器：从任务表重算并与增量维护的结果比对，
+    返回每个计数器的偏差（重算值 - 原值），用于核对增量逻辑
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    before = _stat_snapshot(_get_or_seed_daily_stat(db, today))
+    after = _stat_snapshot(update_daily_stat(db, today))
+
+    drift = {}
+    for field in STAT_COUNTERS:
+        if after[field] != before[field]:
+            drift[field] = after[field] - before[field]
+    for level, bucket in after["priority_stats"].items():
+        old_bucket = before["priority_stats"].get(level, {})
+        for field, value in bucket.items():
+            if value != old_bucket.get(field, 0):
+                drift[f"{level}.{field}"] = value - old_bucket.get(field, 0)
+
+    return {
+        "date": today,
+        "consistent": not drift,
+        "drift": drift,
+        "counters": after
+    }
+
+# ========== 周/月/年趋势：状态变更日志 + 预汇总 ==========
+# 每个数据点统计该时间段内进入各状态的任务数：
+# completed = 变为 done，inProgress = 变为 doing，remaining = 新建或重新打开为 todo
+_WEEK_DAYS = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+_YEAR_MONTHS = ["1月", "2月", "3月", "4月", "5月", "6月",
+                "7月", "8月", "9月", "10月", "11月", "12月"]
+_TREND_FIELDS = {"done": "completed", "doing": "inProgress", "todo": "remaining"}
+
+def utc_to_local(value: datetime) -> datetime:
+    """任务表的 createdAt / updatedAt 按 UTC 记录，状态日志按本地时间（datetime.now()）归入日期，换算后再写日志"""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def _empty_week_data():
+    return [{"day": day, "completed": 0, "inProgress": 0, "remaining": 0} for day in _WEEK_DAYS]
+
+def _empty_month_data(month: str):
+    year, mon = (int(part) for part in month.split("-"))
+    days = calendar.monthrange(year, mon)[1]
+    return [
+        {"date": f"{mon:02d}-{day:02d}", "completed": 0, "inProgress": 0, "remaining": 0}
+        for day in range(1, days + 1)
+    ]
+
+def _empty_year_data():
+    return [{"month": month, "completed": 0, "inProgress": 0, "remaining": 0} for month in _YEAR_MONTHS]
+
+def _week_start(day: date_type) -> str:
+    return (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+
+def _bump_rollup_rows(db: Session, model, key_column: str, data_column: str, bumps: dict, empty):
+    """bumps 为 {周期键: [(数据点下标, 字段, 增量), ...]}，每个周期行读写一次（JSON 整体赋值）"""
+    for key, items in bumps.items():
+        row = db.query(model).filter(getattr(model, key_column) == key).first()
+        if not row:
+            row = model(**{key_column: key, data_column: empty(key)})
+            db.add(row)
+        data = copy.deepcopy(getattr(row, data_column) or empty(key))
+        for index, field, amount in items:
+            data[index][field] += amount
+        setattr(row, data_column, data)
+
+def _bump_period_rollups(db: Session, day_amounts: dict):
+    """把状态变化计入所在周、月、年的汇总行，day_amounts 为 {日期: {字段: 增量}}"""
+    weeks, months, years = {}, {}, {}
+    for day, amounts in day_amounts.items():
+        for field, amount in amounts.items():
+            weeks.setdefault(_week_start(day), []).append((day.weekday(), field, amount))
+            months.setdefault(day.strftime("%Y-%m"), []).append((day.day - 1, field, amount))
+            years.setdefault(day.strftime("%Y"), []).append((day.month - 1, field, amount))
+
+    _bump_rollup_rows(db, models.WeeklyStat, "week_start", "week_data", weeks, lambda key: _empty_week_data())
+    _bump_rollup_rows(db, models.MonthlyStat, "month", "month_data", months, _empty_month_data)
+    _bump_rollup_rows(db, models.YearlyStat, "year", "year_data", years, lambda key: _empty_year_data())
+    # 同一事务里可能连续记录多条事件，flush 让下一次查询能看到新建的汇总行
+    db.flush()
+
+def record_task_transition(
+    db: Session,
+    task_id: int,
+    from_status: Optional[str],
+    to_status: Optional[str],
+    priority: Optional[str] = None,
+    when: Optional[datetime] = None
+):
+    """
+    追加一条任务状态变更日志并更新周/月/年汇总，调用方负责 commit。
+    from_status 为 None 表示新建，to_status 为 None 表示删除
+    """
+    events = record_task_transitions(db, [(task_id, from_status, to_status, priority)], when)
+    return events[0] if events else None
+
+def record_task_transitions(db: Session, transitions: List[tuple], when: Optional[datetime] = None):
+    """
+    批量版本：transitions 为 [(task_id, from_status, to_status, priority), ...]，
+    可以带第 5 项发生时间（导入历史任务时为各自的创建时间），没有时记为 when / 当前时间；
+    日志一次性插入，汇总行按发生日期归入各自的周期，每个周期只更新一次
+    """
+    when = when or datetime.now()
+    rows = []
+    day_amounts = {}
+    for task_id, from_status, to_status, priority, *occurred_at in transitions:
+        if from_status == to_status:
+            continue
+        if from_status is None:
+            event = "created"
+        elif to_status is None:
+            event = "deleted"
+        else:
+            event = "status_changed"
+        occurred_at = (occurred_at and occurred_at[0]) or when
+        rows.append({
+            "task_id": task_id,
+            "event": event,
+            "from_status": from_status,
+            "to_status": to_status,
+            "priority": priority,
+            "occurred_at": occurred_at
         })
-    
-    return {"week_data": week_data}
+        field = _TREND_FIELDS.get(to_status)
+        if field:
+            amounts = day_amounts.setdefault(occurred_at.date(), {})
+            amounts[field] = amounts.get(field, 0) + 1
+
+    if rows:
+        db.execute(insert(models.TaskEvent), rows)
+        stage_tables(db, "stats")
+    if day_amounts:
+        _bump_period_rollups(db, day_amounts)
+    return [row["event"] for row in rows]
+
+def rebuild_period_stats(db: Session, batch_size: int = 1000):
+    """
+    从状态变更日志重建周/月/年汇总表。
+    日志为空而任务表有数据时（旧数据库升级），先按任务的创建/更新时间补一份近似日志
+    """
+    seeded = 0
+    if db.query(models.TaskEvent.id).first() is None:
+        for task in db.query(models.Task).order_by(models.Task.id).yield_per(batch_size):
+            created = utc_to_local(task.createdAt) if task.createdAt else datetime.now()
+            db.add(models.TaskEvent(
+                task_id=task.id, event="created", from_status=None,
+                to_status="todo", priority=task.priority, occurred_at=created
+            ))
+            seeded += 1
+            if task.status and task.status != "todo":
+                db.add(models.TaskEvent(
+                    task_id=task.id, event="status_changed", from_status="todo",
+                    to_status=task.status, priority=task.priority,
+                    occurred_at=utc_to_local(task.updatedAt) if task.updatedAt else created
+                ))
+                seeded += 1
+        db.flush()
+
+    # 在内存里按周期累加后一次性写回，每个周期只写一行
+    weeks, months, years = {}, {}, {}
+    rows = db.query(
+        models.TaskEvent.to_status,
+        func.date(models.TaskEvent.occurred_at).label("day"),
+        func.count(models.TaskEvent.id)
+    ).filter(
+        models.TaskEvent.to_status.in_(list(_TREND_FIELDS))
+    ).group_by(models.TaskEvent.to_status, "day").all()
+
+    for to_status, day_str, count in rows:
+        day = datetime.strptime(day_str, "%Y-%m-%d").date()
+        field = _TREND_FIELDS[to_status]
+
+        week_start = _week_start(day)
+        weeks.setdefault(week_start, _empty_week_data())[day.weekday()][field] += count
+        month = day.strftime("%Y-%m")
+        months.setdefault(month, _empty_month_data(month))[day.day - 1][field] += count
+        year = day.strftime("%Y")
+        years.setdefault(year, _empty_year_data())[day.month - 1][field] += count
+
+    db.query(models.WeeklyStat).delete()
+    db.query(models.MonthlyStat).delete()
+    db.query(models.YearlyStat).delete()
+    db.add_all(models.WeeklyStat(week_start=key, week_data=data) for key, data in weeks.items())
+    db.add_all(models.MonthlyStat(month=key, month_data=data) for key, data in months.items())
+    db.add_all(models.YearlyStat(year=key, year_data=data) for key, data in years.items())
+    stage_tables(db, "stats")
+    db.commit()
+
+    return {
+        "seeded_events": seeded,
+        "weeks": len(weeks),
+        "months": len(months),
+        "years": len(years)
+    }
+
+def get_week_stats(db: Session):
+    """获取本周数据（读取预汇总行）"""
+    week_start = _week_start(datetime.now().date())
+    weekly = db.query(models.WeeklyStat).filter(models.WeeklyStat.week_start == week_start).first()
+    return {"week_data": weekly.week_data if weekly and weekly.week_data else _empty_week_data()}
 
 def get_month_stats(db: Session):
-    """获取本月数据"""
-    import random
-    
-    month_data = []
-    for i in range(30):
-        date_str = f"01-{i+1:02d}" if i < 30 else ""
-        month_data.append({
-            "date": date_str,
-            "completed": random.randint(5, 20),
-            "inProgress": random.randint(3, 15),
-            "remaining": random.randint(1, 10)
-        })
-    
-    return {"month_data": month_data}
+    """获取本月数据（读取预汇总行）"""
+    month = datetime.now().strftime("%Y-%m")
+    monthly = db.query(models.MonthlyStat).filter(models.MonthlyStat.month == month).first()
+    return {"month_data": monthly.month_data if monthly and monthly.month_data else _empty_month_data(month)}
 
 def get_year_stats(db: Session):
-    """获取年度数据"""
-    months = ["1月", "2月", "3月", "4月", "5月", "6月", 
-             "7月", "8月", "9月", "10月", "11月", "12月"]
-    year_data = []
-    
-    for i, month in enumerate(months):
-        year_data.append({
-            "month": month,
-            "completed": 30 + i * 8,
-            "inProgress": 10 + i * 3,
-            "remaining": 5 + i * 2
-        })
-    
-    return {"year_data": year_data}
+    """获取年度数据（读取预汇总行）"""
+    year = datetime.now().strftime("%Y")
+    yearly = db.query(models.YearlyStat).filter(models.YearlyStat.year == year).first()
+    return {"year_data": yearly.year_data if yearly and yearly.year_data else _empty_year_data()}
 
-def get_stats_summary(db: Session):
+def get_stats_summary(db: Session, filters: Optional[schemas.StatsFilter] = None):
     """获取统计摘要"""
     today = datetime.now().strftime("%Y-%m-%d")
-    stat = update_daily_stat(db, today)
+    stat = get_stat_blocks(db, filters)["today"]
     
     return {
         "date": today,
-        "completed": stat.completed,
-        "in_progress": stat.in_progress,
-        "remaining": stat.remaining,
-        "total": stat.total
+        "completed": stat["completed"],
+        "in_progress": stat["inProgress"],
+        "remaining": stat["remaining"],
+        "total": stat["total"]
     }
\ No newline at end of file
@@ -0,0 +1,54 @@
+from sqlalchemy.orm import Session
+from .pagination import encode_cursor, decode_cursor
+from .changes import changes_since, latest_change_seq
+from .task_crud import get_tasks_by_ids
+from .note_crud import get_notes_by_ids
+from .tags_crud import get_tags_by_ids
+
+# 增量同步：客户端保存上次返回的 cursor，下次只取之后变化过的任务 / 笔记 / 标签和删除墓碑
+SYNC_PAGE_SIZE = 1000
+
+_FETCHERS = {
+    "task": ("tasks", get_tasks_by_ids),
+    "note": ("notes", get_notes_by_ids),
+    "tag": ("tags", get_tags_by_ids),
+}
+
+
+def decode_sync_cursor(cursor=None) -> int:
+    if not cursor:
+        return 0
+    (seq,) = decode_cursor(cursor, 1)
+    return seq if isinstance(seq, int) else 0
+
+
+def get_sync_changes(db: Session, since: int = 0, limit: int = SYNC_PAGE_SIZE):
+    """
+    seq > since 的变更：同一实体只返回最终状态（仍存在的给出完整数据，已删除的只给 id）。
+    变更记录与实体在同一个读事务里读取，has_more 为真时应立即用返回的 cursor 继续拉取
+    """
+    changes = changes_since(db, since, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    upserts = {kind: [] for kind in _FETCHERS}
+    deleted = {key: [] for key, _ in _FETCHERS.values()}
+    for kind, entity_id, is_deleted, _ in changes:
+        if is_deleted:
+            deleted[_FETCHERS[kind][0]].append(entity_id)
+        else:
+            upserts[kind].append(entity_id)
+
+    result = {}
+    for kind, (key, fetch) in _FETCHERS.items():
+        items = fetch(db, upserts[kind]) if upserts[kind] else []
+        # 记录为修改但已不存在的实体（如绕过 crud 直接删除）也按删除下发
+        found = {item["id"] for item in items}
+        deleted[key].extend(entity_id for entity_id in upserts[kind] if entity_id not in found)
+        result[key] = items
+
+    seq = changes[-1][3] if changes else max(since, latest_change_seq(db))
+    result["deleted"] = deleted
+    result["cursor"] = encode_cursor([seq])
+    result["has_more"] = has_more
+    return result
@@ -0,0 +1,191 @@
+import heapq
+import threading
+from typing import Optional
+from sqlalchemy.orm import Session
+from .. import models
+from .versions import get_table_versions
+
+# 标签自动补全：进程内的前缀树 + 三元组倒排索引，启动时从 tags 表加载，
+# create_tag / delete_tag 增量维护；索引记录加载时的 tags 表版本号，
+# 其他进程改过标签（版本号对不上）时在下次查询前整体重新加载
+
+# 相似度低于该值的模糊匹配不返回
+FUZZY_THRESHOLD = 0.3
+
+# 排序档位：完全匹配 > 前缀 > 包含 > 模糊
+_EXACT, _PREFIX, _CONTAINS, _FUZZY = range(4)
+
+
+def _normalize(name: str) -> str:
+    return name.strip().casefold()
+
+
+def _trigrams(text: str, padded: bool = True) -> set:
+    # 与 pg_trgm 相同：前补两个空格、后补一个空格，让词首的字符权重更高
+    if padded:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TagAutocomplete:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self._names = {}      # tag_id -> 归一化后的名称
+        self._trie = {}       # 字符 -> 子节点，节点的 "ids" 为以该前缀开头的标签
+        self._grams = {}      # 三元组 -> 标签 id 集合
+
+    def __len__(self):
+        return len(self._names)
+
+    def load(self, rows, version):
+        """rows 为 [(id, name), ...]，整体替换索引内容"""
+        with self._lock:
+            self._names = {}
+            self._trie = {}
+            self._grams = {}
+            for tag_id, name in rows:
+                self._add(tag_id, name)
+            self.version = version
+
+    def add(self, tag_id: int, name: str, version: Optional[int] = None):
+        with self._lock:
+            self._add(tag_id, name)
+            self._advance(version)
+
+    def remove(self, tag_id: int, version: Optional[int] = None):
+        with self._lock:
+            self._remove(tag_id)
+            self._advance(version)
+
+    def _advance(self, version):
+        # 只有紧接着当前版本的修改才能算作同步；中间漏掉了其他进程的修改就等下次重新加载
+        if version is not None and self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.version = None
+
+    def _add(self, tag_id, name):
+        if tag_id in self._names:
+            self._remove(tag_id)
+        key = _normalize(name)
+        self._names[tag_id] = key
+        node = self._trie
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault("ids", set()).add(tag_id)
+        for gram in _trigrams(key):
+            self._grams.setdefault(gram, set()).add(tag_id)
+
+    def _remove(self, tag_id):
+        key = self._names.pop(tag_id, None)
+        if key is None:
+            return
+        node = self._trie
+        path = []
+        for char in key:
+            path.append((node, char))
+            node = node[char]
+            node["ids"].discard(tag_id)
+        # 自底向上剪掉已经没有标签的分支
+        for parent, char in reversed(path):
+            if parent[char]["ids"]:
+                break
+            del parent[char]
+        for gram in _trigrams(key):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(tag_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def _prefix_ids(self, key):
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get("ids", set())
+
+    def match(self, query: str, limit: Optional[int] = None):
+        """返回按相关度排序的标签 id 列表"""
+        key = _normalize(query)
+        if not key:
+            return []
+
+        with self._lock:
+            names = self._names
+            scored = {}
+
+            for tag_id in self._prefix_ids(key):
+                tier = _EXACT if names[tag_id] == key else _PREFIX
+                scored[tag_id] = (tier, 0.0)
+
+            # 包含匹配：长查询用三元组倒排求候选，短查询直接扫描内存里的名称
+            if len(key) >= 3:
+                postings = [self._grams.get(gram, set()) for gram in _trigrams(key, padded=False)]
+                candidates = set.intersection(*postings) if postings else set()
+            else:
+                candidates = names.keys()
+            for tag_id in candidates:
+                if tag_id not in scored and key in names[tag_id]:
+                    scored[tag_id] = (_CONTAINS, 0.0)
+
+            # 模糊匹配：按共享三元组数计算 Jaccard 相似度，容忍拼写错误
+            query_grams = _trigrams(key)
+            shared = {}
+            for gram in query_grams:
+                for tag_id in self._grams.get(gram, ()):
+                    if tag_id not in scored:
+                        shared[tag_id] = shared.get(tag_id, 0) + 1
+            for tag_id, count in shared.items():
+                union = len(query_grams) + len(_trigrams(names[tag_id])) - count
+                similarity = count / union
+                if similarity >= FUZZY_THRESHOLD:
+                    scored[tag_id] = (_FUZZY, -similarity)
+
+            ranked = (
+                ((tier, score, len(names[tag_id]), names[tag_id], tag_id), tag_id)
+                for tag_id, (tier, score) in scored.items()
+            )
+            if limit is None:
+                ordered = sorted(ranked)
+            else:
+                ordered = heapq.nsmallest(limit, ranked)
+        return [tag_id for _, tag_id in ordered]
+
+
+tag_index = TagAutocomplete()
+
+
+def _tags_version(db: Session) -> int:
+    return get_table_versions(db, ("tags",))[0]
+
+
+def init_tag_index(db: Session):
+    """从 tags 表加载自动补全索引（启动时或版本号不一致时调用）"""
+    version = _tags_version(db)
+    tag_index.load(db.query(models.Tag.id, models.Tag.name).all(), version)
+    return len(tag_index)
+
+
+def ensure_tag_index(db: Session):
+    if tag_index.version != _tags_version(db):
+        init_tag_index(db)
+
+
+def index_tag(db: Session, tag: models.Tag):
+    """
+    在写标签的事务里、bump_table_versions 之后调用：SQLite 写事务串行，此时读到的版本号
+    正好是本次修改后的版本。事务最终回滚时索引版本号与数据库对不上，下次查询会重新加载
+    """
+    tag_index.add(tag.id, tag.name, _tags_version(db))
+
+
+def unindex_tag(db: Session, tag_id: int):
+    tag_index.remove(tag_id, _tags_version(db))
+
+
+def match_tag_ids(db: Session, query: str, limit: Optional[int] = None):
+    ensure_tag_index(db)
+    return tag_index.match(query, limit)
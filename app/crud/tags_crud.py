@@ -3,81 +3,161 @@ from .. import models, schemas
 from datetime import datetime
 from fastapi import HTTPException
 from typing import Optional, List
-from sqlalchemy import func,or_, desc, asc
+from sqlalchemy import func,or_, desc, asc, insert, select
+from .versions import bump_table_versions
+from .changes import record_changes
+from .tag_index import match_tag_ids, index_tag, unindex_tag
 
 
+def _tag_count_dict(tag: models.Tag):
+    task_count = tag.task_count or 0
+    note_count = tag.note_count or 0
+    return {
+        "id": tag.id,
+        "name": tag.name,
+        "color": tag.color,
+        "count": task_count + note_count,  # 总计数
+        "task_count": task_count,
+        "note_count": note_count
+    }
+
 def get_tags_with_counts(db: Session):
-    
-    # 1. 查询所有 Tag
+    # 计数直接读取标签表上的冗余字段，不再扫描中间表
     tags = db.query(models.Tag).all()
-    
-    # 2. 查询标签在任务中的使用计数 (通过 TaskTag 中间表)
-    task_tag_counts = db.query(
-        models.TaskTag.tag_id, 
-        func.count(models.TaskTag.task_id).label('count')
-    ).group_by(models.TaskTag.tag_id).all()
-    
-    # 3. 查询标签在笔记中的使用计数 (通过 NoteTag 中间表)
-    note_tag_counts = db.query(
-        models.NoteTag.tag_id, 
-        func.count(models.NoteTag.note_id).label('count')
-    ).group_by(models.NoteTag.tag_id).all()
-    
-    # 转换为字典方便查找
-    task_count_map = {tag_id: count for tag_id, count in task_tag_counts}
-    note_count_map = {tag_id: count for tag_id, count in note_tag_counts}
-    
-    # 4. 组装最终结果
-    result = []
-    for tag in tags:
-        task_count = task_count_map.get(tag.id, 0)
-        note_count = note_count_map.get(tag.id, 0)
-        result.append({
-            "id": tag.id,
-            "name": tag.name,
-            "color": tag.color,
-            "count": task_count + note_count,  # 总计数
-            "task_count": task_count,
-            "note_count": note_count
-        })
-        
+    return [_tag_count_dict(tag) for tag in tags]
+
+def search_tags(db: Session, query: str, limit: Optional[int] = None):
+    # 匹配和排序在内存索引里完成（前缀 + 包含 + 拼写容错），数据库只按主键取回命中的标签
+    tag_ids = match_tag_ids(db, query, limit)
+    if not tag_ids:
+        return []
+    tags = {tag.id: tag for tag in db.query(models.Tag).filter(models.Tag.id.in_(tag_ids))}
+    return [_tag_count_dict(tags[tag_id]) for tag_id in tag_ids if tag_id in tags]
+
+def export_tags_batch(db: Session, after_id: int = 0, limit: int = 1000):
+    # 标签表没有时间戳，导出时总是全量
+    tags = db.query(models.Tag).filter(models.Tag.id > after_id).order_by(models.Tag.id).limit(limit).all()
+    return [_tag_count_dict(tag) for tag in tags]
+
+def get_tags_by_ids(db: Session, tag_ids: List[int]):
+    tags = []
+    for start in range(0, len(tag_ids), 500):
+        chunk = tag_ids[start:start + 500]
+        tags.extend(db.query(models.Tag).filter(models.Tag.id.in_(chunk)).all())
+    return [_tag_count_dict(tag) for tag in tags]
+
+# ========== 标签使用计数维护 ==========
+_COUNT_COLUMNS = {
+    "task": models.Tag.task_count,
+    "note": models.Tag.note_count,
+}
+_LINK_MODELS = {
+    "task": (models.TaskTag, models.TaskTag.task_id),
+    "note": (models.NoteTag, models.NoteTag.note_id),
+}
+
+def adjust_tag_counts(db: Session, kind: str, deltas: dict):
+    """
+    按 {tag_id: 增量} 调整 task_count / note_count，增量相同的标签合并成一条 UPDATE。
+    调用方负责 commit，需与关联表的增删处于同一事务
+    """
+    column = _COUNT_COLUMNS[kind]
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        db.query(models.Tag).filter(models.Tag.id.in_(tag_ids)).update(
+            {column: column + delta}, synchronize_session=False
+        )
+
+def link_tags(db: Session, kind: str, links: list):
+    """批量写入关联 [(owner_id, tag_id), ...] 并增加对应标签的计数"""
+    if not links:
+        return
+    link_model, owner_column = _LINK_MODELS[kind]
+    db.execute(insert(link_model), [
+        {owner_column.key: owner_id, "tag_id": tag_id} for owner_id, tag_id in links
+    ])
+    deltas = {}
+    for _, tag_id in links:
+        deltas[tag_id] = deltas.get(tag_id, 0) + 1
+    adjust_tag_counts(db, kind, deltas)
+
+def unlink_tags(db: Session, kind: str, owner_ids: list):
+    """删除这些任务/笔记的全部标签关联，并扣减对应标签的计数"""
+    if not owner_ids:
+        return
+    link_model, owner_column = _LINK_MODELS[kind]
+    counts = db.query(link_model.tag_id, func.count()).filter(
+        owner_column.in_(owner_ids)
+    ).group_by(link_model.tag_id).all()
+    db.query(link_model).filter(owner_column.in_(owner_ids)).delete(synchronize_session=False)
+    adjust_tag_counts(db, kind, {tag_id: -count for tag_id, count in counts})
+
+def tag_filter_subquery(kind: str, tag_ids: List[int], mode: str = "all"):
+    """
+    带有指定标签的任务/笔记 id 子查询，一次扫描关联表：
+    all 要求包含全部标签（GROUP BY owner_id HAVING COUNT = n），any 包含任意一个即可
+    """
+    link_model, owner_column = _LINK_MODELS[kind]
+    tag_ids = list(dict.fromkeys(tag_ids))
+    stmt = select(owner_column).where(link_model.tag_id.in_(tag_ids))
+    if mode == "any" or len(tag_ids) == 1:
+        # 用在 IN (...) 里，重复的 owner_id 不影响结果，不需要 DISTINCT
+        return stmt
+    return stmt.group_by(owner_column).having(func.count() == len(tag_ids))
+
+# IN 列表分块，避免超过 SQLite 的绑定参数上限
+_IN_CHUNK = 500
+
+def tags_by_owner(db: Session, kind: str, owner_ids: Optional[list] = None):
+    """
+    一次（或按块）取出任务/笔记的标签，返回 {owner_id: [{"id", "name", "color"}, ...]}；
+    owner_ids 为 None 时取全部关联，用于全量列表
+    """
+    link_model, owner_column = _LINK_MODELS[kind]
+    # 按 (owner_id, tag_id) 主键顺序返回，与 joinedload 的标签顺序一致
+    stmt = db.query(owner_column, models.Tag.id, models.Tag.name, models.Tag.color).join(
+        models.Tag, models.Tag.id == link_model.tag_id
+    ).order_by(owner_column, link_model.tag_id)
+    if owner_ids is None:
+        chunks = [stmt]
+    else:
+        owner_ids = list(owner_ids)
+        chunks = [
+            stmt.filter(owner_column.in_(owner_ids[i:i + _IN_CHUNK]))
+            for i in range(0, len(owner_ids), _IN_CHUNK)
+        ]
+    result = {}
+    for chunk in chunks:
+        for owner_id, tag_id, name, color in chunk:
+            result.setdefault(owner_id, []).append({"id": tag_id, "name": name, "color": color})
     return result
 
-def search_tags(db: Session, query: str):
-    tags = db.query(models.Tag).filter(
-        models.Tag.name.ilike(f"%{query}%")
-    ).all()
-    
-    # 查询标签在任务中的使用计数
-    task_tag_counts = db.query(
-        models.TaskTag.tag_id, 
-        func.count(models.TaskTag.task_id).label('count')
-    ).group_by(models.TaskTag.tag_id).all()
-    
-    # 查询标签在笔记中的使用计数
-    note_tag_counts = db.query(
-        models.NoteTag.tag_id, 
-        func.count(models.NoteTag.note_id).label('count')
-    ).group_by(models.NoteTag.tag_id).all()
-    
-    # 转换为字典方便查找
-    task_count_map = {tag_id: count for tag_id, count in task_tag_counts}
-    note_count_map = {tag_id: count for tag_id, count in note_tag_counts}
-    
-    result = []
+def repair_tag_counts(db: Session):
+    """从中间表重算所有标签的计数，返回被修正的标签"""
+    task_counts = dict(db.query(models.TaskTag.tag_id, func.count()).group_by(models.TaskTag.tag_id).all())
+    note_counts = dict(db.query(models.NoteTag.tag_id, func.count()).group_by(models.NoteTag.tag_id).all())
+
+    repaired = []
+    tags = db.query(models.Tag).all()
     for tag in tags:
-        task_count = task_count_map.get(tag.id, 0)
-        note_count = note_count_map.get(tag.id, 0)
-        result.append({
-            "id": tag.id,
-            "name": tag.name,
-            "color": tag.color,
-            "count": task_count + note_count,  # 总计数
-            "task_count": task_count,
-            "note_count": note_count
-        })
-        
-    return result
+        task_count = task_counts.get(tag.id, 0)
+        note_count = note_counts.get(tag.id, 0)
+        if tag.task_count != task_count or tag.note_count != note_count:
+            repaired.append({
+                "id": tag.id,
+                "task_count": [tag.task_count, task_count],
+                "note_count": [tag.note_count, note_count]
+            })
+            tag.task_count = task_count
+            tag.note_count = note_count
+
+    if repaired:
+        bump_table_versions(db, "tags")
+    db.commit()
+    return {"checked": len(tags), "repaired": repaired}
 
 def create_tag(db: Session, tag: schemas.TagCreate):
     # 如果没有提供 color，给一个默认值
@@ -85,6 +165,10 @@ def create_tag(db: Session, tag: schemas.TagCreate):
     
     db_tag = models.Tag(name=tag.name, color=tag_color)
     db.add(db_tag)
+    db.flush()
+    record_changes(db, "tag", [db_tag.id])
+    bump_table_versions(db, "tags")
+    index_tag(db, db_tag)
     db.commit()
     db.refresh(db_tag)
     return db_tag
@@ -98,11 +182,21 @@ def delete_tag(db: Session, tag_id: int):
     if not db_tag:
         return False
     
+    # 带这个标签的任务 / 笔记的 tags 字段随之变化，同步时需要重新下发
+    task_ids = [task_id for (task_id,) in db.query(models.TaskTag.task_id).filter(models.TaskTag.tag_id == tag_id)]
+    note_ids = [note_id for (note_id,) in db.query(models.NoteTag.note_id).filter(models.NoteTag.tag_id == tag_id)]
+
     # 先删除关联关系
     db.query(models.TaskTag).filter(models.TaskTag.tag_id == tag_id).delete()
     # 删除关联的笔记-标签关系
     db.query(models.NoteTag).filter(models.NoteTag.tag_id == tag_id).delete()
     # 再删除标签
     db.delete(db_tag)
+    record_changes(db, "tag", [tag_id], deleted=True)
+    record_changes(db, "task", task_ids)
+    record_changes(db, "note", note_ids)
+    # 任务和笔记列表里带有标签信息，一并失效
+    bump_table_versions(db, "tags", "tasks", "notes")
+    unindex_tag(db, tag_id)
     db.commit()
     return True
\ No newline at end of file
@@ -1,38 +1,20 @@
 from sqlalchemy.orm import Session, aliased, joinedload 
 from .. import models, schemas
-from datetime import datetime
+from datetime import datetime, date
 from fastapi import HTTPException
 from typing import Optional, List
-from sqlalchemy import func,or_, desc, asc
-
-
-def get_tasks(db: Session):
-    tasks = db.query(models.Task).all()
-    task_list = []
-    for task in tasks:
-        task_dict = {
-            "id": task.id,
-            "type": task.type,
-            "title": task.title,
-            "content": task.content,
-            "status": task.status,
-            "priority": task.priority,
-            "deadline": task.deadline,
-            "isPinned": task.isPinned,
-            "createdAt": task.createdAt.strftime("%Y-%m-%d %H:%M:%S"),
-            "updatedAt": task.updatedAt.strftime("%Y-%m-%d %H:%M:%S"),
-            "tags": [{"id": tt.tag.id, "name": tt.tag.name, "color": tt.tag.color} for tt in task.tags]
-        }
-        task_list.append(task_dict)
-    return task_list
+from sqlalchemy import func,or_, desc, asc, and_, not_, case
+from .pagination import encode_cursor, decode_cursor, keyset_filter
+from .search_index import fts_ranked_subquery, index_task, unindex_task, index_tasks, unindex_tasks
+from .status_crud import apply_task_stat_delta, apply_task_stat_deltas, record_task_transition, record_task_transitions
+from .batch import batch_item, build_batch_result, insert_rows_returning_ids
+from .versions import bump_table_versions
+from .changes import record_changes
+from .tags_crud import link_tags, unlink_tags, tags_by_owner, tag_filter_subquery
 
-# 2. 获取单个任务
-def get_task(db: Session, task_id: int):
-    task = db.query(models.Task).options(joinedload(models.Task.tags).joinedload(models.TaskTag.tag)).filter(models.Task.id == task_id).first()
-    if not task:
-        return None
-    # 组装标签信息
-    task_dict = {
+
+def _task_to_dict(task: models.Task):
+    return {
         "id": task.id,
         "type": task.type,
         "title": task.title,
@@ -45,7 +27,174 @@ def get_task(db: Session, task_id: int):
         "updatedAt": task.updatedAt.strftime("%Y-%m-%d %H:%M:%S"),
         "tags": [{"id": tt.tag.id, "name": tt.tag.name, "color": tt.tag.color} for tt in task.tags]
     }
-    return task_dict
+
+# 列表接口直接读取这些列（不构造 ORM 对象），标签另用一条查询批量取回
+_TASK_COLUMNS = (
+    models.Task.id, models.Task.type, models.Task.title, models.Task.content, models.Task.status,
+    models.Task.priority, models.Task.deadline, models.Task.isPinned, models.Task.createdAt, models.Task.updatedAt,
+)
+
+def _format_timestamp(value: datetime):
+    # 与 strftime("%Y-%m-%d %H:%M:%S") 结果相同，但快得多
+    return value.isoformat(" ", "seconds")
+
+def _task_rows_to_dicts(db: Session, rows, all_tasks: bool = False):
+    """把列查询结果转换成 TaskResponse 结构（字段顺序与响应模型一致），all_tasks 时一次取全部标签"""
+    tags = tags_by_owner(db, "task", None if all_tasks else [row[0] for row in rows])
+    return [
+        {
+            "id": task_id,
+            "type": task_type,
+            "title": title,
+            "content": content,
+            "status": status,
+            "priority": priority,
+            "deadline": deadline,
+            "tags": tags.get(task_id, []),
+            "isPinned": is_pinned,
+            "createdAt": _format_timestamp(created_at),
+            "updatedAt": _format_timestamp(updated_at),
+        }
+        for task_id, task_type, title, content, status, priority, deadline, is_pinned, created_at, updated_at in rows
+    ]
+
+def _apply_task_search(q, query: str):
+    """优先使用 FTS5 索引过滤，返回 (query, bm25 排序列)；不可用时退回 LIKE，排序列为 None"""
+    hits = fts_ranked_subquery("tasks", query)
+    if hits is not None:
+        return q.join(hits, models.Task.id == hits.c.id), hits.c.rank
+    return q.filter(
+        (models.Task.title.ilike(f"%{query}%")) | 
+        (models.Task.content.ilike(f"%{query}%"))
+    ), None
+
+def _apply_task_tag_filter(q, tag_ids: Optional[List[int]], tag_mode: str = "all"):
+    """标签筛选：一次分组半连接，all 要求包含全部标签，any 包含任意一个"""
+    if not tag_ids:
+        return q
+    return q.filter(models.Task.id.in_(tag_filter_subquery("task", tag_ids, tag_mode)))
+
+def _has_task_filters(filters: Optional[schemas.TaskFilter]) -> bool:
+    if filters is None:
+        return False
+    return any(
+        getattr(filters, field) is not None
+        for field in ("status", "priority", "pinned", "deadline_before", "deadline_after", "overdue")
+    )
+
+def _apply_task_filters(q, filters: Optional[schemas.TaskFilter]):
+    """状态 / 优先级 / 置顶 / 截止日期筛选，由 tasks(status, priority) 和 tasks(deadline) 索引支撑"""
+    if not _has_task_filters(filters):
+        return q
+    task = models.Task
+    if filters.status:
+        q = q.filter(task.status.in_([status.value for status in filters.status]))
+    if filters.priority:
+        q = q.filter(task.priority.in_([priority.value for priority in filters.priority]))
+    if filters.pinned is not None:
+        q = q.filter(task.isPinned == filters.pinned)
+    if filters.deadline_after is not None:
+        q = q.filter(task.deadline >= filters.deadline_after)
+    if filters.deadline_before is not None:
+        q = q.filter(task.deadline <= filters.deadline_before)
+    if filters.overdue is not None:
+        overdue = and_(task.deadline < date.today(), task.status != "done")
+        q = q.filter(overdue if filters.overdue else not_(func.coalesce(overdue, False)))
+    return q
+
+# 排序键；截止日期为空的任务排在最后（倒序时最前），优先级按 high > medium > low > none
+_NO_DEADLINE = date(9999, 12, 31)
+_PRIORITY_RANK = {"high": 3, "medium": 2, "low": 1}
+DEFAULT_TASK_SORT = "createdAt"
+
+def _task_sort_expression(sort_by: str):
+    task = models.Task
+    if sort_by == "updatedAt":
+        return task.updatedAt
+    if sort_by == "deadline":
+        return func.coalesce(task.deadline, _NO_DEADLINE)
+    if sort_by == "priority":
+        return case(_PRIORITY_RANK, value=task.priority, else_=0)
+    if sort_by == "title":
+        return func.coalesce(task.title, "")
+    return task.createdAt
+
+def _task_sort(filters: Optional[schemas.TaskFilter]):
+    """返回 (排序名, 排序表达式, 是否倒序)"""
+    sort_by = (filters.sort_by if filters else None) or DEFAULT_TASK_SORT
+    descending = (filters.order if filters else "desc") == "desc"
+    return sort_by, _task_sort_expression(sort_by), descending
+
+def get_tasks(
+    db: Session,
+    tag_ids: Optional[List[int]] = None,
+    tag_mode: str = "all",
+    filters: Optional[schemas.TaskFilter] = None
+):
+    # 只读列，标签一次取回，避免构造 ORM 对象和每个任务的懒加载查询
+    q = _apply_task_filters(_apply_task_tag_filter(db.query(models.Task), tag_ids, tag_mode), filters)
+    # 未指定 sort_by 时保持原来的顺序
+    if filters is not None and filters.sort_by:
+        _, sort_expr, descending = _task_sort(filters)
+        direction = desc if descending else asc
+        q = q.order_by(direction(sort_expr), direction(models.Task.id))
+    rows = q.with_entities(*_TASK_COLUMNS).all()
+    return _task_rows_to_dicts(db, rows, all_tasks=not tag_ids and not _has_task_filters(filters))
+
+# 1.1 游标分页获取任务（默认按创建时间倒序，id 作为同值时的决胜键）
+def get_tasks_page(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    query: Optional[str] = None,
+    tag_ids: Optional[List[int]] = None,
+    tag_mode: str = "all",
+    filters: Optional[schemas.TaskFilter] = None
+):
+    sort_by, sort_expr, descending = _task_sort(filters)
+    sort_columns = [sort_expr, models.Task.id]
+    # 默认排序的游标保持 [createdAt, id]；其他排序在前面带上排序名，换了排序方式的旧游标会被拒绝
+    sort_name = None if (sort_by, descending) == (DEFAULT_TASK_SORT, True) else f"{sort_by}:{'desc' if descending else 'asc'}"
+
+    q = _apply_task_filters(_apply_task_tag_filter(db.query(models.Task), tag_ids, tag_mode), filters)
+    if query:
+        q, _ = _apply_task_search(q, query)
+    if cursor:
+        values = decode_cursor(cursor, len(sort_columns) + (sort_name is not None))
+        if sort_name is not None:
+            if values[0] != sort_name:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            values = values[1:]
+        q = q.filter(keyset_filter(sort_columns, values, descending=descending))
+
+    # 多取一条用来判断是否还有下一页
+    direction = desc if descending else asc
+    rows = (
+        q.order_by(*[direction(col) for col in sort_columns])
+        .limit(limit + 1)
+        .with_entities(*_TASK_COLUMNS, sort_expr.label("sort_key"))
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        values = [last.sort_key, last.id]
+        next_cursor = encode_cursor(values if sort_name is None else [sort_name] + values)
+
+    return {
+        "items": _task_rows_to_dicts(db, [row[:len(_TASK_COLUMNS)] for row in rows]),
+        "next_cursor": next_cursor
+    }
+
+# 2. 获取单个任务
+def get_task(db: Session, task_id: int):
+    task = db.query(models.Task).options(joinedload(models.Task.tags).joinedload(models.TaskTag.tag)).filter(models.Task.id == task_id).first()
+    if not task:
+        return None
+    return _task_to_dict(task)
 
 # 3. 创建任务
 def create_task(db: Session, task: schemas.TaskCreate):
@@ -58,7 +207,14 @@ def create_task(db: Session, task: schemas.TaskCreate):
         deadline=task.deadline,
         isPinned=False
     )
+    # 统计计数器与任务写入在同一事务里增量更新
+    apply_task_stat_delta(db, new=(db_task.status or "todo", db_task.priority or "none"))
     db.add(db_task)
+    db.flush()
+    record_task_transition(db, db_task.id, None, db_task.status or "todo", db_task.priority)
+    index_task(db, db_task)
+    record_changes(db, "task", [db_task.id])
+    bump_table_versions(db, "tasks")
     db.commit() 
     db.refresh(db_task)  
 
@@ -67,9 +223,10 @@ def create_task(db: Session, task: schemas.TaskCreate):
         tags = db.query(models.Tag).filter(models.Tag.id.in_(task.tags)).all()
         if len(tags) != len(task.tags):
             raise HTTPException(status_code=400, detail="Invalid tag ID(s)")
-        for tag in tags:
-            task_tag = models.TaskTag(task_id=db_task.id, tag_id=tag.id)
-            db.add(task_tag)
+        # 关联写入与标签计数在同一事务
+        link_tags(db, "task", [(db_task.id, tag.id) for tag in tags])
+        record_changes(db, "task", [db_task.id])
+        bump_table_versions(db, "tasks")
         db.commit()
 
     return get_task(db, db_task.id)
@@ -86,6 +243,8 @@ def update_task(db: Session, task_id: int, task: schemas.TaskUpdate):
     except Exception:
         update_data = task.model_dump(exclude_unset=True)
 
+    old_state = (db_task.status, db_task.priority)
+
     try:
         if "tags" in update_data:
             tag_ids = update_data["tags"] or []
@@ -94,10 +253,9 @@ def update_task(db: Session, task_id: int, task: schemas.TaskUpdate):
                 if len(tags) != len(tag_ids):
                     invalid_ids = set(tag_ids) - { t.id  for t in tags}
                     raise HTTPException(status_code=400, detail=f"Invalid tag ID(s): {list(invalid_ids)}")
-            # 验证通过后，删除旧关联并新增
-            db.query(models.TaskTag).filter(models.TaskTag.task_id == task_id).delete()
-            for tag in db.query(models.Tag).filter(models.Tag.id.in_(tag_ids)).all():
-                db.add(models.TaskTag(task_id=task_id, tag_id=tag.id))
+            # 验证通过后，删除旧关联并新增（同时维护标签计数）
+            unlink_tags(db, "task", [task_id])
+            link_tags(db, "task", [(task_id, tag_id) for tag_id in dict.fromkeys(tag_ids)])
 
         # 更新其他字段
         for key, value in update_data.items():
@@ -106,7 +264,14 @@ def update_task(db: Session, task_id: int, task: schemas.TaskUpdate):
             if hasattr(db_task, key):
                 setattr(db_task, key, value)
 
-        db_task.updatedAt = datetime.now()
+        # 与模型默认值和创建时一致按 UTC 记录，趋势重建据此换算成本地时间
+        db_task.updatedAt = datetime.utcnow()
+        apply_task_stat_delta(db, old=old_state, new=(db_task.status, db_task.priority))
+        record_task_transition(db, task_id, old_state[0], db_task.status, db_task.priority)
+        if "title" in update_data or "content" in update_data:
+            index_task(db, db_task)
+        record_changes(db, "task", [task_id])
+        bump_table_versions(db, "tasks")
         db.commit()
         db.refresh(db_task)
     except HTTPException:
@@ -124,36 +289,182 @@ def delete_task(db: Session, task_id: int):
         return False
     
     # 先删除所有相关的中间表记录
-    db.query(models.TaskTag).filter(models.TaskTag.task_id == task_id).delete()
+    unlink_tags(db, "task", [task_id])
     
     # 然后删除任务本身
+    apply_task_stat_delta(db, old=(db_task.status, db_task.priority))
+    record_task_transition(db, task_id, db_task.status, None, db_task.priority)
     db.delete(db_task)
+    unindex_task(db, task_id)
+    record_changes(db, "task", [task_id], deleted=True)
+    bump_table_versions(db, "tasks")
     db.commit()
     return True
 
-def search_tasks(db: Session, query: str):
-    tasks = db.query(models.Task).filter(
-        (models.Task.title.ilike(f"%{query}%")) | 
-        (models.Task.content.ilike(f"%{query}%"))
-    ).all()
-    task_list = []
-    for task in tasks:
-        task_dict = {
-            "id": task.id,
-            "type": task.type,
-            "title": task.title,
-            "content": task.content,
-            "status": task.status,
-            "priority": task.priority,
-            "deadline": task.deadline,
-            "isPinned": task.isPinned,
-            "createdAt": task.createdAt.strftime("%Y-%m-%d %H:%M:%S"),
-            "updatedAt": task.updatedAt.strftime("%Y-%m-%d %H:%M:%S"),
-            "tags": [{"id": tt.tag.id, "name": tt.tag.name, "color": tt.tag.color} for tt in task.tags]
+def search_tasks(
+    db: Session,
+    query: str,
+    tag_ids: Optional[List[int]] = None,
+    tag_mode: str = "all",
+    filters: Optional[schemas.TaskFilter] = None
+):
+    q = _apply_task_filters(_apply_task_tag_filter(db.query(models.Task), tag_ids, tag_mode), filters)
+    q, rank = _apply_task_search(q, query)
+    if filters is not None and filters.sort_by:
+        _, sort_expr, descending = _task_sort(filters)
+        direction = desc if descending else asc
+        q = q.order_by(direction(sort_expr), direction(models.Task.id))
+    elif rank is not None:
+        # 有全文索引时按 bm25 相关度排序
+        q = q.order_by(rank)
+    rows = q.with_entities(*_TASK_COLUMNS).all()
+    return _task_rows_to_dicts(db, rows)
+
+# ========== 批量操作：每张表一条集合语句，整批一个事务 ==========
+def insert_task_rows(
+    db: Session,
+    rows: List[dict],
+    row_tag_ids: List[List[int]],
+    event_times: Optional[List[Optional[datetime]]] = None
+):
+    """
+    一条多行 INSERT 写入已校验的任务列字典，并维护标签关联、统计计数、状态日志和全文索引；
+    row_tag_ids 与 rows 一一对应。event_times 为每行状态日志的发生时间（导入历史任务时传入各自的
+    创建时间，趋势计入当天而不是导入当天），缺省或为 None 时记为当前时间。
+    返回新任务 id，调用方负责 bump 版本号和 commit
+    """
+    apply_task_stat_deltas(db, [(None, (row["status"], row["priority"])) for row in rows])
+    task_ids = insert_rows_returning_ids(db, models.Task, rows)
+
+    link_tags(db, "task", [
+        (task_id, tag_id)
+        for task_id, tag_ids in zip(task_ids, row_tag_ids)
+        for tag_id in dict.fromkeys(tag_ids)
+    ])
+
+    index_tasks(db, [(task_id, row["title"], row["content"]) for task_id, row in zip(task_ids, rows)])
+    record_task_transitions(db, [
+        (task_id, None, row["status"], row["priority"], occurred_at)
+        for task_id, row, occurred_at in zip(task_ids, rows, event_times or [None] * len(rows))
+    ])
+    record_changes(db, "task", task_ids)
+    return task_ids
+
+def batch_create_tasks(db: Session, items: List[schemas.TaskCreate]):
+    results = [None] * len(items)
+
+    # 一次查询校验整批引用到的标签
+    tag_ids = {tag_id for item in items for tag_id in (item.tags or [])}
+    valid_tag_ids = set()
+    if tag_ids:
+        valid_tag_ids = {tag_id for (tag_id,) in db.query(models.Tag.id).filter(models.Tag.id.in_(tag_ids))}
+
+    now = datetime.utcnow()
+    rows = []
+    row_indexes = []
+    for index, item in enumerate(items):
+        invalid_ids = set(item.tags or []) - valid_tag_ids
+        if invalid_ids:
+            results[index] = batch_item(index, error=f"Invalid tag ID(s): {sorted(invalid_ids)}")
+            continue
+        rows.append({
+            "title": item.title,
+            "content": item.content,
+            "status": item.status or "todo",
+            "priority": item.priority,
+            "deadline": item.deadline,
+            "isPinned": False,
+            "createdAt": now,
+            "updatedAt": now
+        })
+        row_indexes.append(index)
+
+    if rows:
+        task_ids = insert_task_rows(db, rows, [items[index].tags or [] for index in row_indexes])
+        for task_id, index in zip(task_ids, row_indexes):
+            results[index] = batch_item(index, id=task_id)
+        bump_table_versions(db, "tasks")
+
+    db.commit()
+    return build_batch_result(results)
+
+def batch_update_tasks(db: Session, update: schemas.TaskBatchUpdate):
+    values = update.model_dump(exclude_unset=True)
+    ids = values.pop("ids")
+    # status / priority / isPinned 不允许置空；deadline 传 null 表示清除截止日期
+    values = {
+        key: value for key, value in values.items()
+        if value is not None or key == "deadline"
+    }
+
+    existing = {
+        task_id: (status, priority)
+        for task_id, status, priority in db.query(
+            models.Task.id, models.Task.status, models.Task.priority
+        ).filter(models.Task.id.in_(ids))
+    }
+
+    if values and existing:
+        changes = {
+            task_id: (old, (values.get("status", old[0]), values.get("priority", old[1])))
+            for task_id, old in existing.items()
         }
-        task_list.append(task_dict)
-    return task_list
+        apply_task_stat_deltas(db, list(changes.values()))
+        record_task_transitions(db, [
+            (task_id, old[0], new[0], new[1]) for task_id, (old, new) in changes.items()
+        ])
+
+        values["updatedAt"] = datetime.utcnow()
+        db.query(models.Task).filter(models.Task.id.in_(list(existing))).update(
+            values, synchronize_session=False
+        )
+        record_changes(db, "task", existing)
+        bump_table_versions(db, "tasks")
+        db.commit()
+
+    return build_batch_result([
+        batch_item(index, id=task_id, error=None if task_id in existing else "Task not found")
+        for index, task_id in enumerate(ids)
+    ])
 
+def batch_delete_tasks(db: Session, ids: List[int]):
+    existing = {
+        task_id: (status, priority)
+        for task_id, status, priority in db.query(
+            models.Task.id, models.Task.status, models.Task.priority
+        ).filter(models.Task.id.in_(ids))
+    }
+
+    if existing:
+        found_ids = list(existing)
+        apply_task_stat_deltas(db, [(old, None) for old in existing.values()])
+        record_task_transitions(db, [
+            (task_id, old[0], None, old[1]) for task_id, old in existing.items()
+        ])
+        unlink_tags(db, "task", found_ids)
+        db.query(models.Task).filter(models.Task.id.in_(found_ids)).delete(synchronize_session=False)
+        unindex_tasks(db, found_ids)
+        record_changes(db, "task", found_ids, deleted=True)
+        bump_table_versions(db, "tasks")
+        db.commit()
 
+    return build_batch_result([
+        batch_item(index, id=task_id, error=None if task_id in existing else "Task not found")
+        for index, task_id in enumerate(ids)
+    ])
 
+def get_tasks_by_ids(db: Session, task_ids: List[int]):
+    """按 id 批量取任务（列查询 + 批量标签），不存在的 id 忽略"""
+    rows = []
+    for start in range(0, len(task_ids), 500):
+        chunk = task_ids[start:start + 500]
+        rows.extend(db.query(models.Task).filter(models.Task.id.in_(chunk)).with_entities(*_TASK_COLUMNS).all())
+    return _task_rows_to_dicts(db, rows)
 
+# ========== 导出：按主键分批读取，每批连同标签一起返回 ==========
+def export_tasks_batch(db: Session, after_id: int = 0, limit: int = 1000, updated_since: Optional[datetime] = None):
+    q = db.query(models.Task).filter(models.Task.id > after_id)
+    if updated_since is not None:
+        q = q.filter(models.Task.updatedAt >= updated_since)
+    rows = q.order_by(models.Task.id).limit(limit).with_entities(*_TASK_COLUMNS).all()
+    return _task_rows_to_dicts(db, rows)
@@ -0,0 +1,33 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from .. import models
+
+# 参与缓存失效的表：任务/笔记的关联标签变化也算在 tasks / notes 上
+VERSIONED_TABLES = ("tasks", "notes", "tags")
+
+
+def init_table_versions(db: Session):
+    """补齐版本号行（启动时调用一次）"""
+    existing = {name for (name,) in db.query(models.TableVersion.name)}
+    for name in VERSIONED_TABLES:
+        if name not in existing:
+            db.add(models.TableVersion(name=name, version=0))
+    db.commit()
+
+
+def bump_table_versions(db: Session, *tables: str):
+    """在当前事务里把指定表的版本号 +1，调用方负责 commit"""
+    db.execute(
+        update(models.TableVersion)
+        .where(models.TableVersion.name.in_(list(tables)))
+        .values(version=models.TableVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_table_versions(db: Session, tables):
+    rows = db.query(models.TableVersion.name, models.TableVersion.version).filter(
+        models.TableVersion.name.in_(list(tables))
+    ).all()
+    versions = dict(rows)
+    return tuple(versions.get(name, 0) for name in tables)
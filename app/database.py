@@ -1,16 +1,96 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .metrics import observe_threadpool_wait
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./todo_notes.db"
+db_settings = settings.database
+SQLALCHEMY_DATABASE_URL = db_settings.url
+ASYNC_DATABASE_URL = db_settings.resolved_async_url()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# DB_ASYNC=1 时路由通过 AsyncSession（aiosqlite 驱动）访问数据库，不再占用线程池
+ASYNC_MODE = db_settings.async_mode
+
+# 最近一个连接上实际生效的 PRAGMA 值（/health 展示用）
+applied_pragmas = {}
+
+def _engine_options():
+    options = {}
+    if db_settings.is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+        # 内存库使用单连接池，连接池参数只对文件库生效
+        if ":memory:" in SQLALCHEMY_DATABASE_URL:
+            return options
+    options.update(
+        pool_size=db_settings.pool_size,
+        max_overflow=db_settings.max_overflow,
+        pool_timeout=db_settings.pool_timeout,
+    )
+    return options
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    每个新连接上设置 PRAGMA：WAL 让读不再被写阻塞，busy_timeout 让写锁冲突时等待而不是
+    直接报 database is locked
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(db_settings.busy_timeout)}")
+        cursor.execute(f"PRAGMA journal_mode = {db_settings.journal_mode.upper()}")
+        journal_mode = cursor.fetchone()
+        cursor.execute(f"PRAGMA synchronous = {db_settings.synchronous.upper()}")
+        cursor.execute(f"PRAGMA cache_size = {int(db_settings.cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(db_settings.mmap_size)}")
+        cursor.execute(f"PRAGMA temp_store = {db_settings.temp_store.upper()}")
+    finally:
+        cursor.close()
+    # 内存库等不支持 WAL 时 SQLite 会返回实际使用的模式
+    applied_pragmas["journal_mode"] = journal_mode[0] if journal_mode else None
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options())
+if db_settings.is_sqlite:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_MODE:
+    # 仅在异步模式下导入，未安装 aiosqlite 时同步模式不受影响
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options())
+    if db_settings.is_sqlite:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+def database_profile():
+    """当前生效的数据库配置（不含密码）"""
+    url = engine.url.render_as_string(hide_password=True)
+    profile = {
+        "url": url,
+        "async_mode": ASYNC_MODE,
+        "pool": {
+            "class": type(engine.pool).__name__,
+            "size": db_settings.pool_size,
+            "max_overflow": db_settings.max_overflow,
+            "timeout": db_settings.pool_timeout,
+        },
+    }
+    if db_settings.is_sqlite:
+        profile["pragmas"] = {
+            "journal_mode": applied_pragmas.get("journal_mode", db_settings.journal_mode.lower()),
+            "synchronous": db_settings.synchronous.upper(),
+            "cache_size": db_settings.cache_size,
+            "mmap_size": db_settings.mmap_size,
+            "temp_store": db_settings.temp_store.upper(),
+            "busy_timeout": db_settings.busy_timeout,
+        }
+    return profile
+
 class Base(DeclarativeBase):
     pass
 
@@ -20,4 +100,36 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 路由使用的会话：异步模式为 AsyncSession，否则为普通 Session
+async def get_session():
+    if ASYNC_MODE:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# 在依赖注入之外打开会话（例如流式响应的生成器里，请求处理函数返回后仍要继续读库）
+open_session = asynccontextmanager(get_session)
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    在路由里执行 crud 函数：
+    异步模式下通过 AsyncSession.run_sync 在事件循环上执行（IO 由 aiosqlite 异步等待），
+    同步模式下放到线程池执行，与原来的 def 路由行为一致
+    """
+    if ASYNC_MODE:
+        return await db.run_sync(fn, *args, **kwargs)
+    queued = time.perf_counter()
+
+    def call():
+        # 排队时间反映线程池是否饱和（/metrics 的 threadpool_wait_seconds）
+        observe_threadpool_wait(time.perf_counter() - queued)
+        return fn(db, *args, **kwargs)
+
+    return await run_in_threadpool(call)
@@ -0,0 +1,127 @@
+# events.py - 变更推送：crud 写操作在事务里登记变更，提交后由进程内的 ChangeHub 扇出给 SSE / WebSocket 客户端
+import asyncio
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .serialization import json_dumps
+
+# 每个客户端最多积压的事件数；跟不上时丢弃积压，只发一条 resync，客户端收到后用 /api/sync 补齐
+EVENT_QUEUE_SIZE = 64
+# 单个事件里每类最多列出的 id，超过时只给出表名并标记 truncated（批量导入等）
+EVENT_MAX_IDS = 100
+RESYNC_EVENT = json_dumps({"type": "resync"}).decode("utf-8")
+
+_PLURALS = {"task": "tasks", "note": "notes", "tag": "tags"}
+
+
+class ChangeHub:
+    """
+    进程内扇出：每个连接一个有界 asyncio.Queue，空闲连接只占一个队列；
+    事件序列化一次后放进所有队列，publish 可以在线程池线程里调用
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._queues = set()
+        self._loop = None
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._queues)
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._queues.discard(queue)
+
+    def publish(self, payload: dict):
+        if not self._queues or self._loop is None:
+            return
+        message = json_dumps(payload).decode("utf-8")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(message)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._fan_out, message)
+        except RuntimeError:
+            # 事件循环已关闭（进程退出中）
+            pass
+
+    def _fan_out(self, message: str):
+        self.published += 1
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+
+    def stats(self):
+        return {"subscribers": len(self), "published": self.published, "dropped": self.dropped}
+
+
+hub = ChangeHub()
+
+
+# ========== 事务内登记，提交后发布 ==========
+def _pending(db: Session):
+    pending = db.info.get("pending_events")
+    if pending is None:
+        pending = db.info["pending_events"] = {"tables": set(), "upserted": {}, "deleted": {}}
+    return pending
+
+
+def stage_changes(db: Session, kind: str, ids, deleted: bool = False):
+    """登记一批任务 / 笔记 / 标签的变更，随当前事务提交后推送；回滚时丢弃。没有订阅者时不登记"""
+    if not hub:
+        return
+    table = _PLURALS[kind]
+    pending = _pending(db)
+    pending["tables"].add(table)
+    pending["deleted" if deleted else "upserted"].setdefault(table, set()).update(ids)
+
+
+def stage_tables(db: Session, *tables: str):
+    """登记没有实体 id 的变化（如统计计数器）"""
+    if not hub:
+        return
+    _pending(db)["tables"].update(tables)
+
+
+def _build_event(pending: dict):
+    payload = {"type": "change", "tables": sorted(pending["tables"]), "truncated": False}
+    for key in ("upserted", "deleted"):
+        payload[key] = {}
+        for table, ids in pending[key].items():
+            if len(ids) > EVENT_MAX_IDS:
+                payload["truncated"] = True
+                continue
+            payload[key][table] = sorted(ids)
+    # 同一事务里先改后删的实体只算删除
+    for table, ids in payload["deleted"].items():
+        if table in payload["upserted"]:
+            deleted = set(ids)
+            payload["upserted"][table] = [i for i in payload["upserted"][table] if i not in deleted]
+    return payload
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop("pending_events", None)
+    if pending and pending["tables"]:
+        hub.publish(_build_event(pending))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("pending_events", None)
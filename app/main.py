@@ -1,11 +1,34 @@
 # main.py - 确保正确导入路由
+import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import todos, notes, tags, stats 
-from .database import engine
+from .routes import todos, notes, tags, stats, maintenance, export, imports, sync, events
+from .config import settings
+from .database import engine, async_engine, SessionLocal, database_profile
 from .models import * 
+from .crud.search_index import init_search_index
+from .crud.status_crud import reconcile_daily_stat
+from .crud.versions import init_table_versions
+from .crud.tag_index import init_tag_index
+from .migrations import run_migrations
+from .events import hub as event_hub
+from .metrics import MetricsMiddleware, instrument_engine, render_metrics
+from . import query_budget
 
-Base.metadata.create_all(bind=engine) 
+logger = logging.getLogger(__name__)
+
+# 建表、补列、建索引都由迁移完成，已有数据的库启动时自动升级；迁移报告写日志，也在 /health 里展示
+schema = run_migrations(engine)
+for _name, _report in schema["reports"].items():
+    logger.info("迁移 %s: %s", _name, _report)
+init_search_index(engine)
+
+# 统计计数器之后由任务写操作增量维护，启动时先用一次 GROUP BY 校正基线
+with SessionLocal() as _db:
+    reconcile_daily_stat(_db)
+    init_table_versions(_db)
+    init_tag_index(_db)
 
 app = FastAPI(
     title="TODO + Notes + Stats API",
@@ -24,10 +47,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求延迟 / SQL 计数（/metrics）；放在最外层，CORS 预检请求也会计入
+if settings.metrics.enabled:
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    app.add_middleware(MetricsMiddleware)
+
+# SQL 预算 / N+1 检测（开发、测试环境用 QUERY_BUDGET=warn|raise 打开）
+if settings.query_budget.mode != "off":
+    query_budget.instrument_engine(engine)
+    if async_engine is not None:
+        query_budget.instrument_engine(async_engine.sync_engine)
+    app.add_middleware(
+        query_budget.QueryBudgetMiddleware,
+        mode=settings.query_budget.mode,
+        default_budget=settings.query_budget.default_budget,
+        n_plus_one=settings.query_budget.n_plus_one_threshold,
+    )
+
 app.include_router(todos.router)
 app.include_router(notes.router)
 app.include_router(tags.router)  
 app.include_router(stats.router)  
+app.include_router(maintenance.router)
+app.include_router(export.router)
+app.include_router(imports.router)
+app.include_router(sync.router)
+app.include_router(events.router)
   
 
 @app.get("/")
@@ -45,4 +92,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "database": database_profile(),
+        "schema_version": schema["version"],
+        "migrations": {"applied": schema["applied"], "reports": schema["reports"]},
+        "events": event_hub.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus 文本格式的请求指标"""
+    pool = (async_engine.sync_engine if async_engine is not None else engine).pool
+    gauges = {
+        "db_pool_checked_out": ("Database connections currently checked out", getattr(pool, "checkedout", lambda: 0)()),
+        "event_subscribers": ("Connected change feed clients", len(event_hub)),
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
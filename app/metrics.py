@@ -0,0 +1,206 @@
+# metrics.py - 请求级指标：按路由模板和状态码统计延迟直方图，按请求统计 SQL 条数和耗时，
+# 以及线程池 / 连接池的占用情况；GET /metrics 以 Prometheus 文本格式输出
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from anyio.to_thread import current_default_thread_limiter
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+THREADPOOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class RequestStats:
+    """单个请求里执行的 SQL 条数和耗时（线程池里执行的 crud 也会写到同一个对象上）"""
+    __slots__ = ("sql_count", "sql_time")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+
+# 当前请求的统计对象；请求之外（启动、迁移）执行的 SQL 不计入
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # 落在第一个上界 >= value 的桶里，输出时再累加成 Prometheus 的累计计数
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.latency = {}  # (method, route, status) -> Histogram
+        self.sql_count = {}  # (method, route) -> Histogram
+        self.sql_seconds = {}  # (method, route) -> 累计 SQL 耗时
+        self.threadpool_wait = Histogram(THREADPOOL_WAIT_BUCKETS)
+        self.in_flight = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route, str(status))
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+        route_key = (method, route)
+        histogram = self.sql_count.get(route_key)
+        if histogram is None:
+            histogram = self.sql_count[route_key] = Histogram(SQL_COUNT_BUCKETS)
+        histogram.observe(stats.sql_count)
+        self.sql_seconds[route_key] = self.sql_seconds.get(route_key, 0.0) + stats.sql_time
+
+
+registry = MetricsRegistry()
+
+
+def observe_threadpool_wait(seconds: float):
+    """run_db 提交到线程池到开始执行之间的排队时间"""
+    registry.threadpool_wait.observe(seconds)
+
+
+# ========== SQL 计数：engine 事件 ==========
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.sql_time += time.perf_counter() - starts.pop()
+    stats.sql_count += 1
+
+
+def instrument_engine(engine):
+    """给同步 engine（异步模式传 async_engine.sync_engine）挂上 SQL 计数事件"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ========== 中间件 ==========
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件（不包装响应体，流式响应不受影响）；延迟从收到请求到响应体发送完毕，
+    路由取匹配到的路径模板（/api/tasks/{task_id}），没有匹配的请求记为 unmatched
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+        registry.in_flight += 1
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            current_request.reset(token)
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                getattr(route, "path", None) or "unmatched",
+                status,
+                time.perf_counter() - start,
+                stats,
+            )
+
+
+# ========== Prometheus 文本格式 ==========
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_metrics(gauges: Optional[dict] = None) -> str:
+    """
+    输出所有指标；gauges 为调用方补充的 {名称: (说明, 值)}（连接池、推送连接数等）。
+    需要在事件循环里调用（读取线程池的占用）
+    """
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route template and status code",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(registry.latency.items()):
+        lines += _histogram_lines(
+            "http_request_duration_seconds", _labels(method=method, route=route, status=status), histogram
+        )
+
+    lines += [
+        "# HELP http_request_sql_queries SQL statements executed per request",
+        "# TYPE http_request_sql_queries histogram",
+    ]
+    for (method, route), histogram in sorted(registry.sql_count.items()):
+        lines += _histogram_lines("http_request_sql_queries", _labels(method=method, route=route), histogram)
+
+    lines += [
+        "# HELP http_request_sql_seconds_total Time spent in SQL statements by route",
+        "# TYPE http_request_sql_seconds_total counter",
+    ]
+    for (method, route), seconds in sorted(registry.sql_seconds.items()):
+        lines.append(f"http_request_sql_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+
+    lines += [
+        "# HELP threadpool_wait_seconds Time run_db calls waited for a worker thread",
+        "# TYPE threadpool_wait_seconds histogram",
+    ]
+    lines += _histogram_lines("threadpool_wait_seconds", 'pool="default"', registry.threadpool_wait)
+
+    # 同步模式下 crud 在 anyio 默认线程池里执行：waiting > 0 说明线程池已饱和，请求在排队
+    limiter = current_default_thread_limiter()
+    statistics = limiter.statistics()
+    all_gauges = {
+        "http_requests_in_flight": ("Requests currently being handled", registry.in_flight),
+        "threadpool_threads_limit": ("Worker thread limit of the default threadpool", limiter.total_tokens),
+        "threadpool_threads_in_use": ("Worker threads currently running sync code", statistics.borrowed_tokens),
+        "threadpool_tasks_waiting": ("Calls waiting for a free worker thread", statistics.tasks_waiting),
+        **(gauges or {}),
+    }
+    for name, (description, value) in all_gauges.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,153 @@
+# migrations.py - 带版本号的数据库迁移：启动时按顺序执行未执行过的迁移，记录到 schema_migrations
+# 每个迁移都写成可重复执行（检查后再改），已有数据的库和新库得到相同的结构
+import hashlib
+from datetime import datetime
+from sqlalchemy import inspect, text
+from .database import Base
+from . import models
+from .crud.note_store import compact_note_contents
+
+
+def _initial_schema(conn):
+    # 建立缺失的表；已有的表不会被修改，新增列和索引由后面的迁移处理
+    Base.metadata.create_all(bind=conn)
+
+
+def _tag_usage_counters(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("tags")}
+    for name in ("task_count", "note_count"):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE tags ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    # 从关联表回填计数
+    conn.execute(text(
+        "UPDATE tags SET "
+        "task_count = (SELECT COUNT(*) FROM task_tags WHERE task_tags.tag_id = tags.id), "
+        "note_count = (SELECT COUNT(*) FROM note_tags WHERE note_tags.tag_id = tags.id)"
+    ))
+
+
+def _create_indexes(*names):
+    def migrate(conn):
+        indexes = {
+            index.name: index
+            for table in Base.metadata.sorted_tables
+            for index in table.indexes
+        }
+        for name in names:
+            indexes[name].create(bind=conn, checkfirst=True)
+    return migrate
+
+
+def _change_log(conn):
+    models.Change.__table__.create(bind=conn, checkfirst=True)
+    # 已有数据各记一条变更，从游标 0 同步的客户端能拿到全量
+    if conn.execute(text("SELECT COUNT(*) FROM changes")).scalar():
+        return
+    now = datetime.utcnow()
+    for kind, table in (("tag", "tags"), ("task", "tasks"), ("note", "notes")):
+        conn.execute(
+            text(f"INSERT INTO changes (kind, entity_id, deleted, changed_at) SELECT :kind, id, 0, :now FROM {table} ORDER BY id"),
+            {"kind": kind, "now": now}
+        )
+
+
+def _note_content_digest(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("notes")}
+    if "content_length" not in columns:
+        conn.execute(text("ALTER TABLE notes ADD COLUMN content_length INTEGER NOT NULL DEFAULT 0"))
+    if "content_hash" not in columns:
+        conn.execute(text("ALTER TABLE notes ADD COLUMN content_hash VARCHAR(40)"))
+    # SQLite 没有内置哈希函数，按主键分批读出正文在 Python 里计算
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, content FROM notes WHERE id > :last_id AND content_hash IS NULL ORDER BY id LIMIT 1000"),
+            {"last_id": last_id}
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE notes SET content_length = :content_length, content_hash = :content_hash WHERE id = :id"),
+            [
+                {
+                    "id": note_id,
+                    "content_length": len(content or ""),
+                    "content_hash": hashlib.sha1((content or "").encode("utf-8")).hexdigest(),
+                }
+                for note_id, content in rows
+            ]
+        )
+        last_id = rows[-1][0]
+
+
+def _note_content_store(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("notes")}
+    if "content_external" not in columns:
+        conn.execute(text("ALTER TABLE notes ADD COLUMN content_external BOOLEAN NOT NULL DEFAULT 0"))
+    models.NoteContent.__table__.create(bind=conn, checkfirst=True)
+    # 已有的长正文压缩后移出 notes 表，报告节省的字节数
+    report = compact_note_contents(conn)
+    return report if report["moved"] else None
+
+
+def _note_revisions(conn):
+    models.NoteRevision.__table__.create(bind=conn, checkfirst=True)
+
+
+# (版本号, 名称, 迁移函数)；只能追加，不要修改已发布的迁移
+MIGRATIONS = [
+    (1, "initial_schema", _initial_schema),
+    (2, "tag_usage_counters", _tag_usage_counters),
+    (3, "hot_path_indexes", _create_indexes(
+        "ix_tasks_createdAt_id",
+        "ix_tasks_status_priority",
+        "ix_tasks_deadline",
+        "ix_notes_isPinned_updated_at",
+        "ix_task_tags_tag_id",
+        "ix_note_tags_tag_id",
+    )),
+    (4, "change_log", _change_log),
+    (5, "note_content_digest", _note_content_digest),
+    (6, "note_content_store", _note_content_store),
+    (7, "note_revisions", _note_revisions),
+]
+
+
+def get_schema_version(conn) -> int:
+    if not inspect(conn).has_table(models.SchemaMigration.__tablename__):
+        return 0
+    version = conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return version or 0
+
+
+def run_migrations(engine):
+    """
+    执行所有未执行的迁移（每个迁移一个事务），有新迁移时执行 ANALYZE 刷新查询规划统计；
+    迁移函数返回的字典（如压缩节省的空间）按迁移名放在 reports 里
+    """
+    with engine.begin() as conn:
+        models.SchemaMigration.__table__.create(bind=conn, checkfirst=True)
+        applied = {version for (version,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    migrated = []
+    reports = {}
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            report = migrate(conn)
+            conn.execute(
+                models.SchemaMigration.__table__.insert(),
+                {"version": version, "name": name, "applied_at": datetime.utcnow()}
+            )
+        migrated.append(name)
+        if report:
+            reports[name] = report
+
+    if migrated:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+    return {"version": current, "applied": migrated, "reports": reports}
@@ -1,7 +1,7 @@
 # models.py - 修正后的版本
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Text, JSON, Enum, Float, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Text, JSON, Enum, Float, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 import enum
 from .database import Base
@@ -25,6 +25,9 @@ class Tag(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     color = Column(String)
+    # 使用计数（冗余字段，随关联的增删在同一事务里维护）
+    task_count = Column(Integer, default=0, server_default="0", nullable=False)
+    note_count = Column(Integer, default=0, server_default="0", nullable=False)
     # 关联任务（多对多，需中间表）
     tasks = relationship("TaskTag", back_populates="tag")
     notes = relationship("NoteTag", back_populates="tag")
@@ -38,6 +41,11 @@ class TaskTag(Base):
     task = relationship("Task", back_populates="tags")
     tag = relationship("Tag", back_populates="tasks")
 
+    __table_args__ = (
+        # 主键是 (task_id, tag_id)，按标签反查任务需要单独的索引
+        Index("ix_task_tags_tag_id", "tag_id"),
+    )
+
 class NoteTag(Base):
     __tablename__ = "note_tags"
 
@@ -46,6 +54,10 @@ class NoteTag(Base):
     note = relationship("Note", back_populates="tags")
     tag = relationship("Tag", back_populates="notes")
 
+    __table_args__ = (
+        Index("ix_note_tags_tag_id", "tag_id"),
+    )
+
 class Task(Base):
     __tablename__ = "tasks"
 
@@ -62,12 +74,25 @@ class Task(Base):
     # 关联标签（多对多）
     tags = relationship("TaskTag", back_populates="task")
 
+    __table_args__ = (
+        # 游标分页的排序键
+        Index("ix_tasks_createdAt_id", "createdAt", "id"),
+        # 统计聚合和按状态 / 优先级筛选
+        Index("ix_tasks_status_priority", "status", "priority"),
+        Index("ix_tasks_deadline", "deadline"),
+    )
+
 class Note(Base):
     __tablename__ = "notes"
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String, default="note")  # 固定为 note
     title = Column(String, default="未命名笔记")
     content = Column(Text, default="")
+    # 正文的字符数和 sha1，随正文一起写入；摘要列表不读正文也能给出
+    content_length = Column(Integer, default=0, nullable=False)
+    content_hash = Column(String(40))
+    # 正文超过阈值时压缩存放在 note_contents，content 只保留开头一段（见 crud/note_store.py）
+    content_external = Column(Boolean, default=False, nullable=False)
     priority = Column(Enum(PriorityEnum), default=PriorityEnum.NONE) 
     status = Column(Enum(StatusEnum), default=StatusEnum.DONE)
     isPinned = Column(Boolean, default=False)
@@ -75,6 +100,68 @@ class Note(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # 列表默认排序：置顶优先，按更新时间倒序
+        Index("ix_notes_isPinned_updated_at", "isPinned", "updated_at"),
+    )
+
+class NoteContent(Base):
+    """移出 notes 表的长正文，codec 为 zlib 或 raw（压缩不划算时原样存放）"""
+    __tablename__ = "note_contents"
+    note_id = Column(Integer, ForeignKey("notes.id"), primary_key=True)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+class NoteRevision(Base):
+    """笔记修订历史：kind 为 snapshot（压缩的完整正文）或 delta（与上一修订的压缩差异），见 crud/revision_crud.py"""
+    __tablename__ = "note_revisions"
+    id = Column(Integer, primary_key=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    revision = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    title = Column(String)
+    content_length = Column(Integer, nullable=False)
+    content_hash = Column(String(40), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_note_revisions_note_id_revision", "note_id", "revision", unique=True),
+    )
+
+class SchemaMigration(Base):
+    """已执行的数据库迁移（app/migrations.py），最大版本号即当前 schema 版本"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+class Change(Base):
+    """
+    变更日志：任务 / 笔记 / 标签每次写入追加一行，seq 单调递增（AUTOINCREMENT 保证删除后不复用），
+    增量同步按 seq 取某个游标之后的变更，deleted 为删除墓碑
+    """
+    __tablename__ = "changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # task / note / tag
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, default=False, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_changes_kind_entity_id", "kind", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+
+class TableVersion(Base):
+    """每张业务表的版本号，crud 写操作在同一事务里 +1，用于 ETag / 响应缓存失效"""
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
 # ========== 新增统计相关模型 ==========
 class DailyStat(Base):
     """每日统计"""
@@ -102,6 +189,18 @@ class DailyStat(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class TaskEvent(Base):
+    """任务状态变更日志（只追加），周/月/年统计由它汇总"""
+    __tablename__ = "task_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, index=True)  # 不加外键，任务删除后日志仍保留
+    event = Column(String)  # created / status_changed / deleted
+    from_status = Column(String, nullable=True)
+    to_status = Column(String, nullable=True)
+    priority = Column(String, nullable=True)
+    occurred_at = Column(DateTime, default=datetime.now, index=True)
+
 class WeeklyStat(Base):
     """每周统计"""
     __tablename__ = "weekly_stats"
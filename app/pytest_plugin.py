@@ -0,0 +1,77 @@
+# pytest_plugin.py - SQL 预算的 pytest fixture，在 conftest.py 里用 pytest_plugins = ["app.pytest_plugin"] 启用：
+#
+#     def test_notes_list(client, query_budget):
+#         with query_budget(5):
+#             client.get("/api/notes/")
+#
+#     @pytest.mark.parametrize("route", iter_budget_routes(), ids=route_id)
+#     def test_route_budgets(client, query_budget, route):
+#         with query_budget.route(route):
+#             client.get(...)
+#
+# TestClient 在另一个线程的事件循环里运行应用，所以这里用全局观察者统计，违规在测试线程里断言
+import importlib
+import pkgutil
+from contextlib import contextmanager
+from typing import Optional
+import pytest
+from fastapi.routing import APIRoute
+from . import routes as route_modules
+from .database import engine, async_engine
+from .query_budget import (
+    N_PLUS_ONE_THRESHOLD, allows_repeats, declared_budget, has_query_budget, instrument_engine, watch_queries,
+)
+
+
+def route_id(route) -> str:
+    return f"{','.join(sorted(route.methods))} {route.path}"
+
+
+def iter_budget_routes(methods=None):
+    """
+    app/routes 下各模块 router 里的 HTTP 路由（methods 为空时不按方法筛选），供 parametrize 逐个断言；
+    有路由没有用 @query_budget 声明预算时直接报错并列出这些路由，新增路由必须先声明预算
+    """
+    routes, undeclared = [], []
+    for module_info in pkgutil.iter_modules(route_modules.__path__):
+        module = importlib.import_module(f"{route_modules.__name__}.{module_info.name}")
+        router = getattr(module, "router", None)
+        for route in getattr(router, "routes", ()):
+            if not isinstance(route, APIRoute) or (methods and not route.methods & set(methods)):
+                continue
+            (routes if has_query_budget(route) else undeclared).append(route)
+    if undeclared:
+        raise ValueError("routes without @query_budget: " + ", ".join(route_id(route) for route in undeclared))
+    return routes
+
+
+def _report(watch) -> str:
+    lines = list(watch.violations) + [f"executed {watch.count} statements"]
+    lines += [f"  {count}x {statement[:200]}" for count, statement in watch.repeated()]
+    return "\n".join(lines)
+
+
+class QueryBudgetFixture:
+    def __init__(self, n_plus_one: int = N_PLUS_ONE_THRESHOLD):
+        self.n_plus_one = n_plus_one
+
+    @contextmanager
+    def __call__(self, max_queries: Optional[int], n_plus_one: Optional[int] = None):
+        """代码块里执行的语句不超过 max_queries，且没有疑似 N+1（n_plus_one=0 时不检查）"""
+        threshold = self.n_plus_one if n_plus_one is None else n_plus_one
+        with watch_queries(budget=max_queries, n_plus_one=threshold) as watch:
+            yield watch
+        if watch.violations:
+            pytest.fail(_report(watch), pytrace=False)
+
+    def route(self, route):
+        """按路由上 @query_budget 声明的预算断言；声明了 allow_repeats 的路由不做 N+1 检查"""
+        return self(declared_budget(route), n_plus_one=0 if allows_repeats(route) else None)
+
+
+@pytest.fixture
+def query_budget():
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    return QueryBudgetFixture()
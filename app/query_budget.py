@@ -0,0 +1,167 @@
+# query_budget.py - 开发 / 测试用的 SQL 预算和 N+1 检测：
+# 按请求统计执行的语句，同一条 SQL 以不同参数重复执行达到阈值时视为 N+1，
+# 超过路由上声明的预算（@query_budget(n)）时按配置记录警告或直接抛错
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryBudgetError(RuntimeError):
+    """raise 模式下超出预算或检测到 N+1 时抛出"""
+
+
+def query_budget(max_queries: Optional[int], allow_repeats: bool = False):
+    """
+    声明路由允许执行的最多 SQL 条数（None 表示不限），写在 @router.get(...) 下面；
+    按批读写的路由（导出、导入）本来就会以不同参数重复执行同一条语句，用 allow_repeats 关闭 N+1 检测
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        endpoint.query_allow_repeats = allow_repeats
+        return endpoint
+    return decorate
+
+
+def has_query_budget(route) -> bool:
+    """路由上是否用 @query_budget 声明过预算（声明为 None 也算）"""
+    return hasattr(getattr(route, "endpoint", None), "query_budget")
+
+
+def declared_budget(route, default: Optional[int] = None) -> Optional[int]:
+    return getattr(getattr(route, "endpoint", None), "query_budget", default)
+
+
+def allows_repeats(route) -> bool:
+    return getattr(getattr(route, "endpoint", None), "query_allow_repeats", False)
+
+
+class QueryWatch:
+    """
+    记录一段代码里执行的语句。mode 为 raise 时在越界的那条语句上抛错，warn 时写日志，
+    collect 只收集，由调用方读取 violations（pytest fixture 在测试线程里断言）
+    """
+
+    def __init__(self, budget: Optional[int] = None, label: str = "", mode: str = "collect",
+                 n_plus_one: int = N_PLUS_ONE_THRESHOLD, scope: Optional[dict] = None, default_budget: Optional[int] = None):
+        self._budget = budget
+        self._resolved = scope is None
+        self.label = label
+        self.mode = mode
+        self.n_plus_one = n_plus_one
+        self.scope = scope
+        self.default_budget = default_budget
+        self.count = 0
+        self.statements = {}  # SQL -> [执行次数, {参数}]
+        self.violations = []
+
+    def _resolve_route(self):
+        # 请求级的预算在路由匹配之后才能确定，第一条语句执行时再从 scope 里取
+        route = self.scope.get("route")
+        if route is None:
+            return
+        self._resolved = True
+        if self._budget is None:
+            self._budget = declared_budget(route, self.default_budget)
+        if allows_repeats(route):
+            self.n_plus_one = None
+
+    @property
+    def budget(self) -> Optional[int]:
+        if not self._resolved:
+            self._resolve_route()
+        return self._budget
+
+    def record(self, statement: str, parameters, executemany: bool):
+        if not self._resolved:
+            self._resolve_route()
+        self.count += 1
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = self.statements[statement] = [0, set()]
+        entry[0] += 1
+        # executemany 本身就是一次批量写入，不参与 N+1 判断
+        if not executemany and self.n_plus_one:
+            entry[1].add(repr(parameters))
+            if len(entry[1]) == self.n_plus_one:
+                self._violation(
+                    f"{self.label}possible N+1: same statement executed with "
+                    f"{self.n_plus_one} different parameter sets: {statement[:200]}"
+                )
+        if self._budget is not None and self.count == self._budget + 1:
+            self._violation(f"{self.label}query budget exceeded: more than {self._budget} statements")
+
+    def _violation(self, message: str):
+        self.violations.append(message)
+        if self.mode == "raise":
+            raise QueryBudgetError(message)
+        if self.mode == "warn":
+            logger.warning(message)
+
+    def repeated(self, min_count: int = 2):
+        """重复执行的语句，按次数倒序：[(次数, SQL), ...]"""
+        return sorted(
+            ((count, statement) for statement, (count, _) in self.statements.items() if count >= min_count),
+            reverse=True,
+        )
+
+
+# 当前请求的 QueryWatch（中间件设置，线程池里的 crud 也能读到）
+current_watch: ContextVar[Optional[QueryWatch]] = ContextVar("current_watch", default=None)
+# 不区分请求的全局观察者（pytest fixture 用：TestClient 在另一个线程里运行应用，上下文变量传不过去）
+_global_watches = []
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    watch = current_watch.get()
+    if watch is not None:
+        watch.record(statement, parameters, executemany)
+    for watch in _global_watches:
+        watch.record(statement, parameters, executemany)
+
+
+def instrument_engine(engine):
+    """给同步 engine（异步模式传 async_engine.sync_engine）挂上统计事件，重复调用无副作用"""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def watch_queries(**kwargs):
+    """统计代码块里所有连接上执行的语句（不区分请求），只收集不抛错"""
+    watch = QueryWatch(mode="collect", **kwargs)
+    _global_watches.append(watch)
+    try:
+        yield watch
+    finally:
+        _global_watches.remove(watch)
+
+
+class QueryBudgetMiddleware:
+    """每个 HTTP 请求一个 QueryWatch；预算取匹配到的路由上 @query_budget 声明的值，没有声明时用 default_budget"""
+
+    def __init__(self, app, mode: str = "warn", default_budget: Optional[int] = None,
+                 n_plus_one: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.mode = mode
+        self.default_budget = default_budget
+        self.n_plus_one = n_plus_one
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        watch = QueryWatch(
+            label=f"{scope['method']} {scope['path']}: ", mode=self.mode, n_plus_one=self.n_plus_one,
+            scope=scope, default_budget=self.default_budget,
+        )
+        token = current_watch.set(watch)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_watch.reset(token)
@@ -0,0 +1,60 @@
+# events.py - 变更推送路由：SSE 和 WebSocket 两种通道，事件来自进程内的 ChangeHub
+import asyncio
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from ..events import hub
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+# 空闲连接定期发心跳，及时发现断开的客户端并防止代理超时
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/")
+@query_budget(0)
+async def stream_events(request: Request):
+    """
+    Server-Sent Events：每次提交推送一条 {"type": "change", "tables", "upserted", "deleted", "truncated"}；
+    收到 resync 或 truncated 时用 /api/sync 补齐，tables 含 stats 时刷新统计
+    """
+    queue = hub.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket):
+    """WebSocket 通道，事件格式与 SSE 相同"""
+    await websocket.accept()
+    queue = hub.subscribe()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                message = '{"type":"ping"}'
+            await websocket.send_text(message)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        hub.unsubscribe(queue)
@@ -0,0 +1,119 @@
+# export.py - 数据导出：NDJSON / CSV 流式响应，按主键分批读库，内存占用与数据量无关
+import csv
+import io
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from .. import crud
+from ..database import open_session, run_db
+from ..serialization import json_dumps
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+EXPORT_BATCH_SIZE = 1000
+
+# CSV 列；tags 列为标签名的 JSON 数组
+CSV_COLUMNS = {
+    "tasks": ["id", "title", "content", "status", "priority", "deadline", "isPinned", "createdAt", "updatedAt", "tags"],
+    "notes": ["id", "title", "content", "priority", "status", "isPinned", "created_at", "updated_at", "tags"],
+    "tags": ["id", "name", "color", "task_count", "note_count"],
+}
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _batch_fetchers(updated_since: Optional[datetime]):
+    return {
+        "tasks": lambda db, after_id: run_db(
+            db, crud.export_tasks_batch, after_id, EXPORT_BATCH_SIZE, updated_since
+        ),
+        "notes": lambda db, after_id: run_db(
+            db, crud.export_notes_batch, after_id, EXPORT_BATCH_SIZE, updated_since
+        ),
+        "tags": lambda db, after_id: run_db(db, crud.export_tags_batch, after_id, EXPORT_BATCH_SIZE),
+    }
+
+
+async def _iter_rows(kinds, updated_since: Optional[datetime]):
+    """依次产出 (kind, 一批字典)；会话在生成器内打开，整个流式响应期间有效"""
+    fetchers = _batch_fetchers(updated_since)
+    async with open_session() as db:
+        for kind in kinds:
+            after_id = 0
+            while True:
+                rows = await fetchers[kind](db, after_id)
+                if not rows:
+                    break
+                yield kind, rows
+                after_id = rows[-1]["id"]
+
+
+async def _ndjson_stream(kinds, updated_since):
+    for_all = len(kinds) > 1
+    async for kind, rows in _iter_rows(kinds, updated_since):
+        if for_all and kind == "tags":
+            # 合并导出时用 type 区分记录，任务和笔记本身已带 type 字段
+            rows = [{"type": "tag", **row} for row in rows]
+        yield b"".join(json_dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(column, value):
+    if column == "tags":
+        return json_dumps([tag["name"] for tag in value or []]).decode("utf-8")
+    if isinstance(value, datetime):
+        return value.isoformat(" ", "seconds")
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else value
+
+
+async def _csv_stream(kind, updated_since):
+    columns = CSV_COLUMNS[kind]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+    async for _, rows in _iter_rows([kind], updated_since):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_csv_value(column, row.get(column)) for column in columns] for row in rows])
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _export_response(stream, fmt: str, filename: str):
+    return StreamingResponse(
+        stream,
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/")
+@query_budget(None, allow_repeats=True)
+async def export_all(
+    updated_since: Optional[datetime] = Query(None, description="只导出此时间之后更新过的任务和笔记"),
+):
+    """
+    以 NDJSON 导出全部标签、任务和笔记（每行一条，按 type 区分）
+    """
+    kinds = ["tags", "tasks", "notes"]
+    return _export_response(_ndjson_stream(kinds, updated_since), "ndjson", "export")
+
+
+@router.get("/{kind}")
+@query_budget(None, allow_repeats=True)
+async def export_kind(
+    kind: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="导出格式: ndjson, csv"),
+    updated_since: Optional[datetime] = Query(None, description="只导出此时间之后更新过的记录（标签总是全量）"),
+):
+    """
+    流式导出任务、笔记或标签，按主键分批读取，标签随记录一起输出
+    """
+    if kind not in CSV_COLUMNS:
+        raise HTTPException(status_code=404, detail="Unknown export kind")
+    if format == "csv":
+        return _export_response(_csv_stream(kind, updated_since), "csv", kind)
+    return _export_response(_ndjson_stream([kind], updated_since), "ndjson", kind)
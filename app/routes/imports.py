@@ -0,0 +1,53 @@
+# imports.py - 批量导入：上传 NDJSON / CSV 文件，分批事务写入，返回每行的错误
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+from .. import crud, schemas
+from ..database import get_session, run_db
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/api/import", tags=["Import"])
+
+
+@router.post("/", response_model=schemas.ImportResult)
+@query_budget(None, allow_repeats=True)
+async def import_file(
+    file: UploadFile = File(..., description="NDJSON（每行一条）或带表头的 CSV"),
+    kind: Optional[str] = Query(None, pattern="^(tasks|notes)$", description="导入类型；NDJSON 省略时按每行的 type 区分"),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="文件格式，默认按文件扩展名判断"),
+    import_id: Optional[str] = Query(None, max_length=64, description="自定义导入 id，用于导入过程中查询进度"),
+    db: Session = Depends(get_session)
+):
+    """
+    流式解析上传文件，每 1000 行一个事务写入；标签按名称匹配，不存在时自动创建。
+    单行校验失败不影响其他行，错误按行号返回
+    """
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    if fmt == "csv" and kind is None:
+        raise HTTPException(status_code=400, detail="CSV import requires kind=tasks or kind=notes")
+
+    progress = crud.start_import(import_id)
+    # 上传内容已由 Starlette 存入临时文件（超过阈值落盘），这里逐行读取
+    rows = crud.iter_import_rows(file.file, fmt, kind and kind.rstrip("s"))
+    tag_map = await run_db(db, crud.TagNameMap)
+    try:
+        while await run_db(db, crud.import_next_chunk, rows, tag_map, progress):
+            pass
+    except Exception:
+        # 已提交的批次保留，进度里标记为中断，轮询方不会误以为已经导入完成
+        progress.status = "failed"
+        raise
+    progress.status = "finished"
+    return progress.to_dict()
+
+
+@router.get("/{import_id}", response_model=schemas.ImportResult)
+@query_budget(0)
+async def read_import_progress(import_id: str):
+    """
+    查询导入进度（导入进行中 status 为 running，中途出错为 failed）
+    """
+    progress = crud.get_import_progress(import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
@@ -0,0 +1,61 @@
+# maintenance.py - 数据维护相关的 API 路由（索引重建、计数校正等）
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from .. import crud
+from ..database import get_session, run_db
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/api/maintenance", tags=["Maintenance"])
+
+@router.post("/search/rebuild")
+@query_budget(None, allow_repeats=True)
+async def rebuild_search_index(db: Session = Depends(get_session)):
+    """
+    重建任务和笔记的全文索引（用于已有数据库或索引不一致时）
+    """
+    result = await run_db(db, crud.rebuild_search_index)
+    return {"success": True, **result}
+
+@router.post("/stats/reconcile")
+@query_budget(10)
+async def reconcile_stats(db: Session = Depends(get_session)):
+    """
+    从任务表重算统计计数器，并返回与增量维护结果之间的偏差
+    """
+    return await run_db(db, crud.reconcile_daily_stat)
+
+@router.post("/stats/rebuild-trends")
+@query_budget(None, allow_repeats=True)
+async def rebuild_trend_stats(db: Session = Depends(get_session)):
+    """
+    从任务状态变更日志重建周/月/年汇总表
+    """
+    result = await run_db(db, crud.rebuild_period_stats)
+    return {"success": True, **result}
+
+@router.post("/tags/repair")
+@query_budget(None, allow_repeats=True)
+async def repair_tag_counts(db: Session = Depends(get_session)):
+    """
+    从关联表重算标签的任务/笔记计数，返回被修正的标签
+    """
+    result = await run_db(db, crud.repair_tag_counts)
+    return {"success": True, **result}
+
+@router.post("/sync/compact")
+@query_budget(3)
+async def compact_sync_log(db: Session = Depends(get_session)):
+    """
+    压缩增量同步的变更日志：每个任务 / 笔记 / 标签只保留最后一条记录，不影响任何 cursor 的同步结果
+    """
+    result = await run_db(db, crud.compact_changes)
+    return {"success": True, **result}
+
+@router.post("/notes/compact")
+@query_budget(None, allow_repeats=True)
+async def compact_note_storage(db: Session = Depends(get_session)):
+    """
+    把超过阈值的行内笔记正文压缩后移到 note_contents 表，返回移动的笔记数和节省的字节数
+    """
+    result = await run_db(db, crud.compact_note_storage)
+    return {"success": True, **result}
@@ -1,85 +1,126 @@
 # notes.py - 完整的笔记 API 路由
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from .. import crud, schemas
-from ..database import get_db
+from ..database import get_session, run_db
+from ..cache import cached_json_response
+from ..query_budget import query_budget
 
 router = APIRouter(prefix="/api/notes", tags=["Notes"])
 
 # 获取笔记列表（支持搜索、筛选、排序）
-@router.get("/", response_model=List[schemas.NoteResponse])
-def read_notes(
+@router.get("/", response_model=Union[List[schemas.NoteResponse], List[schemas.NoteSummaryResponse]])
+@query_budget(6)
+async def read_notes(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = Query(None, description="搜索关键词"),
     tags: Optional[List[int]] = Query(None, description="按标签ID筛选"),
+    tag_mode: str = Query("all", pattern="^(any|all)$", description="多个标签时: all 包含全部, any 包含任意一个"),
     pinned: Optional[bool] = Query(None, description="是否置顶"),
     sort_by: Optional[str] = Query("updated_at", description="排序字段: title, created_at, updated_at, isPinned"),
     order: Optional[str] = Query("desc", description="排序顺序: asc, desc"),
-    db: Session = Depends(get_db)
+    view: str = Query("full", pattern="^(full|summary)$", description="summary 只返回正文片段、长度和哈希"),
+    db: Session = Depends(get_session)
 ):
     """
-    获取笔记列表，支持搜索、筛选和排序
+    获取笔记列表，支持搜索、筛选和排序（带 ETag，数据未变化时返回 304）
     """
-    return crud.get_notes(
-        db=db,
+    response_type = List[schemas.NoteSummaryResponse] if view == "summary" else List[schemas.NoteResponse]
+    return await cached_json_response(
+        request,
+        db,
+        ("notes", "tags"),
+        crud.get_notes,
+        response_type,
         skip=skip,
         limit=limit,
         search=search,
         tag_ids=tags,
+        tag_mode=tag_mode,
         pinned=pinned,
         sort_by=sort_by,
-        order=order
+        order=order,
+        view=view
     )
 
 # 获取单个笔记
 @router.get("/{note_id}", response_model=schemas.NoteResponse)
-def read_note(note_id: int, db: Session = Depends(get_db)):
+@query_budget(3)
+async def read_note(note_id: int, db: Session = Depends(get_session)):
     """
     根据ID获取单个笔记
     """
-    note = crud.get_note(db, note_id=note_id)
+    note = await run_db(db, crud.get_note, note_id=note_id)
     if note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
+# 修订历史
+@router.get("/{note_id}/revisions", response_model=List[schemas.NoteRevisionInfo])
+@query_budget(4)
+async def read_note_revisions(note_id: int, db: Session = Depends(get_session)):
+    """
+    列出笔记的修订（不含正文），最新的在前；从未修改过的笔记返回空列表
+    """
+    revisions = await run_db(db, crud.get_note_revisions, note_id=note_id)
+    if revisions is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return revisions
+
+@router.get("/{note_id}/revisions/{revision}", response_model=schemas.NoteRevisionResponse)
+@query_budget(4)
+async def read_note_revision(note_id: int, revision: int, db: Session = Depends(get_session)):
+    """
+    重建指定修订的标题和正文
+    """
+    result = await run_db(db, crud.get_note_revision, note_id=note_id, revision=revision)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return result
+
 # 创建笔记
 @router.post("/", response_model=schemas.NoteResponse)
-def create_note(note: schemas.NoteCreate, db: Session = Depends(get_db)):
+@query_budget(22)
+async def create_note(note: schemas.NoteCreate, db: Session = Depends(get_session)):
     """
     创建新笔记
     """
-    return crud.create_note(db=db, note=note)
+    return await run_db(db, crud.create_note, note=note)
 
 # 更新笔记
 @router.put("/{note_id}", response_model=schemas.NoteResponse)
-def update_note(note_id: int, note_update: schemas.NoteUpdate, db: Session = Depends(get_db)):
+@query_budget(25)
+async def update_note(note_id: int, note_update: schemas.NoteUpdate, db: Session = Depends(get_session)):
     """
     更新笔记信息
     """
-    db_note = crud.update_note(db=db, note_id=note_id, note_update=note_update)
+    db_note = await run_db(db, crud.update_note, note_id=note_id, note_update=note_update)
     if db_note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     return db_note
 
 # 删除笔记
 @router.delete("/{note_id}")
-def delete_note(note_id: int, db: Session = Depends(get_db)):
+@query_budget(15)
+async def delete_note(note_id: int, db: Session = Depends(get_session)):
     """
     删除笔记
     """
-    success = crud.delete_note(db=db, note_id=note_id)
+    success = await run_db(db, crud.delete_note, note_id=note_id)
     if not success:
         raise HTTPException(status_code=404, detail="Note not found")
     return {"success": True, "message": "Note deleted successfully"}
 
 # 搜索笔记
 @router.get("/search/", response_model=List[schemas.NoteResponse])
-def search_notes(
+@query_budget(4)
+async def search_notes(
     q: Optional[str] = Query(None, description="搜索关键词"),
     tag: Optional[int] = Query(None, description="按标签ID搜索"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     搜索笔记（按关键词或标签）
@@ -87,52 +128,71 @@ def search_notes(
     if not q and not tag:
         raise HTTPException(status_code=400, detail="Please provide search keyword or tag")
     
-    return crud.search_notes(db=db, keyword=q, tag=tag)
+    return await run_db(db, crud.search_notes, keyword=q, tag=tag)
 
 # 切换置顶状态
 @router.patch("/{note_id}/toggle-pin", response_model=schemas.NoteResponse)
-def toggle_pin_note(note_id: int, db: Session = Depends(get_db)):
+@query_budget(8)
+async def toggle_pin_note(note_id: int, db: Session = Depends(get_session)):
     """
     切换笔记的置顶状态
     """
-    db_note = crud.toggle_pin_note(db=db, note_id=note_id)
+    db_note = await run_db(db, crud.toggle_pin_note, note_id=note_id)
     if db_note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     return db_note
 
 # 更新笔记标签
 @router.patch("/{note_id}/tags", response_model=schemas.NoteResponse)
-def update_note_tags(
+@query_budget(16)
+async def update_note_tags(
     note_id: int,
     tag_data: schemas.NoteTagsUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     更新笔记的标签
     """
     note_update = schemas.NoteUpdate(tags=tag_data.tags)
-    db_note = crud.update_note(db=db, note_id=note_id, note_update=note_update)
+    db_note = await run_db(db, crud.update_note, note_id=note_id, note_update=note_update)
     if db_note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     return db_note
 
 # 批量操作
+@router.post("/batch/create", response_model=schemas.BatchResult)
+@query_budget(16)
+async def batch_create_notes(batch: schemas.NoteBatchCreate, db: Session = Depends(get_session)):
+    """
+    批量创建笔记（单个事务，逐项返回结果）
+    """
+    return await run_db(db, crud.batch_create_notes, batch.items)
+
+@router.post("/batch/update", response_model=schemas.BatchResult)
+@query_budget(6)
+async def batch_update_notes(batch: schemas.NoteBatchUpdate, db: Session = Depends(get_session)):
+    """
+    批量更新笔记的优先级、状态、置顶（单个事务，逐项返回结果）
+    """
+    return await run_db(db, crud.batch_update_notes, batch)
+
 @router.post("/batch/delete")
-def batch_delete_notes(
-    note_ids: List[int],
-    db: Session = Depends(get_db)
+@query_budget(14)
+async def batch_delete_notes(
+    batch: schemas.BatchDelete,
+    db: Session = Depends(get_session)
 ):
     """
-    批量删除笔记
+    批量删除笔记（单个事务，逐项返回结果）
     """
-    deleted_count = 0
-    for note_id in note_ids:
-        if crud.delete_note(db=db, note_id=note_id):
-            deleted_count += 1
+    note_ids = batch.root
+    result = await run_db(db, crud.batch_delete_notes, note_ids)
+    deleted_count = result["succeeded"]
     
     return {
         "success": True,
         "message": f"Successfully deleted {deleted_count} notes",
         "deleted_count": deleted_count,
-        "total_requested": len(note_ids)
+        "total_requested": len(note_ids),
+        "results": result["results"]
     }
@@ -2,22 +2,46 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import random  # 添加这行
 from .. import crud, schemas, models  # 添加 models 导入
-from ..database import get_db
+from ..database import get_session, run_db
+from ..query_budget import query_budget
 
 router = APIRouter(prefix="/api/stats", tags=["Stats"])
 
+async def stats_filters(
+    tag: Optional[int] = Query(None, description="按标签ID筛选"),
+    deadline_from: Optional[date] = Query(None, description="截止日期起（含）"),
+    deadline_to: Optional[date] = Query(None, description="截止日期止（含）"),
+    created_from: Optional[date] = Query(None, description="创建日期起（含）"),
+    created_to: Optional[date] = Query(None, description="创建日期止（含）"),
+    updated_from: Optional[date] = Query(None, description="更新日期起（含）"),
+    updated_to: Optional[date] = Query(None, description="更新日期止（含）"),
+) -> schemas.StatsFilter:
+    return schemas.StatsFilter(
+        tag=tag,
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+        created_from=created_from,
+        created_to=created_to,
+        updated_from=updated_from,
+        updated_to=updated_to,
+    )
+
 @router.get("/", response_model=schemas.StatsResponse)
-def get_stats(db: Session = Depends(get_db)):
+@query_budget(8)
+async def get_stats(
+    filters: schemas.StatsFilter = Depends(stats_filters),
+    db: Session = Depends(get_session)
+):
     """
     获取完整的统计数据
-    返回前端Stats.vue所需的所有统计信息
+    返回前端Stats.vue所需的所有统计信息；today 和 priority 两块支持按标签、截止日期、创建/更新日期筛选
     """
     try:
         # 尝试使用 crud 函数
-        stats = crud.get_all_stats(db)
+        stats = await run_db(db, crud.get_all_stats, filters)
         return stats
     except Exception as e:
         print(f"获取统计数据失败: {str(e)}")
@@ -118,142 +142,148 @@ def get_stats(db: Session = Depends(get_db)):
         }
 
 @router.post("/update")
-def update_stats(db: Session = Depends(get_db)):
+@query_budget(8)
+async def update_stats(db: Session = Depends(get_session)):
     """
     更新统计数据
     """
     try:
-        result = crud.update_stat_data(db)
-        return {"success": True, "message": "统计数据已更新"}
+        result = await run_db(db, crud.update_stat_data)
+        return {"success": True, "message": "统计数据已更新", **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"更新统计失败: {str(e)}")
 
 @router.get("/today")
-def get_today_stats(db: Session = Depends(get_db)):
+@query_budget(4)
+async def get_today_stats(db: Session = Depends(get_session)):
     """
     获取今日统计
     """
     today = datetime.now().strftime("%Y-%m-%d")
-    stat = crud.get_or_create_daily_stat(db, today)
+    stat = await run_db(db, crud.get_or_create_daily_stat, today)
     return stat
 
 @router.get("/daily")
-def get_daily_stats(
+@query_budget(3)
+async def get_daily_stats(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     获取每日统计列表
     """
-    stats = crud.get_daily_stats(db, skip=skip, limit=limit)
+    stats = await run_db(db, crud.get_daily_stats, skip=skip, limit=limit)
     return stats
 
 @router.get("/daily/{date}")
-def get_daily_stat_by_date(date: str, db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_daily_stat_by_date(date: str, db: Session = Depends(get_session)):
     """
     根据日期获取每日统计
     """
-    stat = crud.get_daily_stat_by_date(db, date)
+    stat = await run_db(db, crud.get_daily_stat_by_date, date)
     if not stat:
         raise HTTPException(status_code=404, detail="该日期的统计不存在")
     return stat
 
 @router.post("/daily/")
-def create_daily_stat(
+@query_budget(5)
+async def create_daily_stat(
     stat: schemas.DailyStatCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     创建每日统计记录
     """
     # 检查是否已存在
-    existing = crud.get_daily_stat_by_date(db, stat.date)
+    existing = await run_db(db, crud.get_daily_stat_by_date, stat.date)
     if existing:
         raise HTTPException(status_code=400, detail="该日期的统计已存在")
     
-    return crud.create_daily_stat(db, stat)
+    return await run_db(db, crud.create_daily_stat, stat)
 
 # routes/stats.py - 修改 /week 端点
 @router.get("/week")
-def get_week_data(db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_week_data(db: Session = Depends(get_session)):
     """
     获取本周数据 - 优先使用实际数据
     """
-    week_stat = crud.get_week_stats(db)
+    week_stat = await run_db(db, crud.get_week_stats)
     # 直接返回列表，而不是字典
     return week_stat.get("week_data", [])
 
 
 @router.get("/month")
-def get_month_data(db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_month_data(db: Session = Depends(get_session)):
     """
     获取本月数据 - 优先使用实际数据
     """
-    month_stat = crud.get_month_stats(db)
+    month_stat = await run_db(db, crud.get_month_stats)
     # 直接返回列表，而不是字典
     return month_stat.get("month_data", [])
 
 @router.get("/year")
-def get_year_data(db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_year_data(db: Session = Depends(get_session)):
     """
     获取年度数据 - 优先使用实际数据
     """
-    year_stat = crud.get_year_stats(db)
+    year_stat = await run_db(db, crud.get_year_stats)
     # 直接返回列表，而不是字典
     return year_stat.get("year_data", [])
 
 @router.get("/priority")
-def get_priority_stats(db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_priority_stats(
+    filters: schemas.StatsFilter = Depends(stats_filters),
+    db: Session = Depends(get_session)
+):
     """
     获取优先级统计数据
     """
-    today = datetime.now().strftime("%Y-%m-%d")
-    daily_stat = crud.update_daily_stat(db, today)
-    
-    priority_stats = []
-    for level, stats in daily_stat.priority_stats.items():
-        priority_stats.append({
-            "level": level,
-            "completed": stats["completed"],
-            "inProgress": stats["in_progress"],
-            "remaining": stats["remaining"],
-            "total": stats["total"]
-        })
-    
+    priority_stats = (await run_db(db, crud.get_stat_blocks, filters))["priority"]
     return {"priority": priority_stats}  # 保持与主端点一致的结构
 
 @router.get("/summary")
-def get_stats_summary(db: Session = Depends(get_db)):
+@query_budget(3)
+async def get_stats_summary(
+    filters: schemas.StatsFilter = Depends(stats_filters),
+    db: Session = Depends(get_session)
+):
     """
     获取统计摘要
     """
-    summary = crud.get_stats_summary(db)
+    summary = await run_db(db, crud.get_stats_summary, filters)
     return summary
 
 # routes/stats.py - 修复get_trend_data
 @router.get("/trend/{period}")
-def get_trend_data(
+@query_budget(3)
+async def get_trend_data(
     period: str = Path(..., description="周期: week, month, year"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     获取趋势数据
     """
     if period == "week":
-        week_stat = crud.get_week_stats(db)
+        week_stat = await run_db(db, crud.get_week_stats)
         return week_stat.get("week_data", [])  # 直接返回列表
     elif period == "month":
-        month_stat = crud.get_month_stats(db)
+        month_stat = await run_db(db, crud.get_month_stats)
         return month_stat.get("month_data", [])  # 直接返回列表
     elif period == "year":
-        year_stat = crud.get_year_stats(db)
+        year_stat = await run_db(db, crud.get_year_stats)
         return year_stat.get("year_data", [])  # 直接返回列表
     else:
         raise HTTPException(status_code=400, detail="无效的周期参数")
         
 @router.get("/mock")
-def get_mock_stats():
+@query_budget(0)
+async def get_mock_stats():
     """
     获取模拟统计数据（用于开发测试）
     """
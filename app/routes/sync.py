@@ -0,0 +1,32 @@
+# sync.py - 增量同步 API 路由
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+from .. import crud, schemas
+from ..database import get_session
+from ..cache import cached_json_response
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/api/sync", tags=["Sync"])
+
+@router.get("/", response_model=schemas.SyncResponse)
+@query_budget(12)
+async def sync_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="上次同步返回的 cursor，为空时返回全量"),
+    limit: int = Query(crud.SYNC_PAGE_SIZE, ge=1, le=5000, description="每页最多返回的变更实体数"),
+    db: Session = Depends(get_session)
+):
+    """
+    返回 since 之后新增、修改的任务 / 笔记 / 标签和被删除的 id（带 ETag，数据未变化时返回 304）；
+    has_more 为真时用返回的 cursor 继续拉取
+    """
+    return await cached_json_response(
+        request,
+        db,
+        ("tasks", "notes", "tags"),
+        crud.get_sync_changes,
+        schemas.SyncResponse,
+        since=crud.decode_sync_cursor(since),
+        limit=limit
+    )
@@ -1,46 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from .. import crud, schemas
-from ..database import get_db
+from ..database import get_session, run_db
+from ..cache import cached_json_response
+from ..query_budget import query_budget
 from typing import Optional
-from app import models
 
 router = APIRouter(prefix="/api/tags", tags=["tags"])
 
-# 获取所有标签及计数，支持搜索
+# 获取所有标签及计数，支持搜索（计数依赖任务和笔记的关联，三张表任一变化都会使 ETag 失效）
 @router.get("/", response_model=list[schemas.TagCountResponse])
-def read_and_search_tags(
+@query_budget(6)
+async def read_and_search_tags(
+    request: Request,
     q: Optional[str] = None,  
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=100),  # 只返回相关度最高的前 limit 个
+    db: Session = Depends(get_session)
 ):
+    tables = ("tags", "tasks", "notes")
     if q:
-        return crud.search_tags(db, query=q)
-    return crud.get_tags_with_counts(db)
+        return await cached_json_response(
+            request, db, tables, crud.search_tags, list[schemas.TagCountResponse], query=q, limit=limit
+        )
+    return await cached_json_response(request, db, tables, crud.get_tags_with_counts, list[schemas.TagCountResponse])
 
 # 新增标签
 @router.post("/", response_model=schemas.Tag)
-def create_new_tag(tag: schemas.TagCreate, db: Session = Depends(get_db)):
+@query_budget(8)
+async def create_new_tag(tag: schemas.TagCreate, db: Session = Depends(get_session)):
     # 检查标签是否已存在 (避免重复创建)
-    db_tag = crud.get_tag_by_name(db, name=tag.name)
+    db_tag = await run_db(db, crud.get_tag_by_name, name=tag.name)
     if db_tag:
         # 如果已存在，直接返回它
         return db_tag
         
-    return crud.create_tag(db, tag=tag)
+    return await run_db(db, crud.create_tag, tag=tag)
 
 @router.delete("/{tag_id}", response_model=dict)
-def delete_tag(tag_id: int, db: Session = Depends(get_db)):
-    # 检查标签是否存在
-    db_tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-    if not db_tag:
+@query_budget(16)
+async def delete_tag(tag_id: int, db: Session = Depends(get_session)):
+    # 检查标签是否存在，并删除关联的任务/笔记-标签关系和标签本身
+    success = await run_db(db, crud.delete_tag, tag_id)
+    if not success:
         raise HTTPException(status_code=404, detail="Tag not found")
     
-    # 先删除关联的任务-标签关系
-    db.query(models.TaskTag).filter(models.TaskTag.tag_id == tag_id).delete()
-    # 删除关联的笔记-标签关系
-    db.query(models.NoteTag).filter(models.NoteTag.tag_id == tag_id).delete()
-    # 再删除标签本身
-    db.delete(db_tag)
-    db.commit()
-    
-    return {"message": "Tag deleted successfully"}
\ No newline at end of file
+    return {"message": "Tag deleted successfully"}
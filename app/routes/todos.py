@@ -1,47 +1,112 @@
-from fastapi import APIRouter, Depends,HTTPException
+from fastapi import APIRouter, Depends,HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from .. import crud, schemas
-from ..database import get_db
-from typing import Optional
+from ..database import get_session, run_db
+from ..cache import cached_json_response
+from ..query_budget import query_budget
+from typing import List, Optional, Union
+from datetime import date
 
 router = APIRouter(prefix="/api/tasks", tags=["todos"])
 
+async def task_filters(
+    status: Optional[List[schemas.StatusEnum]] = Query(None, description="按状态筛选，可多选"),
+    priority: Optional[List[schemas.PriorityEnum]] = Query(None, description="按优先级筛选，可多选"),
+    pinned: Optional[bool] = Query(None, description="是否置顶"),
+    deadline_before: Optional[date] = Query(None, description="截止日期不晚于（含）"),
+    deadline_after: Optional[date] = Query(None, description="截止日期不早于（含）"),
+    overdue: Optional[bool] = Query(None, description="已过截止日期且未完成"),
+    sort_by: Optional[str] = Query(None, pattern="^(createdAt|updatedAt|deadline|priority|title)$", description="排序字段"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="排序顺序: asc, desc"),
+) -> schemas.TaskFilter:
+    return schemas.TaskFilter(
+        status=status,
+        priority=priority,
+        pinned=pinned,
+        deadline_before=deadline_before,
+        deadline_after=deadline_after,
+        overdue=overdue,
+        sort_by=sort_by,
+        order=order,
+    )
+
 # 1. 获取所有任务，支持搜索
-@router.get("/", response_model=list[schemas.TaskResponse])
-def read_and_search_tasks(
+# 传入 limit 或 cursor 时使用游标分页，返回 {items, next_cursor}；否则保持旧的全量列表
+# 响应带 ETag，数据未变化时返回 304
+@router.get("/", response_model=Union[schemas.TaskPage, list[schemas.TaskResponse]])
+@query_budget(6)
+async def read_and_search_tasks(
+    request: Request,
     q: Optional[str] = None,  
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量，启用游标分页"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    tags: Optional[List[int]] = Query(None, description="按标签ID筛选"),
+    tag_mode: str = Query("all", pattern="^(any|all)$", description="多个标签时: all 包含全部, any 包含任意一个"),
+    filters: schemas.TaskFilter = Depends(task_filters),
+    db: Session = Depends(get_session)
 ):
+    tables = ("tasks", "tags")
+    list_params = {"tag_ids": tags, "tag_mode": tag_mode, "filters": filters}
+    # overdue 按当天日期判断，跨天后即使数据没变结果也会变，日期计入 ETag
+    vary = (date.today().isoformat(),) if filters.overdue is not None else ()
+    if limit is not None or cursor is not None:
+        return await cached_json_response(
+            request, db, tables, crud.get_tasks_page, schemas.TaskPage,
+            limit=limit or 50, cursor=cursor, query=q, vary=vary, **list_params
+        )
     if q:
-        return crud.search_tasks(db, query=q)
-    return crud.get_tasks(db)
+        return await cached_json_response(
+            request, db, tables, crud.search_tasks, list[schemas.TaskResponse], query=q, vary=vary, **list_params
+        )
+    return await cached_json_response(
+        request, db, tables, crud.get_tasks, list[schemas.TaskResponse], vary=vary, **list_params
+    )
 
 # 2. 获取单个任务
 @router.get("/{task_id}", response_model=schemas.TaskResponse)
-def read_task(task_id: int, db: Session = Depends(get_db)):
-    db_task = crud.get_task(db, task_id=task_id)
+@query_budget(3)
+async def read_task(task_id: int, db: Session = Depends(get_session)):
+    db_task = await run_db(db, crud.get_task, task_id=task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 # 3. 创建任务
 @router.post("/", response_model=schemas.TaskResponse)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
-    return crud.create_task(db=db, task=task)
+@query_budget(30)
+async def create_task(task: schemas.TaskCreate, db: Session = Depends(get_session)):
+    return await run_db(db, crud.create_task, task=task)
 
 # 4. 更新任务
 @router.patch("/{task_id}", response_model=schemas.TaskResponse)
-def update_task(task_id: int, task: schemas.TaskUpdate, db: Session = Depends(get_db)):
-    db_task = crud.update_task(db=db, task_id=task_id, task=task)
+@query_budget(30)
+async def update_task(task_id: int, task: schemas.TaskUpdate, db: Session = Depends(get_session)):
+    db_task = await run_db(db, crud.update_task, task_id=task_id, task=task)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 # 5. 删除任务
 @router.delete("/{task_id}")
-def delete_task(task_id: int, db: Session = Depends(get_db)):
-    success = crud.delete_task(db=db, task_id=task_id)
+@query_budget(18)
+async def delete_task(task_id: int, db: Session = Depends(get_session)):
+    success = await run_db(db, crud.delete_task, task_id=task_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"success": True, "message": "Task deleted successfully"}
 
+# 6. 批量操作（单个事务，逐项返回结果）
+@router.post("/batch/create", response_model=schemas.BatchResult)
+@query_budget(24)
+async def batch_create_tasks(batch: schemas.TaskBatchCreate, db: Session = Depends(get_session)):
+    return await run_db(db, crud.batch_create_tasks, batch.items)
+
+@router.post("/batch/update", response_model=schemas.BatchResult)
+@query_budget(18)
+async def batch_update_tasks(batch: schemas.TaskBatchUpdate, db: Session = Depends(get_session)):
+    return await run_db(db, crud.batch_update_tasks, batch)
+
+@router.post("/batch/delete", response_model=schemas.BatchResult)
+@query_budget(18)
+async def batch_delete_tasks(batch: schemas.BatchDelete, db: Session = Depends(get_session)):
+    return await run_db(db, crud.batch_delete_tasks, batch.root)
@@ -1,5 +1,5 @@
 # schemas.py - 修复Pydantic配置
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, RootModel
 from typing import Optional, List, Dict
 from datetime import date, datetime
 from enum import Enum
@@ -116,6 +116,41 @@ class NoteResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)  # 在Pydantic V2中使用正确的配置
 
+# 列表摘要视图：不含正文，只有开头片段、正文长度和 sha1（用于判断本地缓存的正文是否过期）
+class NoteSummaryResponse(BaseModel):
+    id: int
+    type: str = "note"
+    title: str
+    snippet: str
+    content_length: int
+    content_hash: Optional[str] = None
+    priority: str
+    status: str
+    isPinned: bool
+    tags: Optional[List[Tag]] = None
+    created_at: datetime
+    updated_at: datetime
+
+# 笔记修订历史
+class NoteRevisionInfo(BaseModel):
+    revision: int
+    kind: str  # snapshot / delta
+    title: Optional[str] = None
+    content_length: int
+    content_hash: str
+    stored_bytes: int
+    created_at: datetime
+
+class NoteRevisionResponse(BaseModel):
+    note_id: int
+    revision: int
+    title: Optional[str] = None
+    content: str
+    content_length: int
+    content_hash: str
+    created_at: datetime
+    deltas_applied: int
+
 class NoteSearchParams(BaseModel):
     search: Optional[str] = None
     tags: Optional[List[int]] = None
@@ -155,6 +190,113 @@ class TaskResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)  # 在Pydantic V2中使用正确的配置
 
+# 任务列表筛选和排序（截止日期区间包含两端）
+class TaskFilter(BaseModel):
+    status: Optional[List[StatusEnum]] = None
+    priority: Optional[List[PriorityEnum]] = None
+    pinned: Optional[bool] = None
+    deadline_before: Optional[date] = None
+    deadline_after: Optional[date] = None
+    overdue: Optional[bool] = None  # 截止日期已过且未完成
+    sort_by: Optional[str] = Field(default=None, pattern="^(createdAt|updatedAt|deadline|priority|title)$")
+    order: str = Field(default="desc", pattern="^(asc|desc)$")
+
+# 游标分页响应
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+# 增量同步：cursor 对客户端不透明；deleted 为删除墓碑（只有 id）
+class SyncDeleted(BaseModel):
+    tasks: List[int] = []
+    notes: List[int] = []
+    tags: List[int] = []
+
+class SyncResponse(BaseModel):
+    cursor: str
+    has_more: bool
+    tasks: List[TaskResponse]
+    notes: List[NoteResponse]
+    tags: List[TagCountResponse]
+    deleted: SyncDeleted
+
+# ========== 批量操作 ==========
+BATCH_MAX_ITEMS = 5000
+
+class TaskBatchCreate(BaseModel):
+    items: List[TaskCreate] = Field(max_length=BATCH_MAX_ITEMS)
+
+class TaskBatchUpdate(BaseModel):
+    ids: List[int] = Field(max_length=BATCH_MAX_ITEMS)
+    status: Optional[str] = Field(default=None, pattern="^(todo|doing|done)$")
+    priority: Optional[str] = Field(default=None, pattern="^(high|medium|low|none)$")
+    isPinned: Optional[bool] = None
+    deadline: Optional[date] = None
+
+class NoteBatchCreate(BaseModel):
+    items: List[NoteCreate] = Field(max_length=BATCH_MAX_ITEMS)
+
+class NoteBatchUpdate(BaseModel):
+    ids: List[int] = Field(max_length=BATCH_MAX_ITEMS)
+    priority: Optional[PriorityEnum] = None
+    status: Optional[StatusEnum] = None
+    isPinned: Optional[bool] = None
+
+# 批量删除的请求体仍是 id 数组（兼容已有调用方），同样限制条数
+class BatchDelete(RootModel[List[int]]):
+    root: List[int] = Field(max_length=BATCH_MAX_ITEMS)
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    success: bool
+    error: Optional[str] = None
+
+class BatchResult(BaseModel):
+    success: bool
+    total_requested: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+# 导入：每行单独校验；标签按名称给出，不存在时自动创建
+IMPORT_MAX_ERRORS = 1000
+
+class TaskImportRow(BaseModel):
+    title: str
+    content: str = ""
+    status: str = Field(default="todo", pattern="^(todo|doing|done)$")
+    priority: str = Field(default="none", pattern="^(high|medium|low|none)$")
+    deadline: Optional[date] = None
+    isPinned: bool = False
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+    tags: List[str] = []
+
+class NoteImportRow(BaseModel):
+    title: str = "未命名笔记"
+    content: str = ""
+    priority: PriorityEnum = PriorityEnum.NONE
+    status: StatusEnum = StatusEnum.DONE
+    isPinned: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tags: List[str] = []
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    import_id: str
+    status: str  # running / finished / failed
+    processed: int
+    imported: Dict[str, int]
+    failed: int
+    created_tags: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
 # ========== 新增统计模型 ==========
 class TodayStats(BaseModel):
     completed: int
@@ -209,6 +351,16 @@ class StatsResponse(BaseModel):
     year: List[YearDataPoint]
     priority: List[PriorityStat]
 
+# 统计筛选条件（日期区间包含两端）
+class StatsFilter(BaseModel):
+    tag: Optional[int] = None
+    deadline_from: Optional[date] = None
+    deadline_to: Optional[date] = None
+    created_from: Optional[date] = None
+    created_to: Optional[date] = None
+    updated_from: Optional[date] = None
+    updated_to: Optional[date] = None
+
 class DailyStatCreate(BaseModel):
     date: str
     completed: int = 0
@@ -0,0 +1,29 @@
+# serialization.py - 列表接口的快速 JSON 编码：crud 返回的字典已经符合响应模型，直接编码成 bytes
+import json
+from datetime import date, datetime
+from enum import Enum
+
+# orjson 为可选依赖，未安装时退回标准库 json（仍然跳过 pydantic 校验）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # 与 pydantic / orjson 的输出格式保持一致
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_backend() -> str:
+    return "orjson" if orjson is not None else "json"
@@ -0,0 +1,127 @@
+"""
+同步 / 异步数据库模式吞吐对比
+
+分别以 DB_ASYNC=0 和 DB_ASYNC=1 启动 uvicorn，用 200 个并发客户端
+轮询仪表盘常用的几个 GET 接口，输出每秒请求数和延迟分位数。
+
+用法（在仓库根目录）:
+    pip install httpx aiosqlite
+    python benchmarks/bench_db_modes.py --concurrency 200 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = [
+    "/api/stats/",
+    "/api/stats/summary",
+    "/api/tasks/?limit=50",
+    "/api/tags/",
+]
+
+
+def start_server(workdir: str, port: int, async_mode: bool):
+    env = dict(os.environ, DB_ASYNC="1" if async_mode else "0", PYTHONPATH=ROOT)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def seed(base_url: str, tasks: int):
+    with httpx.Client(base_url=base_url) as client:
+        tag = client.post("/api/tags/", json={"name": "bench"}).json()
+        for i in range(tasks):
+            client.post("/api/tasks/", json={
+                "title": f"bench task {i}",
+                "content": "benchmark payload",
+                "priority": ("high", "medium", "low", "none")[i % 4],
+                "status": ("todo", "doing", "done")[i % 3],
+                "tags": [tag["id"]],
+            })
+
+
+async def run_load(base_url: str, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(ENDPOINTS[i % len(ENDPOINTS)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--tasks", type=int, default=1000, help="预先写入的任务数")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {}
+        for index, async_mode in enumerate((False, True)):
+            port = args.port + index
+            base_url = f"http://127.0.0.1:{port}"
+            proc = start_server(workdir, port, async_mode)
+            try:
+                if index == 0:
+                    seed(base_url, args.tasks)
+                results["async" if async_mode else "sync"] = asyncio.run(
+                    run_load(base_url, args.concurrency, args.duration)
+                )
+            finally:
+                proc.terminate()
+                proc.wait()
+
+    print(f"{'mode':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
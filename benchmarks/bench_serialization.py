@@ -0,0 +1,120 @@
+"""
+列表接口序列化路径对比（10k 条任务）
+
+在临时 SQLite 库里写入任务后，分别计时：
+  legacy    ORM 对象 + joinedload + strftime 拼字典，再经 pydantic 校验、jsonable_encoder、json.dumps
+            （FastAPI 按 response_model 返回字典时的默认流程）
+  validated 按列读取拼字典，pydantic TypeAdapter 校验后 dump_json（FAST_JSON=0）
+  fast      按列读取拼字典，直接用 orjson 编码（FAST_JSON=1，默认）
+并检查三条路径输出的 JSON 内容一致。
+
+用法（在仓库根目录）:
+    python benchmarks/bench_serialization.py --tasks 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-serialization-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, ROOT)
+
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import joinedload
+    from app import crud, models, schemas
+    from app.database import Base, SessionLocal, engine
+    from app.crud.task_crud import _task_to_dict
+    from app.serialization import json_backend, json_dumps
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        from app.crud.versions import init_table_versions
+        init_table_versions(db)
+        tag_ids = [crud.create_tag(db, schemas.TagCreate(name=f"tag{i}")).id for i in range(20)]
+        items = [
+            schemas.TaskCreate(
+                title=f"bench task {i}",
+                content="benchmark payload " * 4,
+                priority=("high", "medium", "low", "none")[i % 4],
+                status=("todo", "doing", "done")[i % 3],
+                tags=[tag_ids[i % 20], tag_ids[(i * 7) % 20]] if i % 5 else None,
+            )
+            for i in range(args.tasks)
+        ]
+        crud.batch_create_tasks(db, items)
+
+    adapter = TypeAdapter(list[schemas.TaskResponse])
+
+    def legacy():
+        with SessionLocal() as db:
+            tasks = db.query(models.Task).options(
+                joinedload(models.Task.tags).joinedload(models.TaskTag.tag)
+            ).all()
+            data = [_task_to_dict(task) for task in tasks]
+        return json.dumps(jsonable_encoder(adapter.validate_python(data))).encode("utf-8")
+
+    def validated():
+        with SessionLocal() as db:
+            data = crud.get_tasks(db)
+        return adapter.dump_json(adapter.validate_python(data))
+
+    def fast():
+        with SessionLocal() as db:
+            data = crud.get_tasks(db)
+        return json_dumps(data)
+
+    with SessionLocal() as db:
+        rows = crud.get_tasks(db)
+
+    print(f"{args.tasks} tasks, encoder={json_backend()}, repeat={args.repeat}")
+    print(f"{'path':<12}{'median ms':>12}{'min ms':>10}{'bytes':>12}")
+    outputs = {}
+    baseline = None
+    for name, fn in (("legacy", legacy), ("validated", validated), ("fast", fast)):
+        fn()  # 预热
+        body, samples = timed(fn, args.repeat)
+        outputs[name] = json.loads(body)
+        median = statistics.median(samples)
+        baseline = baseline or median
+        print(f"{name:<12}{median:>12.1f}{min(samples):>10.1f}{len(body):>12}  x{baseline / median:.1f}")
+
+    # 只比较编码这一步（同一份字典）
+    print("encode only:")
+    for name, fn in (
+        ("validated", lambda: adapter.dump_json(adapter.validate_python(rows))),
+        ("fast", lambda: json_dumps(rows)),
+    ):
+        _, samples = timed(fn, args.repeat)
+        print(f"  {name:<10}{statistics.median(samples):>10.1f} ms")
+
+    # legacy 的字段顺序不同，按内容比较
+    assert outputs["legacy"] == outputs["validated"] == outputs["fast"], "serialized payloads differ"
+    print("payloads identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+多标签筛选对比（默认 100k 条笔记、200 个标签）
+
+在临时 SQLite 库里写入笔记，每条随机挂 1~6 个标签，然后对 1/3/5/10 个标签分别计时：
+  per-tag IN  旧实现：每个标签一个 IN (子查询)，条件逐个 AND
+  group all   GROUP BY note_id HAVING COUNT(*) = n（tag_mode=all）
+  group any   tag_id IN (...) 去重（tag_mode=any）
+以及 crud.get_notes 整个列表请求（limit 100）的耗时，并检查新旧实现命中的笔记相同。
+
+用法（在仓库根目录）:
+    python benchmarks/bench_tag_filter.py --notes 100000 --tags 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-tag-filter-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, ROOT)
+
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select
+    from app import crud, models
+    from app.database import SessionLocal, engine
+    from app.migrations import run_migrations
+
+    run_migrations(engine)
+    rng = random.Random(args.seed)
+    # 标签热度不均匀：前面的标签更常用，接近真实分布
+    weights = [1 / (i + 1) for i in range(args.tags)]
+    with SessionLocal() as db:
+        tag_ids = db.execute(
+            insert(models.Tag).returning(models.Tag.id, sort_by_parameter_order=True),
+            [{"name": f"tag{i}", "color": "#909399"} for i in range(args.tags)]
+        ).scalars().all()
+        start = datetime(2024, 1, 1)
+        batch = 10000
+        for offset in range(0, args.notes, batch):
+            count = min(batch, args.notes - offset)
+            note_ids = db.execute(
+                insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True),
+                [{
+                    "title": f"note {offset + i}",
+                    "content": "benchmark",
+                    "priority": models.PriorityEnum.NONE,
+                    "status": models.StatusEnum.DONE,
+                    "isPinned": (offset + i) % 50 == 0,
+                    "created_at": start + timedelta(minutes=offset + i),
+                    "updated_at": start + timedelta(minutes=offset + i),
+                } for i in range(count)]
+            ).scalars().all()
+            links = []
+            for note_id in note_ids:
+                for tag_id in set(rng.choices(tag_ids, weights=weights, k=rng.randint(1, 6))):
+                    links.append({"note_id": note_id, "tag_id": tag_id})
+            db.execute(insert(models.NoteTag), links)
+        db.commit()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    def per_tag_in(db, selected):
+        # 旧实现：每个标签一个 IN 子查询
+        query = db.query(models.Note.id)
+        for tag_id in selected:
+            subquery = select(models.NoteTag.note_id).where(models.NoteTag.tag_id == tag_id)
+            query = query.filter(models.Note.id.in_(subquery))
+        return {note_id for (note_id,) in query}
+
+    def grouped(db, selected, mode):
+        query = db.query(models.Note.id).filter(
+            models.Note.id.in_(crud.tag_filter_subquery("note", selected, mode))
+        )
+        return {note_id for (note_id,) in query}
+
+    def any_reference(db, selected):
+        query = db.query(models.Note.id).filter(models.Note.id.in_(
+            select(models.NoteTag.note_id).where(models.NoteTag.tag_id.in_(selected))
+        ))
+        return {note_id for (note_id,) in query}
+
+    print(f"{args.notes} notes, {args.tags} tags, repeat={args.repeat}")
+    print(f"{'tags':>5}{'per-tag IN':>13}{'group all':>12}{'group any':>12}{'get_notes':>12}{'hits all':>10}{'hits any':>10}")
+    with SessionLocal() as db:
+        for n in (1, 3, 5, 10):
+            # 选常用标签，让 all 模式仍有命中
+            selected = tag_ids[:2] + rng.sample(tag_ids[2:20], n - 2) if n > 2 else tag_ids[:n]
+            old_hits, old_ms = timed(lambda: per_tag_in(db, selected), args.repeat)
+            all_hits, all_ms = timed(lambda: grouped(db, selected, "all"), args.repeat)
+            any_hits, any_ms = timed(lambda: grouped(db, selected, "any"), args.repeat)
+            _, list_ms = timed(lambda: crud.get_notes(db, limit=100, tag_ids=selected, tag_mode="all"), args.repeat)
+            assert old_hits == all_hits, "group all differs from per-tag IN"
+            assert any_hits == any_reference(db, selected), "group any differs from reference"
+            print(f"{n:>5}{old_ms:>11.1f}ms{all_ms:>10.1f}ms{any_ms:>10.1f}ms{list_ms:>10.1f}ms{len(all_hits):>10}{len(any_hits):>10}")
+
+
+if __name__ == "__main__":
+    main()
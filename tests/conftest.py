@@ -0,0 +1,86 @@
+# conftest.py - 测试共用的 fixture：临时 SQLite 库上的 TestClient 和 SQL 语句计数器。
+# 数据库 engine 在导入 app 时按 DATABASE_URL 创建，所以要在导入 app 之前设置
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+_DB_DIR = tempfile.mkdtemp(prefix="todo-notes-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+# 并发写入的测试里十几个写事务排队拿写锁，异步模式下等待可能超过默认的 5 秒
+os.environ.setdefault("SQLITE_BUSY_TIMEOUT", "30000")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.database import engine, async_engine
+from app.main import app
+
+# query_budget fixture（SQL 预算 / N+1 检测）
+pytest_plugins = ["app.pytest_plugin"]
+
+
+def pytest_unconfigure(config):
+    engine.dispose()
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class QueryCounter:
+    """before_cursor_execute 监听器，记录执行过的语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries():
+    """with count_queries() as counter: ... 统计代码块里所有连接上执行的语句"""
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+        for target in engines:
+            event.listen(target, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", counter)
+
+    return counting
+
+
+def create_tags(client, *names):
+    return [client.post("/api/tags/", json={"name": name}).json()["id"] for name in names]
+
+
+def create_tasks(client, count: int, tag_ids=(), prefix: str = "task"):
+    """批量接口建 count 个任务，轮流挂上 tag_ids 里的标签，返回新任务 id"""
+    items = [
+        {
+            "title": f"{prefix} {i}",
+            "content": f"{prefix} content {i}",
+            "status": ("todo", "doing", "done")[i % 3],
+            "priority": ("high", "medium", "low", "none")[i % 4],
+            "tags": [tag_ids[i % len(tag_ids)]] if tag_ids else [],
+        }
+        for i in range(count)
+    ]
+    response = client.post("/api/tasks/batch/create", json={"items": items})
+    assert response.status_code == 200, response.text
+    return [result["id"] for result in response.json()["results"]]
@@ -0,0 +1,56 @@
+# 批量操作：创建时每张表一条多行 INSERT（语句数与条数无关，返回的 id 与请求项一一对应），删除的 id 数量有上限
+import pytest
+from app.schemas import BATCH_MAX_ITEMS
+from conftest import create_tags, create_tasks
+
+N = 10
+
+
+def _task_items(count, tag_ids, prefix):
+    return [
+        {"title": f"{prefix} {i}", "content": f"{prefix} content {i}", "priority": "medium", "tags": tag_ids}
+        for i in range(count)
+    ]
+
+
+def _note_items(count, tag_ids, prefix):
+    # 一半正文超过行内阈值，走外部存储
+    return [
+        {"title": f"{prefix} {i}", "content": f"{prefix} content {i} " * (i % 2 * 400 + 1), "tags": tag_ids}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("kind, build_items", [("tasks", _task_items), ("notes", _note_items)])
+def test_batch_create_uses_one_insert_per_table(client, count_queries, kind, build_items):
+    tag_ids = create_tags(client, f"batch-create-{kind}")
+    counts = []
+    for count in (N, 5 * N):
+        prefix = f"batch {kind} {count}"
+        with count_queries() as counter:
+            response = client.post(f"/api/{kind}/batch/create", json={"items": build_items(count, tag_ids, prefix)})
+        assert response.status_code == 200, response.text
+        inserts = [statement for statement in counter.statements if statement.startswith(f"INSERT INTO {kind} ")]
+        assert len(inserts) == 1
+        counts.append(counter.count)
+
+        # 每个结果的 id 指向对应请求项创建的记录
+        for index, result in enumerate(response.json()["results"]):
+            item = client.get(f"/api/{kind}/{result['id']}").json()
+            assert item["title"] == f"{prefix} {index}"
+            assert [tag["id"] for tag in item["tags"]] == tag_ids
+
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.parametrize("kind", ["tasks", "notes"])
+def test_batch_delete_rejects_oversized_id_list(client, kind):
+    response = client.post(f"/api/{kind}/batch/delete", json=list(range(1, BATCH_MAX_ITEMS + 2)))
+    assert response.status_code == 422
+
+
+def test_batch_delete_accepts_id_array(client):
+    task_ids = create_tasks(client, 3, prefix="batch delete")
+    response = client.post("/api/tasks/batch/delete", json=task_ids)
+    assert response.status_code == 200, response.text
+    assert response.json()["succeeded"] == 3
@@ -0,0 +1,114 @@
+# 批量导入：历史任务的状态日志和趋势按各自的创建时间记录，无法解析的行按行号报错
+import csv
+import json
+import time
+from datetime import datetime
+from sqlalchemy import func
+from app import models
+from app.database import SessionLocal
+
+
+def _import(client, content: bytes, filename: str, **params):
+    response = client.post("/api/import/", params=params, files={"file": (filename, content)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_imported_history_is_not_counted_as_today(client):
+    week_before = client.get("/api/stats/week").json()
+    # 删除任务后 SQLite 会复用 id，旧任务的状态日志仍在，只看这次导入写入的日志
+    with SessionLocal() as db:
+        last_event_id = db.query(func.max(models.TaskEvent.id)).scalar() or 0
+    lines = [
+        json.dumps({"type": "task", "title": f"history {i}", "content": "", "status": "done",
+                    "priority": "low", "createdAt": "2025-01-15T09:30:00"})
+        for i in range(3)
+    ]
+    result = _import(client, "\n".join(lines).encode(), "history.ndjson")
+    assert result["imported"]["tasks"] == 3
+
+    assert client.get("/api/stats/week").json() == week_before
+    with SessionLocal() as db:
+        events = db.query(models.TaskEvent.occurred_at).join(
+            models.Task, models.Task.id == models.TaskEvent.task_id
+        ).filter(models.Task.title.like("history %"), models.TaskEvent.id > last_event_id).all()
+        assert [occurred_at.date().isoformat() for (occurred_at,) in events] == ["2025-01-15"] * 3
+        january = db.query(models.MonthlyStat).filter(models.MonthlyStat.month == "2025-01").one()
+        assert january.month_data[14]["completed"] == 3
+
+
+def test_new_task_is_counted_today(client):
+    def remaining_this_week():
+        return sum(day["remaining"] for day in client.get("/api/stats/week").json())
+
+    before = remaining_this_week()
+    _import(client, json.dumps({"type": "task", "title": "fresh", "content": "", "priority": "low"}).encode(), "fresh.ndjson")
+    assert client.post("/api/tasks/", json={"title": "fresh api", "content": "", "priority": "low"}).status_code == 200
+    assert remaining_this_week() == before + 2
+
+
+def test_csv_bad_rows_are_reported_per_line(client):
+    content = (
+        b"title,content,priority\n"
+        b"csv ok 1,,low\n"
+        b"csv bad \xff\xfe,,low\n"
+        b"csv huge," + b"x" * (csv.field_size_limit() + 1) + b",low\n"
+        b"csv ok 2,,low\n"
+    )
+    result = _import(client, content, "tasks.csv", kind="tasks")
+    assert result["status"] == "finished"
+    assert result["imported"]["tasks"] == 2
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+    assert result["errors"][0]["error"] == "Invalid UTF-8"
+
+
+def _bulk_lines(count: int, prefix: str):
+    # 每行带一个新标签，标签、任务、笔记都在同一批里创建
+    for i in range(count):
+        yield {"type": "tag", "name": f"{prefix} tag {i}", "color": "#123456"}
+        yield {"type": "task", "title": f"{prefix} task {i}", "content": "", "priority": "low", "tags": [f"{prefix} tag {i}"]}
+        yield {"type": "note", "title": f"{prefix} note {i}", "content": "", "tags": [f"{prefix} tag {i}"]}
+
+
+def test_import_chunk_uses_one_insert_per_table(client, count_queries):
+    counts = []
+    for count in (10, 50):
+        prefix = f"bulk {count}"
+        content = "\n".join(json.dumps(line) for line in _bulk_lines(count, prefix)).encode()
+        with count_queries() as counter:
+            result = _import(client, content, "bulk.ndjson")
+        assert result["imported"] == {"tasks": count, "notes": count}
+        assert result["created_tags"] == count
+        for table in ("tags", "tasks", "notes"):
+            assert sum(statement.startswith(f"INSERT INTO {table} ") for statement in counter.statements) == 1
+        counts.append(counter.count)
+
+        # 插入后的 id 与行对应：每个任务 / 笔记挂的是同一行号的标签
+        with SessionLocal() as db:
+            for link, owner, owner_id in ((models.TaskTag, models.Task, models.TaskTag.task_id),
+                                          (models.NoteTag, models.Note, models.NoteTag.note_id)):
+                pairs = db.query(owner.title, models.Tag.name).join(link, owner_id == owner.id).join(
+                    models.Tag, models.Tag.id == link.tag_id
+                ).filter(owner.title.like(f"{prefix} %")).all()
+                assert len(pairs) == count
+                assert all(title.rsplit(" ", 1)[1] == name.rsplit(" ", 1)[1] for title, name in pairs)
+
+    assert counts[0] == counts[1]
+
+
+def test_imported_history_is_dated_in_local_time(client, monkeypatch):
+    # createdAt 按 UTC 导出，状态日志按本地时间：UTC+8 下 UTC 20:00 已是第二天
+    monkeypatch.setenv("TZ", "XXX-8")
+    time.tzset()
+    try:
+        line = {"type": "task", "title": "history local", "content": "", "status": "done",
+                "priority": "low", "createdAt": "2025-02-10T20:00:00"}
+        _import(client, json.dumps(line).encode(), "local.ndjson")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    with SessionLocal() as db:
+        occurred_at = db.query(models.TaskEvent.occurred_at).join(
+            models.Task, models.Task.id == models.TaskEvent.task_id
+        ).filter(models.Task.title == "history local").order_by(models.TaskEvent.id.desc()).first()[0]
+        assert occurred_at == datetime(2025, 2, 11, 4, 0)
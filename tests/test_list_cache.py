@@ -0,0 +1,33 @@
+# 列表接口的 ETag：按当天日期计算的 overdue 筛选跨天后不能继续返回 304 或缓存的响应体
+from datetime import date, timedelta
+import pytest
+from app.crud import task_crud
+from app.routes import todos
+
+
+class _Tomorrow(date):
+    @classmethod
+    def today(cls):
+        return date.today() + timedelta(days=1)
+
+
+@pytest.mark.parametrize("params", [{"overdue": "true"}, {"overdue": "true", "limit": 50}])
+def test_overdue_list_changes_after_midnight(client, monkeypatch, params):
+    deadline = date.today().isoformat()
+    task = client.post("/api/tasks/", json={
+        "title": f"due today {params}", "content": "", "priority": "low", "deadline": deadline,
+    }).json()
+
+    def overdue_ids(response):
+        body = response.json()
+        return {item["id"] for item in (body["items"] if "items" in body else body)}
+
+    today = client.get("/api/tasks/", params=params)
+    assert task["id"] not in overdue_ids(today)
+
+    monkeypatch.setattr(todos, "date", _Tomorrow)
+    monkeypatch.setattr(task_crud, "date", _Tomorrow)
+    tomorrow = client.get("/api/tasks/", params=params, headers={"If-None-Match": today.headers["ETag"]})
+    assert tomorrow.status_code == 200
+    assert tomorrow.headers["ETag"] != today.headers["ETag"]
+    assert task["id"] in overdue_ids(tomorrow)
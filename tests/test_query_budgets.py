@@ -0,0 +1,371 @@
+# 每个路由的 SQL 条数不超过 @query_budget 声明的预算，且没有 N+1；
+# app/routes 里新增的路由没有声明预算或没有在 REQUESTS 里登记示例请求时测试失败
+import json
+import anyio
+import pytest
+from app.pytest_plugin import iter_budget_routes, route_id
+from conftest import create_tags, create_tasks
+
+LONG_CONTENT = "\n".join(f"line {i} of a long note body" for i in range(200))
+
+# (方法, 路径模板) -> build(client, data)，返回 [(url, 请求参数), ...]；
+# build 在统计范围之外执行，可以先建好要修改 / 删除的数据
+REQUESTS = {}
+
+
+def sample(method: str, path: str):
+    def register(build):
+        REQUESTS[(method, path)] = build
+        return build
+    return register
+
+
+def _create_task(client, **fields) -> int:
+    body = {"title": "budget task", "content": "", "priority": "medium", **fields}
+    return client.post("/api/tasks/", json=body).json()["id"]
+
+
+def _create_note(client, **fields) -> int:
+    body = {"title": "budget note", "content": "budget", **fields}
+    return client.post("/api/notes/", json=body).json()["id"]
+
+
+@pytest.fixture(scope="module")
+def data(client):
+    tag_ids = create_tags(client, "budget-a", "budget-b", "budget-c")
+    task_ids = create_tasks(client, 30, tag_ids, prefix="budget")
+    note_ids = [
+        _create_note(client, title=f"budget note {i}", content=LONG_CONTENT if i % 2 else f"short {i}",
+                     tags=[tag_ids[i % len(tag_ids)]])
+        for i in range(30)
+    ]
+    client.put(f"/api/notes/{note_ids[1]}", json={"content": LONG_CONTENT + "\nedited"})
+    client.put(f"/api/notes/{note_ids[1]}", json={"content": LONG_CONTENT + "\nedited twice"})
+    return {"tag_ids": tag_ids, "task_ids": task_ids, "note_ids": note_ids}
+
+
+# ========== 任务 ==========
+@sample("GET", "/api/tasks/")
+def _(client, data):
+    return [
+        ("/api/tasks/", {}),
+        ("/api/tasks/", {"params": {"q": "budget"}}),
+        ("/api/tasks/", {"params": {"limit": 10, "tags": data["tag_ids"][:2], "tag_mode": "any"}}),
+        ("/api/tasks/", {"params": {"status": ["todo", "doing"], "sort_by": "priority"}}),
+    ]
+
+
+@sample("GET", "/api/tasks/{task_id}")
+def _(client, data):
+    return [(f"/api/tasks/{data['task_ids'][0]}", {})]
+
+
+@sample("POST", "/api/tasks/")
+def _(client, data):
+    return [("/api/tasks/", {"json": {"title": "new", "content": "", "priority": "high", "tags": data["tag_ids"]}})]
+
+
+@sample("PATCH", "/api/tasks/{task_id}")
+def _(client, data):
+    task_id = _create_task(client)
+    return [(f"/api/tasks/{task_id}", {"json": {"status": "done", "title": "renamed", "tags": data["tag_ids"][:1]}})]
+
+
+@sample("DELETE", "/api/tasks/{task_id}")
+def _(client, data):
+    return [(f"/api/tasks/{_create_task(client, tags=data['tag_ids'])}", {})]
+
+
+@sample("POST", "/api/tasks/batch/create")
+def _(client, data):
+    items = [{"title": f"batch {i}", "content": "", "priority": "low", "tags": data["tag_ids"][:1]} for i in range(20)]
+    return [("/api/tasks/batch/create", {"json": {"items": items}})]
+
+
+@sample("POST", "/api/tasks/batch/update")
+def _(client, data):
+    return [("/api/tasks/batch/update", {"json": {"ids": create_tasks(client, 20, prefix="batch"), "status": "done"}})]
+
+
+@sample("POST", "/api/tasks/batch/delete")
+def _(client, data):
+    return [("/api/tasks/batch/delete", {"json": create_tasks(client, 20, data["tag_ids"], prefix="batch")})]
+
+
+# ========== 笔记 ==========
+@sample("GET", "/api/notes/")
+def _(client, data):
+    return [
+        ("/api/notes/", {}),
+        ("/api/notes/", {"params": {"view": "summary"}}),
+        ("/api/notes/", {"params": {"tags": data["tag_ids"][:2]}}),
+    ]
+
+
+@sample("GET", "/api/notes/{note_id}")
+def _(client, data):
+    return [(f"/api/notes/{data['note_ids'][1]}", {})]
+
+
+@sample("GET", "/api/notes/{note_id}/revisions")
+def _(client, data):
+    return [(f"/api/notes/{data['note_ids'][1]}/revisions", {})]
+
+
+@sample("GET", "/api/notes/{note_id}/revisions/{revision}")
+def _(client, data):
+    return [(f"/api/notes/{data['note_ids'][1]}/revisions/1", {})]
+
+
+@sample("GET", "/api/notes/search/")
+def _(client, data):
+    return [("/api/notes/search/", {"params": {"q": "budget"}})]
+
+
+@sample("POST", "/api/notes/")
+def _(client, data):
+    return [("/api/notes/", {"json": {"title": "new", "content": LONG_CONTENT, "tags": data["tag_ids"]}})]
+
+
+@sample("PUT", "/api/notes/{note_id}")
+def _(client, data):
+    note_id = _create_note(client, content=LONG_CONTENT)
+    return [(f"/api/notes/{note_id}", {"json": {"content": LONG_CONTENT + "\nchanged", "tags": data["tag_ids"][:1]}})]
+
+
+@sample("DELETE", "/api/notes/{note_id}")
+def _(client, data):
+    return [(f"/api/notes/{_create_note(client, content=LONG_CONTENT, tags=data['tag_ids'])}", {})]
+
+
+@sample("PATCH", "/api/notes/{note_id}/toggle-pin")
+def _(client, data):
+    return [(f"/api/notes/{data['note_ids'][0]}/toggle-pin", {})]
+
+
+@sample("PATCH", "/api/notes/{note_id}/tags")
+def _(client, data):
+    return [(f"/api/notes/{data['note_ids'][0]}/tags", {"json": {"tags": data["tag_ids"]}})]
+
+
+@sample("POST", "/api/notes/batch/create")
+def _(client, data):
+    items = [{"title": f"batch {i}", "content": LONG_CONTENT, "tags": data["tag_ids"][:1]} for i in range(20)]
+    return [("/api/notes/batch/create", {"json": {"items": items}})]
+
+
+@sample("POST", "/api/notes/batch/update")
+def _(client, data):
+    note_ids = [_create_note(client) for _ in range(5)]
+    return [("/api/notes/batch/update", {"json": {"ids": note_ids, "isPinned": True}})]
+
+
+@sample("POST", "/api/notes/batch/delete")
+def _(client, data):
+    note_ids = [_create_note(client, content=LONG_CONTENT, tags=data["tag_ids"]) for _ in range(5)]
+    return [("/api/notes/batch/delete", {"json": note_ids})]
+
+
+# ========== 标签 ==========
+@sample("GET", "/api/tags/")
+def _(client, data):
+    return [("/api/tags/", {}), ("/api/tags/", {"params": {"q": "budg"}})]
+
+
+@sample("POST", "/api/tags/")
+def _(client, data):
+    return [("/api/tags/", {"json": {"name": "budget-new"}}), ("/api/tags/", {"json": {"name": "budget-a"}})]
+
+
+@sample("DELETE", "/api/tags/{tag_id}")
+def _(client, data):
+    (tag_id,) = create_tags(client, "budget-doomed")
+    create_tasks(client, 5, [tag_id], prefix="doomed")
+    return [(f"/api/tags/{tag_id}", {})]
+
+
+# ========== 统计 ==========
+def _stats_filters(data):
+    # StatsFilter 的参数，走统计引擎的筛选聚合而不是增量计数器
+    return {"params": {"tag": data["tag_ids"][0], "deadline_from": "2020-01-01"}}
+
+
+@sample("GET", "/api/stats/")
+def _(client, data):
+    return [("/api/stats/", {}), ("/api/stats/", _stats_filters(data))]
+
+
+@sample("POST", "/api/stats/update")
+def _(client, data):
+    return [("/api/stats/update", {})]
+
+
+@sample("GET", "/api/stats/today")
+def _(client, data):
+    return [("/api/stats/today", {})]
+
+
+@sample("GET", "/api/stats/daily")
+def _(client, data):
+    return [("/api/stats/daily", {})]
+
+
+@sample("GET", "/api/stats/daily/{date}")
+def _(client, data):
+    return [(f"/api/stats/daily/{client.get('/api/stats/daily').json()[0]['date']}", {})]
+
+
+@sample("POST", "/api/stats/daily/")
+def _(client, data):
+    return [("/api/stats/daily/", {"json": {"date": "2001-01-01", "total": 1}})]
+
+
+@sample("GET", "/api/stats/week")
+def _(client, data):
+    return [("/api/stats/week", {})]
+
+
+@sample("GET", "/api/stats/month")
+def _(client, data):
+    return [("/api/stats/month", {})]
+
+
+@sample("GET", "/api/stats/year")
+def _(client, data):
+    return [("/api/stats/year", {})]
+
+
+@sample("GET", "/api/stats/priority")
+def _(client, data):
+    return [("/api/stats/priority", {}), ("/api/stats/priority", _stats_filters(data))]
+
+
+@sample("GET", "/api/stats/summary")
+def _(client, data):
+    return [("/api/stats/summary", {}), ("/api/stats/summary", _stats_filters(data))]
+
+
+@sample("GET", "/api/stats/trend/{period}")
+def _(client, data):
+    return [(f"/api/stats/trend/{period}", {}) for period in ("week", "month", "year")]
+
+
+@sample("GET", "/api/stats/mock")
+def _(client, data):
+    return [("/api/stats/mock", {})]
+
+
+# ========== 同步、推送、导入导出、维护 ==========
+@sample("GET", "/api/sync/")
+def _(client, data):
+    first = client.get("/api/sync/", params={"limit": 10}).json()
+    return [("/api/sync/", {}), ("/api/sync/", {"params": {"since": first["cursor"], "limit": 10}})]
+
+
+@sample("GET", "/api/events/")
+def _(client, data):
+    return [("/api/events/", {"stream": True})]
+
+
+@sample("GET", "/api/export/")
+def _(client, data):
+    return [("/api/export/", {})]
+
+
+@sample("GET", "/api/export/{kind}")
+def _(client, data):
+    return [(f"/api/export/{kind}", {"params": {"format": "csv"}}) for kind in ("tasks", "notes", "tags")]
+
+
+@sample("POST", "/api/import/")
+def _(client, data):
+    lines = [json.dumps({"type": "tag", "name": "budget-imported"})] + [
+        json.dumps({"type": kind, "title": f"imported {i}", "content": "", "priority": "low", "tags": ["budget-imported"]})
+        for i in range(10) for kind in ("task", "note")
+    ]
+    return [("/api/import/", {"params": {"import_id": "budget"}, "files": {"file": ("rows.ndjson", "\n".join(lines).encode())}})]
+
+
+@sample("GET", "/api/import/{import_id}")
+def _(client, data):
+    client.post("/api/import/", params={"import_id": "budget-progress"}, files={"file": ("empty.ndjson", b"")})
+    return [("/api/import/budget-progress", {})]
+
+
+@sample("POST", "/api/maintenance/search/rebuild")
+def _(client, data):
+    return [("/api/maintenance/search/rebuild", {})]
+
+
+@sample("POST", "/api/maintenance/stats/reconcile")
+def _(client, data):
+    return [("/api/maintenance/stats/reconcile", {})]
+
+
+@sample("POST", "/api/maintenance/stats/rebuild-trends")
+def _(client, data):
+    return [("/api/maintenance/stats/rebuild-trends", {})]
+
+
+@sample("POST", "/api/maintenance/tags/repair")
+def _(client, data):
+    return [("/api/maintenance/tags/repair", {})]
+
+
+@sample("POST", "/api/maintenance/sync/compact")
+def _(client, data):
+    return [("/api/maintenance/sync/compact", {})]
+
+
+@sample("POST", "/api/maintenance/notes/compact")
+def _(client, data):
+    return [("/api/maintenance/notes/compact", {})]
+
+
+async def _open_stream(app, path: str) -> int:
+    """SSE 是无限流，TestClient 会一直等到响应结束；直接按 ASGI 调用，收到第一块数据后客户端断开"""
+    first_chunk = anyio.Event()
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body":
+            first_chunk.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"testserver")], "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+def _send(client, method: str, url: str, stream: bool = False, **kwargs) -> int:
+    if stream:
+        return client.portal.call(_open_stream, client.app, url)
+    response = client.request(method, url, **kwargs)
+    assert response.status_code < 400, response.text
+    return response.status_code
+
+
+def test_every_route_has_a_sample_request():
+    declared = {(method, route.path) for route in iter_budget_routes() for method in route.methods}
+    assert declared == set(REQUESTS)
+
+
+@pytest.mark.parametrize("route", iter_budget_routes(), ids=route_id)
+def test_route_stays_within_query_budget(client, data, query_budget, route):
+    for method in sorted(route.methods):
+        for url, kwargs in REQUESTS[(method, route.path)](client, data):
+            with query_budget.route(route):
+                assert _send(client, method, url, **kwargs) < 400
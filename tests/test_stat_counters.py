@@ -0,0 +1,52 @@
+# 今日计数器由任务写操作增量维护：并发写入后应与从任务表重算的结果一致
+from concurrent.futures import ThreadPoolExecutor
+from app.database import SessionLocal
+from app.crud.status_crud import reconcile_daily_stat
+
+THREADS = 16
+TASKS = 240
+
+
+def _assert_counters_consistent():
+    with SessionLocal() as db:
+        report = reconcile_daily_stat(db)
+    assert report["consistent"], report["drift"]
+
+
+def test_concurrent_creates_keep_counters_consistent(client):
+    _assert_counters_consistent()
+
+    def create(i):
+        return client.post("/api/tasks/", json={
+            "title": f"concurrent {i}",
+            "content": "",
+            "status": ("todo", "done")[i % 2],
+            "priority": ("high", "medium", "low", "none")[i % 4],
+        }).status_code
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        assert set(pool.map(create, range(TASKS))) == {200}
+
+    _assert_counters_consistent()
+
+
+def test_concurrent_mixed_writes_keep_counters_consistent(client):
+    task_ids = [
+        client.post("/api/tasks/", json={"title": f"mixed {i}", "content": "", "priority": "medium"}).json()["id"]
+        for i in range(THREADS * 4)
+    ]
+
+    def write(i):
+        task_id = task_ids[i]
+        if i % 4 == 0:
+            return client.delete(f"/api/tasks/{task_id}").status_code
+        if i % 4 == 1:
+            return client.patch(f"/api/tasks/{task_id}", json={"status": "done", "priority": "high"}).status_code
+        if i % 4 == 2:
+            return client.post("/api/tasks/batch/update", json={"ids": [task_id], "status": "doing"}).status_code
+        return client.post("/api/tasks/", json={"title": f"mixed new {i}", "content": "", "priority": "low"}).status_code
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        assert set(pool.map(write, range(len(task_ids)))) == {200}
+
+    _assert_counters_consistent()
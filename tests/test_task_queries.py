@@ -0,0 +1,40 @@
+# 任务列表 / 搜索 / 游标分页每个请求执行的语句数与数据量无关（标签一次查询取回，没有 N+1）
+from conftest import create_tags, create_tasks
+
+N = 20
+
+LIST_REQUESTS = [
+    ("/api/tasks/", {}),
+    ("/api/tasks/", {"q": "task"}),
+    ("/api/tasks/", {"limit": 500}),
+]
+
+
+def _statement_counts(client, count_queries):
+    counts = []
+    for path, params in LIST_REQUESTS:
+        with count_queries() as counter:
+            response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        counts.append(counter.count)
+    return counts
+
+
+def test_task_list_statement_count_is_constant(client, count_queries):
+    tag_ids = create_tags(client, "query-count-a", "query-count-b", "query-count-c")
+
+    create_tasks(client, N, tag_ids)
+    small = _statement_counts(client, count_queries)
+
+    create_tasks(client, 9 * N, tag_ids)
+    large = _statement_counts(client, count_queries)
+
+    assert large == small
+
+
+def test_task_list_returns_tags(client):
+    tag_ids = create_tags(client, "query-count-tagged")
+    task_ids = create_tasks(client, 3, tag_ids, prefix="tagged")
+    tasks = {task["id"]: task for task in client.get("/api/tasks/").json()}
+    for task_id in task_ids:
+        assert [tag["id"] for tag in tasks[task_id]["tags"]] == tag_ids
@@ -0,0 +1,73 @@
+# 趋势重建：从状态日志重建的周/月/年汇总与增量维护的结果一致；
+# 日志为空时从任务表补出的日志与实时记录的日志落在同一天（任务时间戳是 UTC，日志按本地时间）
+import time
+from datetime import datetime
+import pytest
+from app import crud, models
+from app.database import SessionLocal
+from conftest import create_tasks
+
+_EVENT_COLUMNS = ("task_id", "event", "from_status", "to_status", "priority", "occurred_at")
+_ROLLUPS = (
+    (models.WeeklyStat, "week_start", "week_data"),
+    (models.MonthlyStat, "month", "month_data"),
+    (models.YearlyStat, "year", "year_data"),
+)
+
+
+@pytest.fixture
+def shifted_timezone(monkeypatch):
+    """切换到此刻本地日期与 UTC 日期不同的时区（UTC+14 或 UTC-12）"""
+    monkeypatch.setenv("TZ", "XXX-14" if datetime.utcnow().hour >= 12 else "XXX+12")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _rollups(db):
+    return {
+        model.__tablename__: {getattr(row, key): getattr(row, data) for row in db.query(model)}
+        for model, key, data in _ROLLUPS
+    }
+
+
+def _events(db, task_ids):
+    rows = db.query(models.TaskEvent).filter(models.TaskEvent.task_id.in_(task_ids))
+    return sorted((row.task_id, row.event, row.to_status, row.occurred_at.date()) for row in rows)
+
+
+def test_rebuild_matches_live_rollups(client):
+    create_tasks(client, 6, prefix="rebuild live")
+    with SessionLocal() as db:
+        live = _rollups(db)
+        crud.rebuild_period_stats(db)
+        assert _rollups(db) == live
+
+
+def test_seeded_events_use_the_live_clock(client, shifted_timezone):
+    # 每个任务新建为 todo，至多再变更一次状态，与从任务表补出的日志形状一致
+    created, patched, batched = (
+        client.post("/api/tasks/", json={"title": f"rebuild seed {i}", "content": "", "priority": "low"}).json()["id"]
+        for i in range(3)
+    )
+    assert client.patch(f"/api/tasks/{patched}", json={"status": "done"}).status_code == 200
+    assert client.post("/api/tasks/batch/update", json={"ids": [batched], "status": "doing"}).status_code == 200
+    task_ids = [created, patched, batched]
+
+    with SessionLocal() as db:
+        live = _events(db, task_ids)
+        saved = [{column: getattr(row, column) for column in _EVENT_COLUMNS} for row in db.query(models.TaskEvent)]
+        before = _rollups(db)
+        try:
+            db.query(models.TaskEvent).delete()
+            db.commit()
+            assert crud.rebuild_period_stats(db)["seeded_events"] > 0
+            assert _events(db, task_ids) == live
+        finally:
+            # 恢复原来的日志和汇总，不影响其它测试
+            db.query(models.TaskEvent).delete()
+            db.bulk_insert_mappings(models.TaskEvent, saved)
+            db.commit()
+            crud.rebuild_period_stats(db)
+            assert _rollups(db) == before